@@ -1,6 +1,7 @@
 #include <WiFi.h>
 #include <WiFiUdp.h>
 #include <ArduinoJson.h>
+#include <Preferences.h>
 #include <stdint.h>
 #include "LobotSerialServoControl.h"
 #include "MicroServoControl.h"
@@ -25,8 +26,259 @@ IPAddress local_ip(192, 168, 4, 5); // static local IP
 IPAddress gateway(192, 168, 4, 1); // AP    
 IPAddress subnet(255, 255, 255, 0);
 
+// 多手同步: 上位机向多播组 (或广播地址的 udpPort) 发送一个数据报
+// {"Cmd":"Multi","Hands":{"1":[命令, ...],"2":{命令}}}, 每只手只执行以自己的 HAND_ID 为键的段
+const char* HAND_ID = "1"; // 每只手设置不同的值
+WiFiUDP UdpMulticast;
+IPAddress multicastGroup(239, 255, 12, 34);
+const int multicastPort = 12346;
+
+#define UDP_BUFFER_SIZE 1024
+char packetBuffer[UDP_BUFFER_SIZE + 1];
+StaticJsonDocument<2048> packetDoc;
+uint32_t packetMicros = 0; // 当前数据报到达时的 micros()
 
 void turn();
+void serviceMacro();
+void dispatchCommand(JsonObject doc, WiFiUDP &udp);
+
+// 时钟同步与定时执行:
+// {"Cmd":"Sync","Seq":n} -> {"Cmd":"SyncReply","Seq":n,"Rx":收到时的micros(),"Tx":发送应答时的micros()}
+// {"Cmd":"At","At":设备micros(),"Seq":n,"Do":{命令}} 到时执行, 执行后应答
+// {"Cmd":"Executed","Seq":n,"At":..,"Actual":实际执行时的micros()}, 上位机据此统计执行时间误差
+#define SCHEDULE_SLOTS      8
+#define SCHEDULE_JSON_SIZE  256
+
+struct ScheduledCommand {
+  bool used;
+  uint32_t at;
+  uint16_t seq;
+  IPAddress ip;
+  uint16_t port;
+  char json[SCHEDULE_JSON_SIZE];
+};
+
+ScheduledCommand schedule[SCHEDULE_SLOTS];
+StaticJsonDocument<512> scheduledDoc;
+
+void handleSync(JsonObject doc, WiFiUDP &udp) {
+  uint16_t seq = doc["Seq"];
+  udp.beginPacket(udp.remoteIP(), udp.remotePort());
+  udp.printf("{\"Cmd\":\"SyncReply\",\"Seq\":%u,\"Rx\":%u,\"Tx\":%u}", seq, packetMicros, (uint32_t)micros());
+  udp.endPacket();
+}
+
+void handleAt(JsonObject doc, WiFiUDP &udp) {
+  for (uint8_t i = 0; i < SCHEDULE_SLOTS; i++) {
+    ScheduledCommand &slot = schedule[i];
+    if (slot.used) continue;
+    // 命令原样保存, 到时再解析执行
+    size_t len = serializeJson(doc["Do"], slot.json, SCHEDULE_JSON_SIZE);
+    if (len == 0 || len >= SCHEDULE_JSON_SIZE - 1) return;
+    slot.at = doc["At"];
+    slot.seq = doc["Seq"];
+    slot.ip = udp.remoteIP();
+    slot.port = udp.remotePort();
+    slot.used = true;
+    return;
+  }
+  // 队列已满时丢弃, 上位机收不到 Executed 应答
+}
+
+// 在 loop() 中调用, 按到期先后执行定时命令 (micros() 回绕安全)
+void serviceSchedule() {
+  while (true) {
+    int8_t due = -1;
+    uint32_t now = micros();
+    for (uint8_t i = 0; i < SCHEDULE_SLOTS; i++) {
+      if (!schedule[i].used || (int32_t)(now - schedule[i].at) < 0) continue;
+      if (due < 0 || (int32_t)(schedule[i].at - schedule[due].at) < 0) due = i;
+    }
+    if (due < 0) return;
+
+    ScheduledCommand &slot = schedule[due];
+    slot.used = false;
+    uint32_t actual = micros();
+    if (!deserializeJson(scheduledDoc, slot.json)) {
+      dispatchCommand(scheduledDoc.as<JsonObject>(), Udp);
+    }
+    Udp.beginPacket(slot.ip, slot.port);
+    Udp.printf("{\"Cmd\":\"Executed\",\"Seq\":%u,\"At\":%u,\"Actual\":%u}", slot.seq, slot.at, actual);
+    Udp.endPacket();
+  }
+}
+
+
+// 手势宏: 上位机用 MacroStep 逐帧上传一次 (保存在NVS, 断电不丢),
+// 之后2字节的数据报 'M' + 宏ID 即可播放, 'M' + 0 停止
+// 关键帧时间(ms)相对宏开始, 由 serviceMacro() 按 millis() 执行, 不再受WiFi抖动影响
+// 内置的多步动作 (Turn) 也是关键帧表, 由同一个播放器执行, 处理数据报时从不 delay()
+#define MACRO_MAX          16
+#define MACRO_MAX_STEPS    32
+#define MACRO_MAX_DEVICES  5
+#define MACRO_PLAY_BYTE    'M'
+
+struct MacroStep {
+  uint16_t t;
+  uint8_t fingerCount;
+  uint8_t palmCount;
+  uint8_t fingerIds[MACRO_MAX_DEVICES];
+  uint8_t palmIds[MACRO_MAX_DEVICES];
+  int16_t fingerPos[MACRO_MAX_DEVICES];
+  int16_t palmPos[MACRO_MAX_DEVICES];
+  uint16_t palmTime[MACRO_MAX_DEVICES];
+};
+
+struct Macro {
+  uint8_t count;          // 关键帧数, 0 表示未定义
+  uint16_t seq;           // 上传序号, 收到不同序号的关键帧时重新开始接收
+  uint32_t receivedMask;  // 已收到的关键帧, 全部收到后保存
+  MacroStep steps[MACRO_MAX_STEPS];
+};
+
+Macro macros[MACRO_MAX];
+Preferences macroStore;
+const MacroStep *playingSteps = NULL;  // 正在播放的关键帧表, NULL 表示空闲
+uint8_t playingCount = 0;
+int8_t playingMacro = -1;              // 正在播放的宏下标, 内置动作为 -1
+uint8_t macroStepIndex = 0;
+uint32_t macroStartMillis = 0;
+
+// Turn: 1号舵机 500 -> 1000 -> 0 -> 500, 每步运动1000ms, 间隔2000ms
+const MacroStep TURN_STEPS[] = {
+  {0,    0, 1, {0}, {1}, {0}, {500},  {1000}},
+  {2000, 0, 1, {0}, {1}, {0}, {1000}, {1000}},
+  {4000, 0, 1, {0}, {1}, {0}, {0},    {1000}},
+  {6000, 0, 1, {0}, {1}, {0}, {500},  {1000}},
+};
+#define TURN_STEP_COUNT (sizeof(TURN_STEPS) / sizeof(TURN_STEPS[0]))
+
+uint32_t macroFullMask(uint8_t count) {
+  return count >= 32 ? 0xFFFFFFFF : ((1UL << count) - 1);
+}
+
+bool macroComplete(uint8_t index) {
+  return macros[index].count > 0 && macros[index].receivedMask == macroFullMask(macros[index].count);
+}
+
+// 从NVS加载已保存的宏
+void macroInit() {
+  macroStore.begin("macros", false);
+  for (uint8_t i = 0; i < MACRO_MAX; i++) {
+    char key[8];
+    snprintf(key, sizeof(key), "m%u", i + 1);
+    size_t len = macroStore.getBytes(key, &macros[i], sizeof(Macro));
+    if (len < offsetof(Macro, steps) || macros[i].count > MACRO_MAX_STEPS) {
+      macros[i].count = 0;
+    }
+    macros[i].receivedMask = macroFullMask(macros[i].count);
+  }
+}
+
+void saveMacro(uint8_t index) {
+  char key[8];
+  snprintf(key, sizeof(key), "m%u", index + 1);
+  macroStore.putBytes(key, &macros[index], offsetof(Macro, steps) + macros[index].count * sizeof(MacroStep));
+}
+
+void runMacroStep(const MacroStep &step) {
+  if (step.fingerCount > 0) {
+    uint8_t IDArray[MACRO_MAX_DEVICES];
+    int16_t posArray[MACRO_MAX_DEVICES];
+    memcpy(IDArray, step.fingerIds, step.fingerCount);
+    memcpy(posArray, step.fingerPos, step.fingerCount * sizeof(int16_t));
+    servo.moveFingers(step.fingerCount, IDArray, posArray);
+  }
+  for (uint8_t i = 0; i < step.palmCount; i++) {
+    BusServo.LobotSerialServoMove(step.palmIds[i], step.palmPos[i], step.palmTime[i]);
+  }
+}
+
+// 开始播放关键帧表, 替换正在播放的宏或动作
+void playSteps(const MacroStep *steps, uint8_t count) {
+  playingSteps = steps;
+  playingCount = count;
+  playingMacro = -1;
+  macroStepIndex = 0;
+  macroStartMillis = millis();
+  serviceMacro();
+}
+
+void stopSteps() {
+  playingSteps = NULL;
+  playingMacro = -1;
+}
+
+void playMacro(uint8_t macroId) {
+  stopSteps();
+  if (macroId == 0 || macroId > MACRO_MAX || !macroComplete(macroId - 1)) return;
+  playSteps(macros[macroId - 1].steps, macros[macroId - 1].count);
+  playingMacro = macroId - 1;
+}
+
+void turn() {
+  playSteps(TURN_STEPS, TURN_STEP_COUNT);
+}
+
+// 在 loop() 中调用, 执行所有已到时间的关键帧
+void serviceMacro() {
+  if (playingSteps == NULL) return;
+  uint32_t elapsed = millis() - macroStartMillis;
+  while (macroStepIndex < playingCount && playingSteps[macroStepIndex].t <= elapsed) {
+    runMacroStep(playingSteps[macroStepIndex]);
+    macroStepIndex++;
+  }
+  if (macroStepIndex >= playingCount) {
+    stopSteps();
+  }
+}
+
+// 把JSON数组读入定长数组, :return: 元素个数, 超过 maxCount 时返回 -1
+int readMacroArray(JsonArray list, int16_t *out, uint8_t maxCount) {
+  if (list.size() > maxCount) return -1;
+  for (int i = 0; i < list.size(); i++) out[i] = list[i].as<int16_t>();
+  return list.size();
+}
+
+// {"Cmd":"MacroStep","MacroID":1,"Seq":7,"Count":4,"Index":0,"T":400,
+//  "F_ID":[..],"F_pos":[..],"P_ID":[..],"P_pos":[..],"P_time":[..]}
+// 每帧都带序号和帧数, 数据报乱序到达也能正确接收
+void handleMacroStep(JsonObject doc, WiFiUDP &udp) {
+  uint8_t macroId = doc["MacroID"];
+  uint16_t seq = doc["Seq"];
+  uint8_t count = doc["Count"];
+  uint8_t index = doc["Index"];
+  if (macroId == 0 || macroId > MACRO_MAX || count == 0 || count > MACRO_MAX_STEPS || index >= count) return;
+  if (playingMacro == macroId - 1) stopSteps();
+  Macro &m = macros[macroId - 1];
+  if (m.seq != seq || m.count != count) {
+    m.seq = seq;
+    m.count = count;
+    m.receivedMask = 0;
+  }
+
+  MacroStep &step = m.steps[index];
+  int16_t values[MACRO_MAX_DEVICES];
+  int fingerCount = readMacroArray(doc["F_ID"], values, MACRO_MAX_DEVICES);
+  if (fingerCount < 0 || readMacroArray(doc["F_pos"], step.fingerPos, MACRO_MAX_DEVICES) != fingerCount) return;
+  for (int i = 0; i < fingerCount; i++) step.fingerIds[i] = values[i];
+  int palmCount = readMacroArray(doc["P_ID"], values, MACRO_MAX_DEVICES);
+  if (palmCount < 0 || readMacroArray(doc["P_pos"], step.palmPos, MACRO_MAX_DEVICES) != palmCount ||
+      readMacroArray(doc["P_time"], (int16_t *)step.palmTime, MACRO_MAX_DEVICES) != palmCount) return;
+  for (int i = 0; i < palmCount; i++) step.palmIds[i] = values[i];
+  step.t = doc["T"];
+  step.fingerCount = fingerCount;
+  step.palmCount = palmCount;
+  m.receivedMask |= 1UL << index;
+
+  if (macroComplete(macroId - 1)) {
+    saveMacro(macroId - 1);
+    // 应答上位机, 收不到应答时上位机会重新上传
+    udp.beginPacket(udp.remoteIP(), udp.remotePort());
+    udp.printf("{\"Cmd\":\"MacroSaved\",\"MacroID\":%u,\"Seq\":%u,\"Count\":%u}", macroId, seq, m.count);
+    udp.endPacket();
+  }
+}
 
 // Set board as STA
 // Connect to know wifi (Target wifi needs to satisfy - "2.4GHz" && "WPA2")
@@ -44,102 +296,123 @@ void wifiConnect(){
 
 // UDP init
 void udpInit(){
+  macroInit();
   Udp.begin(udpPort);
+  UdpMulticast.beginMulticast(multicastGroup, multicastPort);
   Serial.print("UDP listening on port ");
   Serial.println(udpPort);
 }
 
 
-// Handle coming msg
-void handleUdp(){
+// 执行一条JSON命令, 只下发到总线后立即返回; 多步动作交给 serviceMacro() 按 millis() 执行
+void dispatchCommand(JsonObject doc, WiFiUDP &udp){
+  const char* cmd = doc["Cmd"];
+  if (cmd == NULL) return;
 
-  int packetSize = Udp.parsePacket(); // Check is there any msg coming
-  if(packetSize){
-    char buffer[255];
-    int len = Udp.read(buffer, 255); // Read the coming msg
-    if (len > 0) {
-      buffer[len] = 0; // Null-terminate the string
-    }
-    String message = String(buffer);
-//    Serial.println(message);
+  if(strcmp(cmd, "Turn") == 0){
+    turn();
+  }
+  else if(strcmp(cmd, "Sync") == 0){
+    handleSync(doc, udp);
+  }
+  else if(strcmp(cmd, "At") == 0){
+    handleAt(doc, udp);
+  }
 
-    StaticJsonDocument<512> doc;
-    DeserializationError error = deserializeJson(doc, message);
-    if (error) {
-      Serial.print("deserializeJson() failed: ");
-      Serial.println(error.c_str());
-      return;
-    }
+  else if(strcmp(cmd, "ServoMove") == 0){ 
+    uint8_t id = doc["ID"];
+    int16_t position = doc["Pos"];
+    uint16_t time = doc["Time"];
+    // uint8_t id, int16_t position, uint16_t time 
+//      Serial.println("RUN BusServo.LobotSerialServoMove");     
+    BusServo.LobotSerialServoMove(id, position, time); // 设置1号舵机运行到500脉宽位置，运行时间为1000毫秒
+//      Serial.println("RUN BusServo.LobotSerialServoMove");
+  }
+  else if(strcmp(cmd, "FingerMove") == 0){
+    uint8_t id = doc["ID"];
+    int16_t position = doc["Pos"];
+    servo.setPosition(id, position);
+  }
+  else if(strcmp(cmd, "MoveFingers") == 0){
+    JsonArray ID_list = doc["ID_list"];
+    JsonArray pos_list = doc["pos_list"];
 
-    const char* cmd = doc["Cmd"];  
+    uint8_t IDArray[ID_list.size()];
+    int16_t posArray[pos_list.size()];
+
+    for (int i = 0; i < ID_list.size(); i++) IDArray[i] = ID_list[i].as<uint8_t>();
+    for (int i = 0; i < pos_list.size(); i++) posArray[i] = pos_list[i].as<int16_t>();
+
+    servo.moveFingers(ID_list.size(), IDArray, posArray);
     
-    if(strcmp(cmd, "Turn") == 0){
-      turn();
-    }
+  }
+  else if(strcmp(cmd, "MacroStep") == 0){
+    handleMacroStep(doc, udp);
+  }
+  else if(strcmp(cmd, "ClearError") == 0){
+    uint8_t id = doc["ID"];
+    servo.clearError(id);
+  }
+  else if(strcmp(cmd, "MovePalms") == 0){
+    JsonArray ID_list = doc["ID_list"];
+    JsonArray pos_list = doc["pos_list"];
+    JsonArray time_list = doc["time_list"];
 
-    else if(strcmp(cmd, "ServoMove") == 0){ 
-      uint8_t id = doc["ID"];
-      int16_t position = doc["Pos"];
-      uint16_t time = doc["Time"];
-      // uint8_t id, int16_t position, uint16_t time 
-//      Serial.println("RUN BusServo.LobotSerialServoMove");     
-      BusServo.LobotSerialServoMove(id, position, time); // 设置1号舵机运行到500脉宽位置，运行时间为1000毫秒
-//      Serial.println("RUN BusServo.LobotSerialServoMove");
-      delay(2000); // 延时2000毫秒
-    }
-    else if(strcmp(cmd, "FingerMove") == 0){
-      uint8_t id = doc["ID"];
-      int16_t position = doc["Pos"];
-      servo.setPosition(id, position);
-      delay(2000);
+    uint8_t IDArray[ID_list.size()];
+    int16_t posArray[pos_list.size()];
+    int16_t timeArray[time_list.size()];
+
+    for (int i = 0; i < ID_list.size(); i++) IDArray[i] = ID_list[i].as<uint8_t>();
+    for (int i = 0; i < pos_list.size(); i++) posArray[i] = pos_list[i].as<int16_t>();
+    for (int i = 0; i < time_list.size(); i++) timeArray[i] = time_list[i].as<int16_t>();
+    for (int i = 0; i < time_list.size(); i++) {
+      BusServo.LobotSerialServoMove(IDArray[i], posArray[i], timeArray[i]); // 设置1号舵机运行到500脉宽位置，运行时间为1000毫秒
     }
-    else if(strcmp(cmd, "MoveFingers") == 0){
-      JsonArray ID_list = doc["ID_list"];
-      JsonArray pos_list = doc["pos_list"];
+    
+  }
+}
 
-      uint8_t IDArray[ID_list.size()];
-      int16_t posArray[pos_list.size()];
 
-      for (int i = 0; i < ID_list.size(); i++) IDArray[i] = ID_list[i].as<uint8_t>();
-      for (int i = 0; i < pos_list.size(); i++) posArray[i] = pos_list[i].as<int16_t>();
+// 读取并执行一个数据报, 单播和多播两个端口共用
+void handlePacket(WiFiUDP &udp){
 
-      servo.moveFingers(ID_list.size(), IDArray, posArray);
-      
+  int packetSize = udp.parsePacket(); // Check is there any msg coming
+  if(packetSize){
+    packetMicros = micros();
+    int len = udp.read(packetBuffer, UDP_BUFFER_SIZE); // Read the coming msg
+    if (len <= 0) return;
+    packetBuffer[len] = 0; // Null-terminate the string
+    // 播放手势宏: 'M' + 宏ID (两个字节, 不经过JSON解析)
+    if (len == 2 && packetBuffer[0] == MACRO_PLAY_BYTE) {
+      playMacro((uint8_t)packetBuffer[1]);
+      return;
     }
-    else if(strcmp(cmd, "ClearError") == 0){
-      uint8_t id = doc["ID"];
-      servo.clearError(id);
+
+    DeserializationError error = deserializeJson(packetDoc, packetBuffer, len);
+    if (error) {
+      Serial.print("deserializeJson() failed: ");
+      Serial.println(error.c_str());
+      return;
     }
-    else if(strcmp(cmd, "MovePalms") == 0){
-      JsonArray ID_list = doc["ID_list"];
-      JsonArray pos_list = doc["pos_list"];
-      JsonArray time_list = doc["time_list"];
-
-      uint8_t IDArray[ID_list.size()];
-      int16_t posArray[pos_list.size()];
-      int16_t timeArray[time_list.size()];
-
-      for (int i = 0; i < ID_list.size(); i++) IDArray[i] = ID_list[i].as<uint8_t>();
-      for (int i = 0; i < pos_list.size(); i++) posArray[i] = pos_list[i].as<int16_t>();
-      for (int i = 0; i < time_list.size(); i++) timeArray[i] = time_list[i].as<int16_t>();
-      for (int i = 0; i < time_list.size(); i++) {
-        BusServo.LobotSerialServoMove(IDArray[i], posArray[i], timeArray[i]); // 设置1号舵机运行到500脉宽位置，运行时间为1000毫秒
+
+    const char* cmd = packetDoc["Cmd"];
+    if (cmd != NULL && strcmp(cmd, "Multi") == 0) {
+      // 只执行本机的段, 没有本机的段时忽略
+      JsonVariant section = packetDoc["Hands"][HAND_ID];
+      if (section.is<JsonArray>()) {
+        for (JsonObject item : section.as<JsonArray>()) dispatchCommand(item, udp);
+      } else if (section.is<JsonObject>()) {
+        dispatchCommand(section.as<JsonObject>(), udp);
       }
-      
+      return;
     }
+    dispatchCommand(packetDoc.as<JsonObject>(), udp);
   }
 }
 
-void turn() {
-  BusServo.LobotSerialServoMove(1,500,1000); // 设置1号舵机运行到500脉宽位置，运行时间为1000毫秒
-  delay(2000); // 延时2000毫秒
-
-  BusServo.LobotSerialServoMove(1,1000,1000); // 设置1号舵机运行到1000脉宽位置，运行时间为1000毫秒
-  delay(2000); // 延时2000毫秒
 
-  BusServo.LobotSerialServoMove(1,0,1000); // 设置1号舵机运行到0脉宽位置，运行时间为1000毫秒
-  delay(2000); // 延时2000毫秒
-
-  BusServo.LobotSerialServoMove(1,500,1000); // 设置1号舵机运行到500脉宽位置，运行时间为1000毫秒
-  delay(2000); // 延时2000毫秒
+// Handle coming msg
+void handleUdp(){
+  handlePacket(Udp);
+  handlePacket(UdpMulticast);
 }
@@ -31,10 +31,79 @@ uint8_t receiveBuffer[256];
 uint16_t bufferIndex = 0;
 uint32_t lastReceiveTime = 0;
 
+// 帧间静默超过该时间即认为一帧接收完成 (Modbus RTU 在19200以上波特率规定为1.75ms)
+#define MODBUS_FRAME_GAP_US 1750
+
+// 轨迹缓冲区 (命令0x08播放, 0x09停止)
+// 主机先用FC16把 REG_TRAJ_FINGER_COUNT 起的头部和路点一次(或分几次)写入, 再写命令0x08
+// 每个路点: 时间(ms, 相对播放开始, 递增) + 各手指位置 + 各手掌位置, 长度 1 + 手指数 + 手掌数
+// 手掌舵机的运动时间取到下一个路点的间隔, 播放期间拒绝写入轨迹区 (异常码0x06)
+#define REG_TRAJ_STATUS       56  // 0空闲 1播放中 2完成 3已停止
+#define REG_TRAJ_INDEX        57  // 已执行的路点数
+#define REG_TRAJ_ELAPSED      58  // 播放开始后的毫秒数 (65535封顶)
+#define REG_TRAJ_FINGER_COUNT 59
+#define REG_TRAJ_PALM_COUNT   60
+#define REG_TRAJ_FINGER_IDS   61  // 5个
+#define REG_TRAJ_PALM_IDS     66  // 5个
+#define REG_TRAJ_POINTS       71  // 路点数
+#define REG_TRAJ_BUFFER       72
+#define TRAJ_BUFFER_SIZE      1024
+#define TRAJ_MAX_DEVICES      5
+
+#define TRAJ_IDLE     0
+#define TRAJ_PLAYING  1
+#define TRAJ_DONE     2
+#define TRAJ_STOPPED  3
+
+// 时钟同步与定时执行 (命令0x0A)
+// 读取 REG_CLOCK_LO/HI 时锁存设备 micros(), 上位机据此估计时钟偏差和漂移
+// 命令0x0A: 到设备时间 REG_EXEC_AT 时执行 REG_EXEC_CMD (参数寄存器在执行时读取, 执行前不要改写)
+#define REG_CLOCK_LO       (REG_TRAJ_BUFFER + TRAJ_BUFFER_SIZE)
+#define REG_CLOCK_HI       (REG_CLOCK_LO + 1)
+#define REG_EXEC_AT_LO     (REG_CLOCK_LO + 2)
+#define REG_EXEC_AT_HI     (REG_CLOCK_LO + 3)
+#define REG_EXEC_CMD       (REG_CLOCK_LO + 4)
+#define REG_EXEC_STATE     (REG_CLOCK_LO + 5)  // 0无 1等待 2已执行
+#define REG_EXEC_ACTUAL_LO (REG_CLOCK_LO + 6)  // 实际执行时的 micros()
+#define REG_EXEC_ACTUAL_HI (REG_CLOCK_LO + 7)
+
+#define EXEC_NONE     0
+#define EXEC_PENDING  1
+#define EXEC_DONE     2
+
+// 手掌舵机反馈: loop() 中轮流向各舵机发读请求, 应答到齐后写入寄存器, 不阻塞Modbus处理
+// 每轮读一遍所有舵机的位置, 再读一个舵机的温度或电压; 上位机一次FC03读取整个区域
+// REG_PALM_FB_COUNT 为0时停止轮询, 主机可改写数量和ID
+// 每个舵机5个寄存器: 位置(有符号) 温度(℃) 电压(mV) 数据年龄(ms, 读取时计算, 65535表示无数据) 连续失败次数
+#define REG_PALM_FB_COUNT  (REG_CLOCK_LO + 8)
+#define REG_PALM_FB_IDS    (REG_PALM_FB_COUNT + 1)  // 5个
+#define REG_PALM_FB_ROUNDS (REG_PALM_FB_COUNT + 6)  // 完成的轮数 (回绕)
+#define REG_PALM_FB_DATA   (REG_PALM_FB_COUNT + 7)
+#define PALM_FB_MAX        5
+#define PALM_FB_STRIDE     5
+#define PALM_FB_TIMEOUT_US 3000  // 请求后固定等待0.55ms, 应答约0.7ms
+
 // 保持寄存器数组 - 扩大范围以覆盖所有可能的寄存器地址
-#define HOLDING_REGISTERS_SIZE 50
+#define HOLDING_REGISTERS_SIZE (REG_PALM_FB_DATA + PALM_FB_MAX * PALM_FB_STRIDE)
 uint16_t holdingRegisters[HOLDING_REGISTERS_SIZE] = {0};
 
+// FC03 单次最多读125个, FC16 单次最多写123个寄存器
+#define MAX_READ_QUANTITY  125
+#define MAX_WRITE_QUANTITY 123
+
+uint32_t trajStartMillis = 0;
+uint32_t execAtMicros = 0;
+
+bool palmFbPending = false;       // 已发出请求, 等待应答
+uint8_t palmFbSlot = 0;           // 下一个读位置的舵机, 等于数量时读温度/电压
+uint8_t palmFbSlow = 0;           // 温度/电压轮换: 舵机 * 2 + (0温度 1电压)
+uint8_t palmFbRequestSlot = 0;
+uint8_t palmFbRequestCmd = 0;
+uint32_t palmFbRequestMicros = 0;
+uint8_t palmFbIds[PALM_FB_MAX] = {0};       // 与数据对应的ID, 寄存器中的ID被改写后清空该舵机的数据
+uint32_t palmFbUpdated[PALM_FB_MAX] = {0};  // 位置最后一次更新的 millis()
+bool palmFbValid[PALM_FB_MAX] = {false};
+
 // 寄存器地址映射（根据你的Modbus协议定义）
 #define REG_COMMAND       0   // 命令寄存器
 #define REG_DEVICE_TYPE   1   // 设备类型
@@ -45,6 +114,15 @@ uint16_t holdingRegisters[HOLDING_REGISTERS_SIZE] = {0};
 #define REG_GROUP_COUNT   6   // 组控数量
 #define REG_GROUP_START   10  // 组控数据起始地址
 
+// ID扫描 (命令0x07): REG_DEVICE_TYPE 0=电缸 1=舵机 2=同时扫描, REG_DEVICE_ID 起始ID, REG_POSITION 数量(<=32)
+// 结果: 一次读取 REG_SCAN_STATUS 起的5个寄存器即可得到状态和两张位图 (bit i 对应 起始ID+i)
+#define REG_SCAN_STATUS     48
+#define REG_SCAN_FINGER_MAP 49  // 2个寄存器, 低16位在前
+#define REG_SCAN_PALM_MAP   51  // 2个寄存器, 低16位在前
+#define SCAN_WINDOW         32
+#define SCAN_FINGER_TIMEOUT_US 1500  // 电缸 921600 波特率, 应答约0.1ms
+#define SCAN_PALM_TIMEOUT_US   3000  // 舵机 115200 波特率, 请求后固定等待0.55ms
+
 void setup() {
     // 初始化调试串口（USB）
     // DEBUG_SERIAL.begin(115200);
@@ -87,9 +165,13 @@ void loop() {
         handleIncomingData();
     }
     
-    if (bufferIndex > 0 && (millis() - lastReceiveTime > 100)) {
+    if (bufferIndex > 0 && (micros() - lastReceiveTime > MODBUS_FRAME_GAP_US)) {
         processCompletePacket();
     }
+
+    serviceTrajectory();
+    serviceSchedule();
+    servicePalmFeedback();
     
     static uint32_t lastStatusTime = 0;
     if (millis() - lastStatusTime > 5000) {
@@ -97,14 +179,20 @@ void loop() {
         // DEBUG_SERIAL.print("状态: 监听中... 最后状态: 0x");
         // DEBUG_SERIAL.println(holdingRegisters[REG_STATUS], HEX);
     }
-    
-    delay(10);
 }
 
 // 初始化保持寄存器默认值
 void initializeHoldingRegisters() {
     // 设置默认状态
     holdingRegisters[REG_STATUS] = 0xA0; // 默认空闲状态
+    // 默认轮询手掌舵机1-3
+    holdingRegisters[REG_PALM_FB_COUNT] = 3;
+    for (int i = 0; i < 3; i++) {
+        holdingRegisters[REG_PALM_FB_IDS + i] = i + 1;
+    }
+    for (int i = 0; i < PALM_FB_MAX; i++) {
+        holdingRegisters[REG_PALM_FB_DATA + i * PALM_FB_STRIDE + 3] = 0xFFFF;
+    }
     
     // DEBUG_SERIAL.println("保持寄存器初始化完成");
     printRegisterMap();
@@ -142,6 +230,10 @@ void handleWriteSingleRegister(uint8_t slaveAddress, uint16_t regAddress, uint16
         sendErrorResponse(slaveAddress, 0x06, 0x02); // 非法数据地址
         return;
     }
+    if (trajectoryLocked(regAddress, 1)) {
+        sendErrorResponse(slaveAddress, 0x06, 0x06); // 从站忙: 轨迹播放中
+        return;
+    }
     
     // 更新保持寄存器
     holdingRegisters[regAddress] = regValue;
@@ -177,6 +269,18 @@ void handleCommandExecution(uint16_t command) {
             holdingRegisters[REG_STATUS] = 0xF0;
             executeClearError();
             break;
+        case 0x07: // ID扫描
+            executeScan();
+            break;
+        case 0x08: // 播放轨迹
+            startTrajectory();
+            break;
+        case 0x09: // 停止轨迹
+            stopTrajectory();
+            break;
+        case 0x0A: // 定时执行
+            scheduleCommand();
+            break;
         default:
             holdingRegisters[REG_STATUS] = 0xE0; // 无效命令
             // DEBUG_SERIAL.println("错误: 无效命令");
@@ -204,7 +308,7 @@ void executeSingleControl() {
     // DEBUG_SERIAL.println("=========================");
     
     if (devType == 1) { // 舵机单控
-        BusServo.LobotSerialServoMove(devId, position, execTime);
+        palmMove(devId, position, execTime);
     } 
     else if (devType == 0) { // 电缸单控
         servo.setPosition(devId, position);
@@ -254,7 +358,7 @@ void executeGroupControl() {
     } 
     else if (devType == 1) { // 舵机组控
         for (int j = 0; j < groupCount; j++) {
-            BusServo.LobotSerialServoMove(idArray[j], posArray[j], timeArray[j]);
+            palmMove(idArray[j], posArray[j], timeArray[j]);
         }
         
     }
@@ -275,6 +379,256 @@ void executeClearError() {
     servo.clearError(devId);
 }
 
+// 执行ID扫描: 电缸和舵机在两条独立串口上, 每个ID同时发出两路请求, 等待时间取两者中较长的一个
+void executeScan() {
+    uint8_t devType = holdingRegisters[REG_DEVICE_TYPE];
+    uint16_t startId = holdingRegisters[REG_DEVICE_ID];
+    uint16_t count = holdingRegisters[REG_POSITION];
+    bool scanFingers = (devType == 0 || devType == 2);
+    bool scanPalms = (devType == 1 || devType == 2);
+
+    if (!scanFingers && !scanPalms) {
+        holdingRegisters[REG_STATUS] = 0xE1;
+        holdingRegisters[REG_SCAN_STATUS] = 0xE1;
+        return;
+    }
+    if (startId < 1 || count < 1 || count > SCAN_WINDOW || startId + count - 1 > 253) {
+        holdingRegisters[REG_STATUS] = 0xEE;
+        holdingRegisters[REG_SCAN_STATUS] = 0xEE;
+        return;
+    }
+
+    uint32_t fingerMap = 0;
+    uint32_t palmMap = 0;
+    byte reply[8];
+    waitPalmFeedbackIdle();
+
+    for (uint16_t i = 0; i < count; i++) {
+        uint8_t id = startId + i;
+        bool fingerPending = scanFingers;
+        bool palmPending = scanPalms;
+        if (fingerPending) servo.requestID(id);
+        if (palmPending) BusServo.LobotSerialServoRequestID(id);
+
+        uint32_t start = micros();
+        while (fingerPending || palmPending) {
+            uint32_t elapsed = micros() - start;
+            if (fingerPending) {
+                if (servo.pollIDReply(id)) {
+                    fingerMap |= (1UL << i);
+                    fingerPending = false;
+                } else if (elapsed > SCAN_FINGER_TIMEOUT_US) {
+                    fingerPending = false;
+                }
+            }
+            if (palmPending) {
+                if (BusServoSerial.available()) {
+                    if (BusServo.LobotSerialServoReceiveHandle(reply) > 0 && reply[1] == id) {
+                        palmMap |= (1UL << i);
+                    }
+                    palmPending = false;
+                } else if (elapsed > SCAN_PALM_TIMEOUT_US) {
+                    palmPending = false;
+                }
+            }
+        }
+    }
+
+    holdingRegisters[REG_SCAN_FINGER_MAP] = fingerMap & 0xFFFF;
+    holdingRegisters[REG_SCAN_FINGER_MAP + 1] = fingerMap >> 16;
+    holdingRegisters[REG_SCAN_PALM_MAP] = palmMap & 0xFFFF;
+    holdingRegisters[REG_SCAN_PALM_MAP + 1] = palmMap >> 16;
+    holdingRegisters[REG_STATUS] = 0x93;
+    holdingRegisters[REG_SCAN_STATUS] = 0x93;
+}
+
+// 等待进行中的反馈读取结束 (最多 PALM_FB_TIMEOUT_US), 避免舵机应答与下发的命令在半双工总线上冲突
+void waitPalmFeedbackIdle() {
+    while (palmFbPending) {
+        servicePalmFeedback();
+    }
+}
+
+void palmMove(uint8_t id, int16_t position, uint16_t time) {
+    waitPalmFeedbackIdle();
+    BusServo.LobotSerialServoMove(id, position, time);
+}
+
+// 手掌反馈轮询: 每次调用最多发出一个请求或收取一个应答
+void servicePalmFeedback() {
+    uint8_t count = holdingRegisters[REG_PALM_FB_COUNT];
+    if (count > PALM_FB_MAX) count = PALM_FB_MAX;
+
+    if (palmFbPending) {
+        uint8_t slot = palmFbRequestSlot;
+        uint16_t base = REG_PALM_FB_DATA + slot * PALM_FB_STRIDE;
+        byte reply[8];
+        if (BusServo.LobotSerialServoPollReply(palmFbIds[slot], palmFbRequestCmd, reply) > 0) {
+            int16_t value = (int16_t)BYTE_TO_HW(reply[2], reply[1]);
+            if (palmFbRequestCmd == LOBOT_SERVO_POS_READ) {
+                holdingRegisters[base] = (uint16_t)value;
+                palmFbUpdated[slot] = millis();
+                palmFbValid[slot] = true;
+            } else if (palmFbRequestCmd == LOBOT_SERVO_TEMP_READ) {
+                holdingRegisters[base + 1] = reply[1];
+            } else {
+                holdingRegisters[base + 2] = (uint16_t)value;
+            }
+            holdingRegisters[base + 4] = 0;
+            palmFbPending = false;
+        } else if (micros() - palmFbRequestMicros > PALM_FB_TIMEOUT_US) {
+            if (holdingRegisters[base + 4] < 0xFFFF) holdingRegisters[base + 4]++;
+            palmFbPending = false;
+        }
+        return;
+    }
+    if (count == 0) {
+        palmFbSlot = 0;
+        return;
+    }
+
+    // 主机改写了ID: 旧数据作废
+    for (uint8_t i = 0; i < count; i++) {
+        if (palmFbIds[i] != holdingRegisters[REG_PALM_FB_IDS + i]) {
+            uint16_t base = REG_PALM_FB_DATA + i * PALM_FB_STRIDE;
+            palmFbIds[i] = holdingRegisters[REG_PALM_FB_IDS + i];
+            palmFbValid[i] = false;
+            for (uint8_t j = 0; j < PALM_FB_STRIDE; j++) {
+                holdingRegisters[base + j] = 0;
+            }
+            holdingRegisters[base + 3] = 0xFFFF;
+        }
+    }
+
+    if (palmFbSlot >= count) {
+        // 本轮的慢速项: 温度或电压
+        if (palmFbSlow >= count * 2) palmFbSlow = 0;
+        palmFbRequestSlot = palmFbSlow / 2;
+        palmFbRequestCmd = (palmFbSlow % 2 == 0) ? LOBOT_SERVO_TEMP_READ : LOBOT_SERVO_VIN_READ;
+        palmFbSlow++;
+        palmFbSlot = 0;
+        holdingRegisters[REG_PALM_FB_ROUNDS]++;
+    } else {
+        palmFbRequestSlot = palmFbSlot++;
+        palmFbRequestCmd = LOBOT_SERVO_POS_READ;
+    }
+    BusServo.LobotSerialServoRequest(palmFbIds[palmFbRequestSlot], palmFbRequestCmd);
+    palmFbRequestMicros = micros();
+    palmFbPending = true;
+}
+
+// 校验并开始播放轨迹缓冲区
+void startTrajectory() {
+    uint16_t fingerCount = holdingRegisters[REG_TRAJ_FINGER_COUNT];
+    uint16_t palmCount = holdingRegisters[REG_TRAJ_PALM_COUNT];
+    uint16_t points = holdingRegisters[REG_TRAJ_POINTS];
+    uint16_t stride = 1 + fingerCount + palmCount;
+
+    if (fingerCount > TRAJ_MAX_DEVICES || palmCount > TRAJ_MAX_DEVICES || stride == 1 ||
+        points == 0 || (uint32_t)points * stride > TRAJ_BUFFER_SIZE) {
+        holdingRegisters[REG_STATUS] = 0xF1; // 轨迹无效
+        return;
+    }
+    // 路点时间必须递增
+    for (uint16_t i = 1; i < points; i++) {
+        if (holdingRegisters[REG_TRAJ_BUFFER + i * stride] < holdingRegisters[REG_TRAJ_BUFFER + (i - 1) * stride]) {
+            holdingRegisters[REG_STATUS] = 0xF1;
+            return;
+        }
+    }
+    holdingRegisters[REG_TRAJ_INDEX] = 0;
+    holdingRegisters[REG_TRAJ_ELAPSED] = 0;
+    holdingRegisters[REG_TRAJ_STATUS] = TRAJ_PLAYING;
+    holdingRegisters[REG_STATUS] = 0x94;
+    trajStartMillis = millis();
+    serviceTrajectory();
+}
+
+void stopTrajectory() {
+    if (holdingRegisters[REG_TRAJ_STATUS] == TRAJ_PLAYING) {
+        holdingRegisters[REG_TRAJ_STATUS] = TRAJ_STOPPED;
+    }
+    holdingRegisters[REG_STATUS] = 0x95;
+}
+
+// 播放期间轨迹头部和缓冲区只读
+bool trajectoryLocked(uint16_t startAddr, uint16_t quantity) {
+    return holdingRegisters[REG_TRAJ_STATUS] == TRAJ_PLAYING &&
+           startAddr + quantity > REG_TRAJ_FINGER_COUNT && startAddr < REG_TRAJ_BUFFER + TRAJ_BUFFER_SIZE;
+}
+
+// 登记定时命令, 同一时间只有一个; 时间已过时在下一次主循环立即执行
+void scheduleCommand() {
+    uint16_t command = holdingRegisters[REG_EXEC_CMD];
+    if (command != 0x01 && command != 0x02 && command != 0x08 && command != 0x09) {
+        holdingRegisters[REG_STATUS] = 0xF2; // 定时命令无效
+        return;
+    }
+    execAtMicros = holdingRegisters[REG_EXEC_AT_LO] | ((uint32_t)holdingRegisters[REG_EXEC_AT_HI] << 16);
+    holdingRegisters[REG_EXEC_STATE] = EXEC_PENDING;
+    holdingRegisters[REG_STATUS] = 0x96;
+}
+
+// 在主循环中调用: 到时执行定时命令并记录实际执行时间 (micros() 回绕安全)
+void serviceSchedule() {
+    if (holdingRegisters[REG_EXEC_STATE] != EXEC_PENDING) return;
+    uint32_t now = micros();
+    if ((int32_t)(now - execAtMicros) < 0) return;
+    holdingRegisters[REG_EXEC_ACTUAL_LO] = now & 0xFFFF;
+    holdingRegisters[REG_EXEC_ACTUAL_HI] = now >> 16;
+    holdingRegisters[REG_EXEC_STATE] = EXEC_DONE;
+    handleCommandExecution(holdingRegisters[REG_EXEC_CMD]);
+}
+
+// 在主循环中调用: 按设备时钟执行到期的路点, 不阻塞Modbus接收
+void serviceTrajectory() {
+    if (holdingRegisters[REG_TRAJ_STATUS] != TRAJ_PLAYING) return;
+
+    uint32_t elapsed = millis() - trajStartMillis;
+    holdingRegisters[REG_TRAJ_ELAPSED] = elapsed > 0xFFFF ? 0xFFFF : elapsed;
+
+    uint16_t fingerCount = holdingRegisters[REG_TRAJ_FINGER_COUNT];
+    uint16_t palmCount = holdingRegisters[REG_TRAJ_PALM_COUNT];
+    uint16_t points = holdingRegisters[REG_TRAJ_POINTS];
+    uint16_t stride = 1 + fingerCount + palmCount;
+    uint16_t index = holdingRegisters[REG_TRAJ_INDEX];
+
+    // 落后多个路点时只执行最新的一个, 不回放过期的中间位置
+    int32_t due = -1;
+    while (index < points && holdingRegisters[REG_TRAJ_BUFFER + index * stride] <= elapsed) {
+        due = index;
+        index++;
+    }
+    if (due >= 0) {
+        uint16_t base = REG_TRAJ_BUFFER + due * stride;
+        if (fingerCount > 0) {
+            uint8_t idArray[TRAJ_MAX_DEVICES];
+            int16_t posArray[TRAJ_MAX_DEVICES];
+            for (uint16_t i = 0; i < fingerCount; i++) {
+                idArray[i] = holdingRegisters[REG_TRAJ_FINGER_IDS + i];
+                posArray[i] = holdingRegisters[base + 1 + i];
+            }
+            servo.moveFingers(fingerCount, idArray, posArray);
+        }
+        if (palmCount > 0) {
+            uint16_t moveTime = 0;
+            if (due + 1 < points) {
+                moveTime = holdingRegisters[base + stride] - holdingRegisters[base];
+            } else if (due > 0) {
+                moveTime = holdingRegisters[base] - holdingRegisters[base - stride];
+            }
+            for (uint16_t i = 0; i < palmCount; i++) {
+                palmMove(holdingRegisters[REG_TRAJ_PALM_IDS + i],
+                         holdingRegisters[base + 1 + fingerCount + i], moveTime);
+            }
+        }
+        holdingRegisters[REG_TRAJ_INDEX] = index;
+    }
+    if (index >= points) {
+        holdingRegisters[REG_TRAJ_STATUS] = TRAJ_DONE;
+    }
+}
+
 // 处理读保持寄存器请求
 void handleReadHoldingRegisters(uint8_t slaveAddress, uint16_t startAddr, uint16_t quantity) {
     // DEBUG_SERIAL.print("处理读保持寄存器: 起始地址=");
@@ -283,11 +637,30 @@ void handleReadHoldingRegisters(uint8_t slaveAddress, uint16_t startAddr, uint16
     // DEBUG_SERIAL.println(quantity);
     
     // 验证地址范围
+    if (quantity < 1 || quantity > MAX_READ_QUANTITY) {
+        sendErrorResponse(slaveAddress, 0x03, 0x03); // 非法数据值
+        return;
+    }
     if (startAddr + quantity > HOLDING_REGISTERS_SIZE) {
         // DEBUG_SERIAL.println("错误: 寄存器地址超出范围");
         sendErrorResponse(slaveAddress, 0x03, 0x02); // 非法数据地址
         return;
     }
+    // 锁存时钟, 两个寄存器来自同一时刻
+    if (startAddr <= REG_CLOCK_HI && startAddr + quantity > REG_CLOCK_LO) {
+        uint32_t now = micros();
+        holdingRegisters[REG_CLOCK_LO] = now & 0xFFFF;
+        holdingRegisters[REG_CLOCK_HI] = now >> 16;
+    }
+    // 反馈数据年龄在读取时计算
+    if (startAddr < REG_PALM_FB_DATA + PALM_FB_MAX * PALM_FB_STRIDE && startAddr + quantity > REG_PALM_FB_DATA) {
+        uint32_t now = millis();
+        for (uint8_t i = 0; i < PALM_FB_MAX; i++) {
+            uint32_t age = now - palmFbUpdated[i];
+            holdingRegisters[REG_PALM_FB_DATA + i * PALM_FB_STRIDE + 3] =
+                (!palmFbValid[i] || age > 0xFFFE) ? 0xFFFF : age;
+        }
+    }
     
     // 准备响应数据
     uint8_t response[3 + quantity * 2 + 2]; // 地址+功能码+字节数+数据+CRC
@@ -311,6 +684,45 @@ void handleReadHoldingRegisters(uint8_t slaveAddress, uint16_t startAddr, uint16
     sendModbusResponse(response, 3 + quantity * 2 + 2);
 }
 
+// 处理写多个寄存器请求 (FC16), 写入范围包含命令寄存器时在全部写入后执行命令
+void handleWriteMultipleRegisters(uint8_t slaveAddress, uint16_t startAddr, uint16_t quantity) {
+    uint8_t byteCount = receiveBuffer[6];
+    if (quantity < 1 || quantity > MAX_WRITE_QUANTITY || byteCount != quantity * 2 ||
+        bufferIndex != 9 + byteCount) {
+        sendErrorResponse(slaveAddress, 0x10, 0x03); // 非法数据值
+        return;
+    }
+    if (startAddr + quantity > HOLDING_REGISTERS_SIZE) {
+        sendErrorResponse(slaveAddress, 0x10, 0x02); // 非法数据地址
+        return;
+    }
+    if (trajectoryLocked(startAddr, quantity)) {
+        sendErrorResponse(slaveAddress, 0x10, 0x06); // 从站忙: 轨迹播放中
+        return;
+    }
+
+    for (uint16_t i = 0; i < quantity; i++) {
+        holdingRegisters[startAddr + i] = (receiveBuffer[7 + i * 2] << 8) | receiveBuffer[8 + i * 2];
+    }
+    if (startAddr == REG_COMMAND) {
+        handleCommandExecution(holdingRegisters[REG_COMMAND]);
+    }
+
+    uint8_t response[8];
+    response[0] = slaveAddress;
+    response[1] = 0x10;
+    response[2] = (startAddr >> 8) & 0xFF;
+    response[3] = startAddr & 0xFF;
+    response[4] = (quantity >> 8) & 0xFF;
+    response[5] = quantity & 0xFF;
+
+    uint16_t crc = calculateCRC(response, 6);
+    response[6] = crc & 0xFF;
+    response[7] = crc >> 8;
+
+    sendModbusResponse(response, sizeof(response));
+}
+
 // 发送写寄存器成功响应
 void sendWriteRegisterResponse(uint8_t slaveAddress, uint16_t regAddress, uint16_t regValue) {
     uint8_t response[8];
@@ -366,7 +778,7 @@ void sendModbusResponse(uint8_t *data, uint16_t length) {
 
 
 void handleIncomingData() {
-    lastReceiveTime = millis();
+    lastReceiveTime = micros();
     
     while (RS485Serial.available() && bufferIndex < sizeof(receiveBuffer)) {
         uint8_t data = RS485Serial.read();
@@ -439,6 +851,9 @@ void analyzeModbusFrame() {
         case 0x06: // 写单个寄存器
             handleWriteSingleRegister(slaveAddress, address, quantity);
             break;
+        case 0x10: // 写多个寄存器
+            handleWriteMultipleRegisters(slaveAddress, address, quantity);
+            break;
         default:
             // DEBUG_SERIAL.println("不支持的功能码");
             sendErrorResponse(slaveAddress, functionCode, 0x01); // 非法功能
@@ -396,6 +396,83 @@ int LobotSerialServoControl::LobotSerialServoControl::LobotSerialServoReadID(uin
   return ret;
 }
 
+void LobotSerialServoControl::LobotSerialServoRequest(uint8_t id, uint8_t cmd)
+{
+  byte buf[6];
+
+  buf[0] = buf[1] = LOBOT_SERVO_FRAME_HEADER;
+  buf[2] = id;
+  buf[3] = 3;
+  buf[4] = cmd;
+  buf[5] = LobotCheckSum(buf);
+
+  while (SerialX->available())
+    SerialX->read();
+  replyCount = 0;
+
+  if(isAutoEnableRT == false)
+    TxEnable();
+  SerialX->write(buf, 6);
+  if(isUseHardwareSerial)
+  {
+    delayMicroseconds(550);
+  }
+  if(isAutoEnableRT == false)
+    RxEnable();
+}
+
+// 取出已到达的字节, 找到 id/cmd 匹配且校验正确的应答帧后把参数 (从指令字节开始) 复制到 ret
+// 不等待串口, 帧未收齐时返回 0, 由调用者决定超时
+int LobotSerialServoControl::LobotSerialServoPollReply(uint8_t id, uint8_t cmd, byte *ret)
+{
+  while (SerialX->available() && replyCount < sizeof(replyBuf))
+    replyBuf[replyCount++] = SerialX->read();
+
+  for (byte i = 0; i + 4 <= replyCount; i++) {
+    if (replyBuf[i] != LOBOT_SERVO_FRAME_HEADER || replyBuf[i + 1] != LOBOT_SERVO_FRAME_HEADER)
+      continue;
+    byte dataLength = replyBuf[i + 3];
+    if (dataLength < 3 || dataLength > 7)
+      continue;
+    if (i + dataLength + 3 > replyCount)
+      return 0;
+    // 请求的回显 (长度3) 和其它舵机的帧都跳过
+    if (replyBuf[i + 2] == id && replyBuf[i + 4] == cmd && dataLength > 3 &&
+        LobotCheckSum(replyBuf + i) == replyBuf[i + dataLength + 2]) {
+      memcpy(ret, replyBuf + i + 4, dataLength);
+      replyCount = 0;
+      return 1;
+    }
+  }
+  if (replyCount == sizeof(replyBuf))
+    replyCount = 0;
+  return 0;
+}
+
+void LobotSerialServoControl::LobotSerialServoRequestID(uint8_t id)
+{
+  byte buf[6];
+
+  buf[0] = buf[1] = LOBOT_SERVO_FRAME_HEADER;
+  buf[2] = id;
+  buf[3] = 3;
+  buf[4] = LOBOT_SERVO_ID_READ;
+  buf[5] = LobotCheckSum(buf);
+
+  while (SerialX->available())
+    SerialX->read();
+
+  if(isAutoEnableRT == false)
+    TxEnable();
+  SerialX->write(buf, 6);
+  if(isUseHardwareSerial)
+  {
+    delayMicroseconds(550);
+  }
+  if(isAutoEnableRT == false)
+    RxEnable();
+}
+
 int LobotSerialServoControl::LobotSerialServoReadTemp(uint8_t id)
 {
   int count = 10000;
@@ -67,6 +67,9 @@ class LobotSerialServoControl {
     int LobotSerialServoReadPosition(uint8_t id);
     int LobotSerialServoReadVin(uint8_t id);
     int LobotSerialServoReadID(uint8_t id);
+    void LobotSerialServoRequestID(uint8_t id);   // 只发送读ID请求, 应答由 LobotSerialServoReceiveHandle 解析
+    void LobotSerialServoRequest(uint8_t id, uint8_t cmd);        // 只发送读请求 (POS/TEMP/VIN等), 不等待应答
+    int LobotSerialServoPollReply(uint8_t id, uint8_t cmd, byte *ret); // 非阻塞解析应答: 1完成 0未收齐
     int LobotSerialServoReadTemp(uint8_t id);
     int LobotSerialServoReadDev(uint8_t id);
     int LobotSerialServoReadAngleRange(uint8_t id);
@@ -78,6 +81,8 @@ class LobotSerialServoControl {
     int vinL;
     int vinH;
   protected:
+    byte replyBuf[32];   // LobotSerialServoPollReply 累积的应答字节
+    byte replyCount;
     byte LobotCheckSum(byte buf[]);
     inline void RxEnable(void);
     inline void TxEnable(void);
@@ -5,7 +5,7 @@
 #include "MicroServoControl.h"
 
 MicroServoController::MicroServoController(HardwareSerial &serial, uint32_t baud) : 
-  _serial(&serial), _baudRate(baud) {}
+  _serial(&serial), _baudRate(baud), _rxCount(0) {}
 
 void MicroServoController::InitServo() {
 //  _serial->begin(_baudRate, SERIAL_8N1, RX_PIN, TX_PIN);
@@ -113,6 +113,48 @@ void MicroServoController::clearError(uint8_t id){
   _serial->write(buf, 10);
 }
 
+void MicroServoController::requestID(uint8_t id){
+  byte buf[8];
+
+  buf[0] = 0x55;                                // 帧头
+  buf[1] = 0xAA;
+  buf[2] = 3;                                   // 帧长度
+  buf[3] = id;                                  // ID号
+  buf[4] = CMD_READ;                            // 读指令
+  buf[5] = 0x02;                                // 控制表索引: ID
+  buf[6] = 0x01;                                // 读取长度
+  buf[7] = calculateChecksum(buf, 6);
+
+  while (_serial->available()) {
+    _serial->read();
+  }
+  _rxCount = 0;
+  _serial->write(buf, 8);
+}
+
+
+bool MicroServoController::pollIDReply(uint8_t id){
+  // 应答帧: AA 55 len id cmd index data checksum
+  while (_serial->available()) {
+    uint8_t data = _serial->read();
+    if (_rxCount == 0 && data != 0xAA) continue;
+    if (_rxCount == 1 && data != 0x55) {
+      _rxCount = 0;
+      continue;
+    }
+    if (_rxCount < sizeof(_rxBuf)) {
+      _rxBuf[_rxCount++] = data;
+    }
+    if (_rxCount >= 3 && _rxCount == _rxBuf[2] + 5) {
+      _rxCount = 0;
+      if (_rxBuf[_rxBuf[2] + 4] == calculateChecksum(_rxBuf, _rxBuf[2] + 3) && _rxBuf[3] == id) {
+        return true;
+      }
+    }
+  }
+  return false;
+}
+
 
 
 
@@ -42,6 +42,9 @@ class MicroServoController {
     
     uint8_t calculateChecksum(uint8_t *data, uint8_t len);
     
+    uint8_t _rxBuf[16];
+    uint8_t _rxCount;
+
   public:
     MicroServoController(HardwareSerial &serial, uint32_t baud = DEFAULT_BAUDRATE);
     void InitServo();
@@ -51,6 +54,8 @@ class MicroServoController {
     void setPosition(uint8_t id, int16_t position);           // 绝对定位
     void clearError(uint8_t id);                              // 故障清除
     void moveFingers(uint8_t num, uint8_t id_list[], int16_t pos_list[]);  // 广播定位模式
+    void requestID(uint8_t id);                               // 发送读ID请求, 不等待应答
+    bool pollIDReply(uint8_t id);                             // 非阻塞解析应答, 收到该ID的应答返回true
     
 };
 
@@ -0,0 +1,133 @@
+"""
+上位机与控制器 (ESP32) 的时钟同步
+  - NTP 方式采样: 上位机发送时刻 t0, 控制器收到/应答时刻 Rx/Tx (micros()), 上位机收到时刻 t3
+    偏差 = ((Rx - t0) + (Tx - t3)) / 2, 往返延迟 = (t3 - t0) - (Tx - Rx)
+  - 只用延迟最小的四分之一样本, 对偏差随时间做线性拟合, 斜率即漂移
+  - 控制器时钟是32位微秒计数 (约71分钟回绕), 这里统一展开为连续的秒数
+  - 定时执行的命令返回实际执行时刻后, record_execution 统计执行时间误差
+
+用法:
+    clock = ClockSync()
+    clock.add_sample(t0, rx, t3, tx)
+    at = clock.to_device(time.monotonic() + 0.05)   # 50ms 后对应的控制器 micros()
+    print(clock.report())
+"""
+
+import time
+from collections import deque, namedtuple
+
+
+# offset: 控制器时间 - 上位机时间 (秒, 当前时刻); drift: 漂移 (ppm); delay: 最小往返延迟 (秒)
+ClockEstimate = namedtuple('ClockEstimate', ['offset', 'drift', 'delay', 'samples'])
+
+
+class ClockSync:
+    def __init__(self, window=32, bits=32, resolution=1e-6, clock=time.monotonic):
+        """
+        :param window: 保留的最近样本数
+        :param bits: 控制器计数器位数
+        :param resolution: 计数器每个单位的秒数 (micros() 为 1e-6)
+        :param clock: 上位机时钟
+        """
+        self.resolution = resolution
+        self.clock = clock
+        self._mask = (1 << bits) - 1
+        self._half = 1 << (bits - 1)
+        self._last_raw = None
+        self._samples = deque(maxlen=window)  # (上位机时间, 偏差, 往返延迟)
+        self._fit = None  # (参考时间, 参考时刻的偏差, 斜率)
+        self.execution_errors = deque(maxlen=256)
+
+    def unwrap(self, raw):
+        """把回绕的计数值展开为相对第一个样本的连续计数 (相邻两次间隔须小于半个回绕周期)"""
+        if self._last_raw is None:
+            self._last_raw = raw & self._mask
+            return self._last_raw
+        delta = (raw - self._last_raw) & self._mask
+        if delta >= self._half:
+            delta -= self._mask + 1
+        self._last_raw += delta
+        return self._last_raw
+
+    def add_sample(self, t_send, device_rx, t_recv, device_tx=None):
+        """
+        :param t_send / t_recv: 上位机发送请求和收到应答的时刻 (self.clock)
+        :param device_rx: 控制器收到请求时的计数值
+        :param device_tx: 控制器发出应答时的计数值, None 表示与 device_rx 相同
+        """
+        rx = self.unwrap(device_rx) * self.resolution
+        tx = rx if device_tx is None else self.unwrap(device_tx) * self.resolution
+        offset = ((rx - t_send) + (tx - t_recv)) / 2
+        delay = (t_recv - t_send) - (tx - rx)
+        self._samples.append(((t_send + t_recv) / 2, offset, delay))
+        self._refit()
+
+    def add_point(self, host_time, device_raw, delay):
+        """
+        已知控制器锁存计数值时对应的上位机时刻 (例如由发送时刻加上固定的传输时间推算) 时使用
+        :param delay: 本次往返延迟, 只用于挑选样本
+        """
+        self._samples.append((host_time, self.unwrap(device_raw) * self.resolution - host_time, delay))
+        self._refit()
+
+    def _refit(self):
+        samples = sorted(self._samples, key=lambda s: s[2])[:max(1, len(self._samples) // 4)]
+        t_ref = sum(s[0] for s in samples) / len(samples)
+        o_ref = sum(s[1] for s in samples) / len(samples)
+        denominator = sum((s[0] - t_ref) ** 2 for s in samples)
+        # 样本时间跨度太短时漂移不可信
+        slope = 0.0
+        if len(samples) >= 4 and denominator > 0 and max(s[0] for s in samples) - min(s[0] for s in samples) > 1.0:
+            slope = sum((s[0] - t_ref) * (s[1] - o_ref) for s in samples) / denominator
+        self._fit = (t_ref, o_ref, slope)
+
+    @property
+    def synchronized(self):
+        return self._fit is not None
+
+    def offset(self, host_time=None):
+        """:return: host_time 时刻的 控制器时间 - 上位机时间 (秒)"""
+        if self._fit is None:
+            raise RuntimeError("时钟尚未同步")
+        t_ref, o_ref, slope = self._fit
+        host_time = self.clock() if host_time is None else host_time
+        return o_ref + slope * (host_time - t_ref)
+
+    def to_device(self, host_time):
+        """:return: 上位机时刻 host_time 对应的控制器计数值 (已回绕, 可直接发给控制器)"""
+        return int(round((host_time + self.offset(host_time)) / self.resolution)) & self._mask
+
+    def to_host(self, device_raw):
+        """:return: 控制器计数值对应的上位机时刻"""
+        device_time = self.unwrap(device_raw) * self.resolution
+        t_ref, o_ref, slope = self._fit
+        # device = host + o_ref + slope * (host - t_ref)
+        return (device_time - o_ref + slope * t_ref) / (1 + slope)
+
+    def record_execution(self, scheduled_raw, actual_raw):
+        """
+        :return: 实际执行时刻 - 计划执行时刻 (秒), 正值表示晚于计划
+        """
+        error = (((actual_raw - scheduled_raw) & self._mask) ^ self._half) - self._half
+        error *= self.resolution
+        self.execution_errors.append(error)
+        return error
+
+    def estimate(self):
+        if self._fit is None:
+            return ClockEstimate(None, None, None, 0)
+        return ClockEstimate(self.offset(), self._fit[2] * 1e6, min(s[2] for s in self._samples), len(self._samples))
+
+    def report(self):
+        """:return: dict, 偏差/延迟/执行误差单位为秒, 漂移单位为 ppm"""
+        estimate = self.estimate()
+        errors = list(self.execution_errors)
+        return {
+            'offset': estimate.offset,
+            'drift_ppm': estimate.drift,
+            'min_delay': estimate.delay,
+            'samples': estimate.samples,
+            'executions': len(errors),
+            'exec_error_mean': sum(errors) / len(errors) if errors else None,
+            'exec_error_max': max(errors, key=abs) if errors else None,
+        }
@@ -0,0 +1,240 @@
+"""
+DH5 波特率协商与迁移工具
+  - 探测: 依次尝试候选波特率, 读取初始化状态寄存器, 收到CRC正确的应答即认为找到当前波特率
+  - 切换: 在当前波特率下写入串口配置 (0x0302), 本地端口切到新波特率后做CRC校验的压力测试
+  - 测试通过才保存参数 (0x0300), 失败则自动回退到原波特率
+  - 每个候选波特率都记录反馈读取延迟, 便于比较
+
+注意: 0x0302 写入的是编码值而不是波特率本身, BAUD_CODES 只包含手册给出的编码 (115200 及以下)
+      更高的波特率没有已确认的编码, 默认不会尝试; 固件支持时由调用者通过 baud_codes 传入编码,
+      例如 BaudNegotiator(api, baud_codes={921600: 编码})
+"""
+
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from dh5_control import DH5ModbusAPI
+
+
+BAUD_CODES = {
+    115200: 0,
+    57600: 1,
+    38400: 2,
+    19200: 3,
+    9600: 4,
+    4800: 5,
+}
+PARITY_CODES = {'N': 0, 'O': 1, 'E': 2}
+STOP_BITS_CODES = {1: 0, 2: 1}
+
+CANDIDATE_BAUDS = (115200, 57600, 38400, 19200, 9600)
+
+FEEDBACK_START = 0x0201
+FEEDBACK_COUNT = 24
+
+# passed: 压力测试无任何错误; errors: 错误码 -> 次数; 延迟单位毫秒
+SoakResult = namedtuple('SoakResult', ['baud_rate', 'passed', 'transactions', 'errors',
+                                       'p50_ms', 'p99_ms', 'max_ms'])
+
+
+def _switch_local(api, baud_rate):
+    """只切换本机串口波特率 (pyserial 支持在打开状态下修改)"""
+    api.set_config(baud_rate=baud_rate)
+    api.serial_connection.baudrate = baud_rate
+    # 切换瞬间可能收到半帧乱码
+    time.sleep(0.01)
+    api.serial_connection.reset_input_buffer()
+    api.reader.invalidate()
+
+
+def _ping(api, attempts=2):
+    for _ in range(attempts):
+        response = api.send_modbus_command(function_code=0x03, register_address=0x0200, data_length=1)
+        if isinstance(response, list):
+            return True
+    return False
+
+
+def probe_baud(api, candidates=CANDIDATE_BAUDS, timeout=0.1):
+    """
+    探测设备当前波特率, api 需已打开连接
+    :return: 找到的波特率, 找不到返回 None (此时本地波特率恢复为探测前的值)
+    """
+    original_baud = api.baud_rate
+    original_timeout = api.serial_connection.timeout
+    api.serial_connection.timeout = timeout
+    try:
+        # 先试当前配置, 大多数情况下不需要扫描
+        for baud_rate in [original_baud] + [b for b in candidates if b != original_baud]:
+            _switch_local(api, baud_rate)
+            if _ping(api):
+                return baud_rate
+        _switch_local(api, original_baud)
+        return None
+    finally:
+        api.serial_connection.timeout = original_timeout
+
+
+def soak_test(api, transactions=500):
+    """
+    在当前波特率下连续读取反馈寄存器, 每帧都经过CRC和长度校验, 不使用缓存
+    :return: SoakResult
+    """
+    latencies = []
+    errors = {}
+    for _ in range(transactions):
+        start = time.perf_counter()
+        response = api.send_modbus_command(function_code=0x03, register_address=FEEDBACK_START,
+                                           data_length=FEEDBACK_COUNT)
+        latencies.append(time.perf_counter() - start)
+        if not isinstance(response, list) or len(response) != FEEDBACK_COUNT:
+            key = response if isinstance(response, int) else DH5ModbusAPI.ERROR_INVALID_RESPONSE
+            errors[key] = errors.get(key, 0) + 1
+    latencies_ms = np.array(latencies) * 1000
+    return SoakResult(api.baud_rate, not errors, transactions, errors,
+                      float(np.median(latencies_ms)), float(np.percentile(latencies_ms, 99)),
+                      float(latencies_ms.max()))
+
+
+def _write_uart_config(api, baud_rate, codes):
+    return api.set_uart_config(modbus_id=api.modbus_id,
+                               baud_rate=codes[baud_rate],
+                               stop_bits=STOP_BITS_CODES[api.stop_bits],
+                               parity=PARITY_CODES[api.parity])
+
+
+def switch_baud(api, baud_rate, settle=0.05, codes=BAUD_CODES):
+    """
+    把设备和本地端口切到 baud_rate
+    写配置的应答仍以旧波特率返回, 因此不以应答作为成功依据, 只看新波特率下能否通信
+    :param codes: 波特率 -> 0x0302 编码
+    :return: 新波特率下是否能通信
+    """
+    if baud_rate not in codes:
+        raise ValueError(f"No register code for baud rate {baud_rate}")
+    _write_uart_config(api, baud_rate, codes)
+    time.sleep(settle)
+    _switch_local(api, baud_rate)
+    return _ping(api, attempts=3)
+
+
+def _recover(api, original_baud, candidates, codes):
+    """回退到原波特率; 设备状态不明时重新探测后再写回"""
+    found = probe_baud(api, candidates)
+    if found is None:
+        return False
+    if found != original_baud:
+        return switch_baud(api, original_baud, codes=codes)
+    return True
+
+
+class BaudNegotiator:
+    """
+    用法:
+        api = DH5ModbusAPI(port='/dev/ttyUSB0', baud_rate=115200)
+        api.open_connection()
+        negotiator = BaudNegotiator(api)
+        print(negotiator.negotiate(persist=True))
+        for r in negotiator.results: print(r)
+    """
+
+    def __init__(self, api, candidates=None, soak_transactions=500, baud_codes=None):
+        """
+        :param candidates: 候选波特率, 默认为 CANDIDATE_BAUDS 加上 baud_codes 中的波特率
+        :param baud_codes: 手册以外的波特率编码 {波特率: 0x0302 编码}, 只在确认固件支持时传入
+        """
+        self.api = api
+        self.codes = dict(BAUD_CODES)
+        self.codes.update(baud_codes or {})
+        if candidates is None:
+            candidates = set(CANDIDATE_BAUDS) | set(baud_codes or ())
+        missing = [b for b in candidates if b not in self.codes]
+        if missing:
+            raise ValueError(f"No register code for baud rate(s) {missing}, pass them in baud_codes")
+        self.candidates = sorted(candidates, reverse=True)
+        self.soak_transactions = soak_transactions
+        self.results = []
+
+    def negotiate(self, max_baud=None, persist=True, benchmark_all=False):
+        """
+        把设备切到能通过压力测试的最高波特率
+        :param max_baud: 候选上限 (例如线缆只支持到 57600)
+        :param persist: 通过后保存参数, 断电后依然有效
+        :param benchmark_all: 测试所有候选波特率后再选择最高的通过者, 否则从高到低找到第一个即停止
+        :return: 最终波特率, 设备无法通信时返回 None
+        """
+        self.results = []
+        original_baud = probe_baud(self.api, self.candidates)
+        if original_baud is None:
+            print("错误: 无法探测到设备当前波特率")
+            return None
+
+        baseline = soak_test(self.api, self.soak_transactions)
+        self.results.append(baseline)
+        best = original_baud if baseline.passed else None
+
+        for baud_rate in self.candidates:
+            if max_baud is not None and baud_rate > max_baud:
+                continue
+            if best is not None and baud_rate <= best and not benchmark_all:
+                break
+            if baud_rate == original_baud:
+                continue
+            if not switch_baud(self.api, baud_rate, codes=self.codes):
+                self.results.append(SoakResult(baud_rate, False, 0, {DH5ModbusAPI.ERROR_CONNECTION_FAILED: 1},
+                                               None, None, None))
+                if not _recover(self.api, original_baud, self.candidates, self.codes):
+                    print("错误: 回退失败, 设备波特率未知")
+                    return None
+                continue
+            result = soak_test(self.api, self.soak_transactions)
+            self.results.append(result)
+            if result.passed and (best is None or baud_rate > best):
+                best = baud_rate
+            if not benchmark_all and result.passed:
+                break
+            # 未通过或还要继续测试其他波特率: 回到原波特率再试下一个
+            if (not switch_baud(self.api, original_baud, codes=self.codes) and
+                    not _recover(self.api, original_baud, self.candidates, self.codes)):
+                print("错误: 回退失败, 设备波特率未知")
+                return None
+
+        if best is None:
+            print("错误: 没有波特率通过压力测试")
+            return original_baud
+        if self.api.baud_rate != best and not switch_baud(self.api, best, codes=self.codes):
+            _recover(self.api, original_baud, self.candidates, self.codes)
+            return self.api.baud_rate
+        if persist and best != original_baud:
+            self.api.set_save_param(1)
+        return best
+
+    def report(self):
+        lines = []
+        for r in self.results:
+            if r.p50_ms is None:
+                lines.append(f"{r.baud_rate:>7}: no response")
+            else:
+                lines.append(f"{r.baud_rate:>7}: {'PASS' if r.passed else 'FAIL'} "
+                             f"p50 {r.p50_ms:.2f} ms  p99 {r.p99_ms:.2f} ms  max {r.max_ms:.2f} ms  "
+                             f"errors {r.errors}")
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import sys
+
+    # 额外的波特率编码以 波特率=编码 的形式给出, 例如 921600=8 (须与固件一致)
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    extra_codes = dict(tuple(int(v) for v in a.split('=')) for a in args if '=' in a)
+    ports = [a for a in args if '=' not in a]
+    port = ports[0] if ports else '/dev/ttyUSB0'
+    api = DH5ModbusAPI(port=port, baud_rate=115200)
+    print(api.open_connection())
+    negotiator = BaudNegotiator(api, baud_codes=extra_codes)
+    print("final baud rate:", negotiator.negotiate(benchmark_all='--all' in sys.argv,
+                                                   persist='--no-save' not in sys.argv))
+    print(negotiator.report())
+    api.close_connection()
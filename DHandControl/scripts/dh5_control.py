@@ -3,8 +3,511 @@ import threading
 import serial
 import struct
 import random
+from collections import deque, namedtuple
 import numpy as np
 
+from hand_trace import TRACER
+from hand_policy import (RetryPolicy, HandError, HandConnectionError, HandTimeoutError, HandCRCError,
+                         HandFrameError, HandDeviceError)
+
+
+class _ReadBatch:
+    """一次FC03读事务: 覆盖 [start, end) 的寄存器区间, 由多个调用者共享结果"""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.done = False
+        self.values = None
+        self.error = None
+
+    def covers(self, start, end):
+        return self.start <= start and end <= self.end
+
+    def slice(self, start, end):
+        return self.values[start - self.start:end - self.start]
+
+
+class DH5ReadCoalescer:
+    """
+    反馈寄存器读取层:
+      - 同一时刻多个线程请求重叠/相邻区间时, 合并成一次FC03事务 (single-flight)
+      - 读到的寄存器带时间戳缓存, 调用者通过 max_age (秒) 指定可接受的最大数据年龄
+    """
+
+    def __init__(self, api, max_span=125):
+        self.api = api
+        self.max_span = max_span  # FC03单次最多读取125个寄存器
+        self._cond = threading.Condition()
+        self._cache = {}  # register_address -> (value, timestamp)
+        self._inflight = None
+        self._pending = None
+
+    def read(self, register_address, data_length=1, max_age=None):
+        """
+        读取 data_length 个保持寄存器
+        :param max_age: 缓存数据最大年龄(秒), None 表示不使用缓存, 但仍与并发请求合并
+        :return: 寄存器值列表, 失败时返回 DH5ModbusAPI 的错误码
+        """
+        start, end = register_address, register_address + data_length
+        with self._cond:
+            while True:
+                if max_age is not None:
+                    values = self._lookup(start, end, time.monotonic() - max_age)
+                    if values is not None:
+                        return values
+                if self._inflight is not None and self._inflight.covers(start, end):
+                    batch = self._inflight
+                    break
+                if self._pending is None:
+                    self._pending = _ReadBatch(start, end)
+                    batch = self._pending
+                    break
+                if max(self._pending.end, end) - min(self._pending.start, start) <= self.max_span:
+                    self._pending.start = min(self._pending.start, start)
+                    self._pending.end = max(self._pending.end, end)
+                    batch = self._pending
+                    break
+                # 区间无法并入等待中的事务, 等它发出后重试
+                self._cond.wait()
+
+            while not batch.done:
+                if self._inflight is None and self._pending is batch:
+                    self._dispatch(batch)
+                else:
+                    self._cond.wait()
+
+        if batch.error is not None:
+            return batch.error
+        return batch.slice(start, end)
+
+    def invalidate(self):
+        with self._cond:
+            self._cache.clear()
+
+    def _lookup(self, start, end, oldest):
+        values = []
+        for address in range(start, end):
+            entry = self._cache.get(address)
+            if entry is None or entry[1] < oldest:
+                return None
+            values.append(entry[0])
+        return values
+
+    def _dispatch(self, batch):
+        """调用时持有锁; 总线事务期间释放锁, 以便其他线程继续合并到下一批"""
+        self._pending = None
+        self._inflight = batch
+        self._cond.release()
+        try:
+            response = self.api.send_modbus_command(function_code=0x03, register_address=batch.start,
+                                                    data_length=batch.end - batch.start)
+        finally:
+            self._cond.acquire()
+        if isinstance(response, list) and len(response) == batch.end - batch.start:
+            batch.values = response
+            stamp = time.monotonic()
+            for offset, value in enumerate(response):
+                self._cache[batch.start + offset] = (value, stamp)
+        else:
+            batch.error = response if not isinstance(response, list) else DH5ModbusAPI.ERROR_INVALID_RESPONSE
+        batch.done = True
+        self._inflight = None
+        self._cond.notify_all()
+
+
+# 反馈相关字段: name -> (起始寄存器, 寄存器数量, 是否为有符号数)
+DH5_READ_FIELDS = {
+    'init_status': (0x0200, 1, False),
+    'state': (0x0201, 6, False),
+    'position': (0x0207, 6, True),
+    'speed': (0x020D, 6, True),
+    'current': (0x0213, 6, True),
+    'cur_faults': (0x021F, 1, False),
+}
+
+# 左手相对右手的位置误差补偿
+DH5_LEFT_GAIN_ERR = [4, 0, 24, -30, 40, -43]
+
+# 目标寄存器 (位置/力/速度/加速度) 写入绝对值, 重复写入结果相同, 可以安全重试
+DH5_IDEMPOTENT_WRITES = range(0x0101, 0x0119)
+
+DH5Snapshot = namedtuple('DH5Snapshot', list(DH5_READ_FIELDS), defaults=(None,) * len(DH5_READ_FIELDS))
+
+
+class DH5ReadPlanner:
+    """
+    读计划器: 调用者声明需要的字段, 计算最少的连续FC03读事务
+    当两个区间之间浪费的寄存器传输时间小于一次事务的固定开销时合并
+    """
+
+    REQUEST_BYTES = 8           # id + fc + addr(2) + count(2) + crc(2)
+    RESPONSE_OVERHEAD_BYTES = 5  # id + fc + byte count + crc(2)
+    FRAME_GAP_CHARS = 3.5        # RTU帧间静默
+    MAX_SPAN = 125
+
+    def __init__(self, api, turnaround=0.002):
+        """
+        :param turnaround: 每次事务的固定延迟估计(秒): 设备处理 + USB-RS485转换器往返
+        """
+        self.api = api
+        self.turnaround = turnaround
+        self._plans = {}
+
+    def char_time(self):
+        parity_bits = 0 if self.api.parity == 'N' else 1
+        return (1 + 8 + parity_bits + self.api.stop_bits) / self.api.baud_rate
+
+    def transaction_overhead(self):
+        chars = self.REQUEST_BYTES + self.RESPONSE_OVERHEAD_BYTES + 2 * self.FRAME_GAP_CHARS
+        return chars * self.char_time() + self.turnaround
+
+    def register_cost(self):
+        return 2 * self.char_time()
+
+    def plan(self, fields):
+        """
+        :param fields: 字段名列表, 见 DH5_READ_FIELDS
+        :return: [(起始寄存器, 寄存器数量), ...]
+        """
+        key = (tuple(sorted(set(fields))), self.api.baud_rate, self.api.parity, self.api.stop_bits)
+        if key in self._plans:
+            return self._plans[key]
+
+        ranges = []
+        for name in key[0]:
+            if name not in DH5_READ_FIELDS:
+                raise ValueError(f"Unknown DH5 field: {name}")
+            start, count, _ = DH5_READ_FIELDS[name]
+            ranges.append([start, start + count])
+        ranges.sort()
+
+        max_gap = self.transaction_overhead() / self.register_cost()
+        merged = []
+        for start, end in ranges:
+            if merged:
+                last = merged[-1]
+                if start - last[1] <= max_gap and max(end, last[1]) - last[0] <= self.MAX_SPAN:
+                    last[1] = max(last[1], end)
+                    continue
+            merged.append([start, end])
+
+        plan = [(start, end - start) for start, end in merged]
+        self._plans[key] = plan
+        return plan
+
+    def read(self, fields, max_age=None):
+        """
+        按计划读取并解码字段
+        :return: DH5Snapshot, 未请求的字段为 None; 失败时返回错误码
+        """
+        blocks = []
+        read_start = time.perf_counter()
+        for start, count in self.plan(fields):
+            values = self.api.read_holding_registers(start, data_length=count, max_age=max_age)
+            if not isinstance(values, list):
+                return values
+            blocks.append((start, values))
+        latency = time.perf_counter() - read_start
+
+        decoded = {}
+        for name in fields:
+            start, count, signed = DH5_READ_FIELDS[name]
+            for block_start, values in blocks:
+                offset = start - block_start
+                if 0 <= offset and offset + count <= len(values):
+                    raw = values[offset:offset + count]
+                    if signed:
+                        raw = [self.api.to_signed_16bit(v) for v in raw]
+                    decoded[name] = raw[0] if count == 1 else raw
+                    break
+        snapshot = DH5Snapshot(**decoded)
+
+        recorder = self.api.recorder
+        if recorder is not None and None not in (snapshot.state, snapshot.position, snapshot.speed, snapshot.current):
+            recorder.record_feedback(snapshot.state + snapshot.position + snapshot.speed + snapshot.current,
+                                     faults=snapshot.cur_faults, latency=latency)
+        return snapshot
+
+
+class DH5PipelinedWriter:
+    """
+    流水线写模式: 写帧背靠背发出, 由后台读线程按顺序将回显与未完成请求匹配并校验
+      - window: 最大未确认请求数, 窗口满时 submit 立即返回 ERROR_BUSY, 不阻塞控制循环
+      - on_error: 回调 on_error(seq, error_code), 在后台线程中调用
+    """
+
+    def __init__(self, api, window=4, on_error=None):
+        self.api = api
+        self.window = window
+        self.on_error = on_error
+        self._cond = threading.Condition()
+        self._outstanding = deque()  # (seq, request, send_time)
+        self._seq = 0
+        self.last_seq = 0
+        self._running = False
+        self._thread = None
+        self.stats = {'sent': 0, 'acked': 0, 'errors': 0, 'timeouts': 0, 'window_full': 0, 'last_latency': None}
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._reader_loop, name=f"dh5-echo-{self.api.port}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.drain()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def in_flight(self):
+        return len(self._outstanding)
+
+    def submit(self, request):
+        """发出已编码的写帧, 不等待回显; 请求序号记录在 last_seq, 供 on_error 回调对照"""
+        with self.api._bus_lock:
+            with self._cond:
+                if len(self._outstanding) >= self.window:
+                    self.stats['window_full'] += 1
+                    return DH5ModbusAPI.ERROR_BUSY
+                self._seq += 1
+                seq = self._seq
+                self.last_seq = seq
+                self._outstanding.append((seq, bytes(request), time.monotonic()))
+                self.stats['sent'] += 1
+            self.api.serial_connection.write(request)
+            with self._cond:
+                self._cond.notify_all()
+        return DH5ModbusAPI.SUCCESS
+
+    def drain(self, timeout=None):
+        """等待所有未确认请求完成, 同步调用在访问总线前会先调用它"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._outstanding, timeout)
+
+    def _reader_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._outstanding or not self._running)
+                if not self._outstanding:
+                    return
+                seq, request, send_time = self._outstanding[0]
+
+            response = self.api._read_response()
+            result = self._validate(request, response)
+            if self.api.metrics is not None:
+                self.api._observe(request[1], time.monotonic() - send_time, request, response, result)
+
+            with self._cond:
+                self._outstanding.popleft()
+                if result == DH5ModbusAPI.SUCCESS:
+                    self.stats['acked'] += 1
+                    self.stats['last_latency'] = time.monotonic() - send_time
+                else:
+                    self.stats['errors'] += 1
+                    if len(response) == 0:
+                        self.stats['timeouts'] += 1
+                self._cond.notify_all()
+
+            if result != DH5ModbusAPI.SUCCESS:
+                # 丢弃残留字节, 重新对齐帧边界
+                self.api.serial_connection.reset_input_buffer()
+                if self.on_error is not None:
+                    self.on_error(seq, result)
+
+    def _validate(self, request, response):
+        result = self.api._parse_response(response, request[1])
+        if result == DH5ModbusAPI.SUCCESS and bytes(response[2:6]) != request[2:6]:
+            return DH5ModbusAPI.ERROR_INVALID_RESPONSE
+        return result
+
+
+class SkewHistogram:
+    """双手发送时间差直方图, 桶边界单位为微秒"""
+
+    BUCKETS_US = (50, 100, 250, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_US) + 1)
+        self.samples = deque(maxlen=10000)
+
+    def record(self, skew):
+        skew_us = skew * 1e6
+        self.samples.append(skew_us)
+        for i, edge in enumerate(self.BUCKETS_US):
+            if skew_us <= edge:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def summary(self):
+        if not self.samples:
+            return {'count': 0}
+        ordered = sorted(self.samples)
+        buckets = {f"<={edge}us": n for edge, n in zip(self.BUCKETS_US, self.counts)}
+        buckets[f">{self.BUCKETS_US[-1]}us"] = self.counts[-1]
+        return {
+            'count': sum(self.counts),
+            'p50_us': ordered[len(ordered) // 2],
+            'p99_us': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+            'max_us': ordered[-1],
+            'buckets': buckets,
+        }
+
+
+class _PortWriter:
+    """常驻的单串口发送线程: 在截止时刻发出预编码的帧并读取回显"""
+
+    _STOP = object()
+
+    def __init__(self, api):
+        self.api = api
+        self._cond = threading.Condition()
+        self._job = None
+        self._job_id = 0
+        self._result = None
+        self._thread = threading.Thread(target=self._run, name=f"dh5-writer-{api.port}", daemon=True)
+        self._thread.start()
+
+    def post(self, request, deadline):
+        """:return: 本次任务编号, 传给 wait()"""
+        with self._cond:
+            self._job_id += 1
+            self._job = (self._job_id, request, deadline)
+            self._result = None
+            self._cond.notify_all()
+            return self._job_id
+
+    def wait(self, job_id, timeout=None):
+        """
+        只接受编号为 job_id 的结果; 超时后迟到的回显不会被下一次 post() 误认
+        :return: (结果码, 实际写出时刻 perf_counter)
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._result is not None and self._result[0] == job_id, timeout):
+                return DH5ModbusAPI.ERROR_INVALID_RESPONSE, None
+            return self._result[1:]
+
+    def stop(self, timeout=None):
+        """结束发送线程; 正在进行的一帧会先完成"""
+        with self._cond:
+            self._job = self._STOP
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._job is not None)
+                if self._job is self._STOP:
+                    return
+                job_id, request, deadline = self._job
+                self._job = None
+
+            api = self.api
+            try:
+                with api._bus_lock:
+                    if api.pipeline is not None:
+                        api.pipeline.drain()
+                    sleep_until(deadline)
+                    write_time = time.perf_counter()
+                    api.serial_connection.write(request)
+                    response = api._read_response()
+                    latency = time.perf_counter() - write_time
+                result = api._parse_response(response, request[1])
+                if api.metrics is not None:
+                    api._observe(request[1], latency, request, response, result)
+                outcome = (result, write_time)
+            except Exception as e:
+                outcome = (f"Error: {str(e)}", None)
+            with self._cond:
+                # 等待方已超时并发出了新任务时, 丢弃这条过期结果
+                if job_id == self._job_id:
+                    self._result = (job_id,) + outcome
+                    self._cond.notify_all()
+
+
+def sleep_until(deadline):
+    """粗睡眠到截止时刻前1ms, 之后让出GIL自旋, 避免两个线程抢GIL"""
+    remaining = deadline - time.perf_counter()
+    if remaining > 0.002:
+        time.sleep(remaining - 0.001)
+    while time.perf_counter() < deadline:
+        time.sleep(0)
+
+
+class BimanualDispatcher:
+    """
+    双手同步下发: 两帧预先编码, 由每个串口的常驻发送线程在同一截止时刻写出
+    每条命令的实际双手时间差记录到 skew 直方图
+    """
+
+    def __init__(self, api_r, api_l, lead_time=0.002, timeout=2.0):
+        """
+        :param lead_time: 从编码完成到统一发送时刻的提前量(秒), 需覆盖线程唤醒时间
+        :param timeout: 等待回显的最长时间(秒)
+        """
+        self.api_r = api_r
+        self.api_l = api_l
+        self.lead_time = lead_time
+        self.timeout = timeout
+        self._writer_r = _PortWriter(api_r)
+        self._writer_l = _PortWriter(api_l)
+        self._lock = threading.Lock()
+        self.skew = SkewHistogram()
+
+    def dispatch(self, request_r, request_l):
+        """
+        在同一截止时刻发出两帧已编码的请求
+        :return: (右手结果, 左手结果)
+        """
+        with self._lock:
+            deadline = time.perf_counter() + self.lead_time
+            job_r = self._writer_r.post(request_r, deadline)
+            job_l = self._writer_l.post(request_l, deadline)
+            result_r, time_r = self._writer_r.wait(job_r, self.timeout)
+            result_l, time_l = self._writer_l.wait(job_l, self.timeout)
+            if time_r is not None and time_l is not None:
+                self.skew.record(abs(time_r - time_l))
+            return result_r, result_l
+
+    def close(self):
+        """停止两个发送线程; 关闭后不可再 dispatch"""
+        with self._lock:
+            self._writer_r.stop(self.timeout)
+            self._writer_l.stop(self.timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def set_all(self, positions_r, positions_l, **kwargs):
+        """双手 set_all, kwargs 同 DH5ModbusAPI.set_all (两只手共用)"""
+        values_r = self.api_r._set_all_values(positions_r, **kwargs)
+        values_l = self.api_l._set_all_values(positions_l, **kwargs)
+        return self._dispatch_values(values_r, values_l)
+
+    def set_all_position(self, positions_r, positions_l):
+        values_r = self.api_r._set_all_position_values(positions_r)
+        values_l = self.api_l._set_all_position_values(positions_l)
+        return self._dispatch_values(values_r, values_l)
+
+    def _dispatch_values(self, values_r, values_l):
+        if not isinstance(values_r, list) or not isinstance(values_l, list):
+            # 任一只手参数无效则两只手都不发送, 未发送的一侧返回 None
+            return (None if isinstance(values_r, list) else values_r,
+                    None if isinstance(values_l, list) else values_l)
+        request_r = self.api_r._build_request(0x10, 0x0101, values=values_r, data_length=len(values_r))
+        request_l = self.api_l._build_request(0x10, 0x0101, values=values_l, data_length=len(values_l))
+        return self.dispatch(request_r, request_l)
+
 
 class DH5ModbusAPI:
     SUCCESS = 0
@@ -12,6 +515,7 @@ class DH5ModbusAPI:
     ERROR_INVALID_RESPONSE = 2
     ERROR_CRC_CHECK_FAILED = 3
     ERROR_INVALID_COMMAND = 4
+    ERROR_BUSY = 5
 
     def __init__(self, port='COM6', modbus_id=1, baud_rate=115200, stop_bits=1, parity='N'):
         self.port = port
@@ -20,6 +524,16 @@ class DH5ModbusAPI:
         self.stop_bits = stop_bits
         self.parity = parity
         self.serial_connection = None
+        self._bus_lock = threading.RLock()
+        self.reader = DH5ReadCoalescer(self)
+        self.planner = DH5ReadPlanner(self)
+        self.pipeline = None
+        self.recorder = None  # 可选 TelemetryRecorder, 见 telemetry_recorder.py
+        self.metrics = None  # 可选 hand_metrics.TransportMetrics
+        self.policy = None  # 可选 hand_policy.RetryPolicy, 设置后所有事务按策略重试
+        self.position_limits = None  # 行程标定得到的限位, 设置后替代按串口区分的默认限位 (见 hand_bringup.py)
+        self._state_request = None  # read_state() 的 FC03 帧, 按 modbus_id 缓存 (见 _state_frame)
+        self._state_request_id = None
 
     def open_connection(self):
         try:
@@ -42,10 +556,80 @@ class DH5ModbusAPI:
             return self.SUCCESS
 
     def send_modbus_command(self, function_code, register_address, data=None, data_length=None):
+        if self.policy is not None:
+            try:
+                return self.transact(function_code, register_address, data, data_length)
+            except HandError as e:
+                return e.code if e.code is not None else f"Error: {str(e)}"
+        return self._transaction(function_code, register_address, data, data_length)
+
+    def transact(self, function_code, register_address, data=None, data_length=None, idempotent=None,
+                 budget=None, deadline=None):
+        """
+        按 self.policy (未设置时使用默认 RetryPolicy) 执行一次事务, 失败时抛出 hand_policy 中的异常
+        :param idempotent: 是否允许重试, 默认读和目标寄存器写入为幂等, 其他写入 (初始化、保存参数等) 不重试
+        :param budget: 本次调用的时间预算(秒), 默认取策略的 budget
+        :return: 读取时为寄存器值列表, 写入时为 SUCCESS
+        """
+        if idempotent is None:
+            count = data_length or (1 if function_code != 0x10 else len(data))
+            idempotent = self._is_idempotent(function_code, register_address, count)
+
+        def attempt(timeout):
+            return self._transaction(function_code, register_address, data, data_length, timeout=timeout,
+                                     raise_errors=True)
+
+        return self._run_policy(attempt, function_code, idempotent, budget, deadline)
+
+    def send_request(self, request, idempotent=None, decode=None):
+        """
+        发送已编码的请求帧 (例如 hand_types.DH5HandCommand.frame()), 设置了 self.policy 时按策略重试
+        :param decode: 仅FC03: decode(response) 直接从应答帧解码, 成功时返回 SUCCESS 而不是寄存器列表
+        :return: 同 send_modbus_command
+        """
+        function_code = request[1]
+        if self.policy is None:
+            return self._exchange(request, function_code, decode=decode)
+        if idempotent is None:
+            register_address, count = struct.unpack_from('>HH', request, 2)
+            idempotent = self._is_idempotent(function_code, register_address, 1 if function_code == 0x06 else count)
+
+        def attempt(timeout):
+            return self._exchange(request, function_code, timeout=timeout, raise_errors=True, decode=decode)
+
+        try:
+            return self._run_policy(attempt, function_code, idempotent)
+        except HandError as e:
+            return e.code if e.code is not None else f"Error: {str(e)}"
+
+    @staticmethod
+    def _is_idempotent(function_code, register_address, count):
+        return function_code == 0x03 or (register_address in DH5_IDEMPOTENT_WRITES and
+                                         register_address + count - 1 in DH5_IDEMPOTENT_WRITES)
+
+    def _run_policy(self, attempt, function_code, idempotent, budget=None, deadline=None):
+        policy = self.policy or RetryPolicy()
+        if deadline is None:
+            deadline = policy.deadline(budget)
+
+        def on_retry():
+            self.serial_connection.reset_input_buffer()
+
+        return policy.run(attempt, f"fc{function_code:02x}", idempotent, deadline, self.metrics, on_retry)
+
+    def _transaction(self, function_code, register_address, data=None, data_length=None, timeout=None,
+                     raise_errors=False):
+        """
+        :param timeout: 本次应答超时(秒), None 表示使用串口默认超时
+        :param raise_errors: 失败时抛出 hand_policy 异常, 否则返回错误码
+        """
         if not self.serial_connection or not self.serial_connection.is_open:
+            if raise_errors:
+                raise HandConnectionError("Serial connection is not open", self.ERROR_CONNECTION_FAILED)
             return self.ERROR_CONNECTION_FAILED
 
         try:
+            t0 = TRACER.begin()
             if function_code == 0x03:  # Read Holding Registers
                 message = self._build_request(function_code, register_address, data_length=data_length or 1)
             elif function_code == 0x06:  # Write Single Register
@@ -54,13 +638,127 @@ class DH5ModbusAPI:
                 message = self._build_request(function_code, register_address, values=data, data_length=data_length)
             else:
                 return self.ERROR_INVALID_COMMAND
+            TRACER.end('encode', t0, 'dh5')
+        except Exception as e:
+            if raise_errors:
+                raise HandConnectionError(f"fc{function_code:02x}: {e}") from e
+            return f"Error: {str(e)}"
+        return self._exchange(message, function_code, timeout, raise_errors)
+
+    def _exchange(self, message, function_code, timeout=None, raise_errors=False, decode=None):
+        """发送一个已编码的请求帧并读取应答, 参数同 _transaction"""
+        if not self.serial_connection or not self.serial_connection.is_open:
+            if raise_errors:
+                raise HandConnectionError("Serial connection is not open", self.ERROR_CONNECTION_FAILED)
+            return self.ERROR_CONNECTION_FAILED
 
-            self.serial_connection.write(message)
-            response = self.serial_connection.read(256)
-            return self._parse_response(response, function_code)
+        try:
+            with self._bus_lock:
+                if self.pipeline is not None:
+                    self.pipeline.drain()
+                start = time.perf_counter()
+                with TRACER.span('serial_write', 'dh5'):
+                    self.serial_connection.write(message)
+                with TRACER.span('wait_response', 'dh5', fc=function_code):
+                    if timeout is None:
+                        response = self._read_response()
+                    else:
+                        default_timeout = self.serial_connection.timeout
+                        self.serial_connection.timeout = max(timeout, 0.0)
+                        try:
+                            response = self._read_response()
+                        finally:
+                            self.serial_connection.timeout = default_timeout
+            with TRACER.span('parse', 'dh5'):
+                if decode is None:
+                    result = self._parse_response(response, function_code)
+                else:
+                    result = self._check_response(response, function_code)
+                    if result == self.SUCCESS:
+                        decode(response)
+            if self.metrics is not None:
+                self._observe(function_code, time.perf_counter() - start, message, response, result)
+            if raise_errors and not (result == self.SUCCESS or isinstance(result, list)):
+                raise self._error_for(function_code, response, result)
+            return result
+        except HandError:
+            raise
         except Exception as e:
+            if raise_errors:
+                if self.metrics is not None:
+                    self.metrics.observe(f"fc{function_code:02x}", 0.0, outcome='error')
+                raise HandConnectionError(f"fc{function_code:02x}: {e}") from e
+            if self.metrics is not None:
+                self.metrics.observe(f"fc{function_code:02x}", 0.0, outcome='error')
             return f"Error: {str(e)}"
 
+    def _observe(self, function_code, latency, request, response, result):
+        """记录一次事务的指标, 见 hand_metrics.py"""
+        if result == self.SUCCESS or isinstance(result, list):
+            outcome = 'ok'
+        elif result == self.ERROR_CRC_CHECK_FAILED:
+            outcome = 'crc'
+        elif len(response) == 0:
+            outcome = 'timeout'
+        else:
+            outcome = 'invalid'
+        self.metrics.observe(f"fc{function_code:02x}", latency, len(request), len(response), outcome)
+
+    def _error_for(self, function_code, response, result):
+        op = f"fc{function_code:02x} "
+        if result == self.ERROR_CRC_CHECK_FAILED:
+            return HandCRCError(op + "CRC check failed", result)
+        if len(response) == 0:
+            return HandTimeoutError(op + "no response", result)
+        if len(response) >= 3 and response[1] == function_code | 0x80:
+            return HandDeviceError(op + f"exception response 0x{response[2]:02X}", result, response[2])
+        return HandFrameError(op + f"invalid response {bytes(response).hex()}", result)
+
+    def _read_response(self):
+        """按功能码读取一个完整的RTU响应帧, 不必等待串口超时"""
+        header = self.serial_connection.read(2)
+        if len(header) < 2:
+            return header
+        func_code = header[1]
+        if func_code & 0x80:  # 异常响应: 异常码 + CRC
+            remaining = 3
+        elif func_code == 0x03:
+            byte_count = self.serial_connection.read(1)
+            if len(byte_count) < 1:
+                return header
+            header += byte_count
+            remaining = byte_count[0] + 2
+        else:  # 0x06 / 0x10 回显: 地址 + 值/数量 + CRC
+            remaining = 6
+        return header + self.serial_connection.read(remaining)
+
+    def start_pipeline(self, window=4, on_error=None):
+        """开启流水线写模式, 之后可用 set_all_nowait 流式发送目标"""
+        if self.pipeline is None:
+            self.pipeline = DH5PipelinedWriter(self, window=window, on_error=on_error)
+            self.pipeline.start()
+        return self.pipeline
+
+    def stop_pipeline(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
+
+    def read_holding_registers(self, register_address, data_length=1, max_age=None):
+        """
+        经合并/缓存层读取保持寄存器
+        :param max_age: 可接受的缓存数据最大年龄(秒), None 表示必须访问总线
+        """
+        return self.reader.read(register_address, data_length, max_age=max_age)
+
+    def read_fields(self, fields, max_age=None):
+        """
+        一次读取多个反馈字段, 相邻区间合并为最少的FC03事务
+          - fields: 如 ['init_status', 'state', 'position', 'cur_faults']
+        """
+        with TRACER.span('read_fields', 'dh5'):
+            return self.planner.read(fields, max_age=max_age)
+
     def _build_request(self, function_code, register_address, data_length=1, value=None, values=None):
         request = bytearray()
         request.append(self.modbus_id)
@@ -95,23 +793,29 @@ class DH5ModbusAPI:
                     crc >>= 1
         return crc
 
-    def _parse_response(self, response, function_code):
+    def _check_response(self, response, function_code):
+        """校验应答帧的长度、功能码和CRC, :return: SUCCESS 或错误码"""
         if len(response) < 5:
             # raise ValueError("Incomplete response received")
             return self.ERROR_INVALID_RESPONSE
 
-        device_id, func_code, *payload, crc_low, crc_high = response
-        if func_code != function_code:
+        if response[1] != function_code:
             # raise ValueError(f"Unexpected function code: {func_code}")
             return self.ERROR_INVALID_RESPONSE
 
-        crc_received = (crc_high << 8) | crc_low
+        crc_received = (response[-1] << 8) | response[-2]
         crc_calculated = self._calculate_crc(response[:-2])
         if crc_received != crc_calculated:
             return self.ERROR_CRC_CHECK_FAILED
+        return self.SUCCESS
+
+    def _parse_response(self, response, function_code):
+        result = self._check_response(response, function_code)
+        if result != self.SUCCESS:
+            return result
 
         if function_code == 0x03:
-            data = payload[1:]  # Skip byte count
+            data = response[3:-2]  # Skip id, function code and byte count
             return [struct.unpack('>H', bytes(data[i:i + 2]))[0] for i in range(0, len(data), 2)]
         elif function_code in [0x06, 0x10]:
             return self.SUCCESS
@@ -130,12 +834,13 @@ class DH5ModbusAPI:
     # -------------------- API Methods --------------------
 
     def set_uart_config(self, modbus_id=None, baud_rate=None, stop_bits=None, parity=None):
+        """写入的是寄存器编码值 (波特率/校验/停止位编码见 dh5_baud.py), 不是实际波特率"""
         uart_registers = [modbus_id, baud_rate, stop_bits, parity]
-        self.send_modbus_command(function_code=0x10, register_address=0x0302, data=uart_registers,
-                                 data_length=len(uart_registers))
+        return self.send_modbus_command(function_code=0x10, register_address=0x0302, data=uart_registers,
+                                        data_length=len(uart_registers))
 
     def set_save_param(self, flag=1):
-        self.send_modbus_command(function_code=0x06, register_address=0x0300, data=flag)
+        return self.send_modbus_command(function_code=0x06, register_address=0x0300, data=flag)
 
     def initialize(self, mode):
         """
@@ -206,23 +911,26 @@ class DH5ModbusAPI:
         """
         运动到指定位置
         """
+        position_list = self._set_all_position_values(position_list, axis_list)
+        if not isinstance(position_list, list):
+            return position_list
+        return self.send_modbus_command(function_code=0x10,
+                                        register_address=0x0101,
+                                        data=position_list,
+                                        data_length=len(axis_list))
+
+    def _set_all_position_values(self, position_list, axis_list=[1, 2, 3, 4, 5, 6]):
+        """set_all_position 的寄存器数据: 限位/误差补偿后的位置"""
         for axis in axis_list:
             if axis < 1 or axis > 6:
                 return self.ERROR_INVALID_COMMAND
-        register_address = 0x0101
-        
-        if self.port == '/dev/ttyUSB0':
-            # Right hand
-            position_list = self.clamp_list(position_list, position_limits_right)
-        if self.port == '/dev/ttyUSB1':
-            # Left hand
-            position_list = self.err_comp(position_list)
-            position_list = self.clamp_list(position_list, position_limits_left)
 
-        return self.send_modbus_command(function_code=0x10,
-                                        register_address=register_address,
-                                        data=position_list,
-                                        data_length=len(axis_list))
+        offsets, limits = self.position_calibration()
+        if offsets is not None:
+            position_list = self.err_comp(position_list, offsets)
+        if limits is not None:
+            position_list = self.clamp_list(position_list, limits)
+        return list(position_list)
 
     def set_axis_speed(self, axis, speed):
         if axis < 1 or axis > 6:
@@ -294,6 +1002,36 @@ class DH5ModbusAPI:
         :param acc_list: 加速度列表
         :return:
         """
+        t0 = TRACER.begin()
+        with TRACER.span('validate_clamp', 'dh5'):
+            complete_list = self._set_all_values(position_list, axis_list, force_list, speed_list, acc_list)
+        if not isinstance(complete_list, list):
+            return complete_list
+        start = time.perf_counter()
+        result = self.send_modbus_command(function_code=0x10,
+                                          register_address=0x0101,
+                                          data=complete_list,
+                                          data_length=len(complete_list))
+        if self.recorder is not None:
+            self.recorder.record_command(complete_list, time.perf_counter() - start)
+        TRACER.end('set_all', t0, 'dh5')
+        return result
+
+    def set_all_nowait(self, position_list, axis_list=None, force_list=None, speed_list=None, acc_list=None):
+        """
+        流水线模式下的 set_all: 发出后立即返回, 回显由后台线程校验
+        需先调用 start_pipeline()
+        """
+        if self.pipeline is None:
+            return self.ERROR_CONNECTION_FAILED
+        complete_list = self._set_all_values(position_list, axis_list, force_list, speed_list, acc_list)
+        if not isinstance(complete_list, list):
+            return complete_list
+        request = self._build_request(0x10, 0x0101, values=complete_list, data_length=len(complete_list))
+        return self.pipeline.submit(request)
+
+    def _set_all_values(self, position_list, axis_list=None, force_list=None, speed_list=None, acc_list=None):
+        """set_all 的寄存器数据: 位置(限位/误差补偿后) + 力 + 速度 + 加速度"""
         if axis_list is None:
             axis_list = [1, 2, 3, 4, 5, 6]
         if force_list is None:
@@ -310,22 +1048,63 @@ class DH5ModbusAPI:
         speed_register_address = 0x010D
         acc_register_address = 0x0113
 
+        offsets, limits = self.position_calibration()
+        if offsets is not None:
+            position_list = self.err_comp(position_list, offsets)
+        if limits is not None:
+            position_list = self.clamp_list(position_list, limits)
+        return list(position_list) + list(force_list) + list(speed_list) + list(acc_list)
+
+    def position_calibration(self):
+        """
+        :return: (误差补偿, 限位), 按串口区分左右手, 没有时为 None
+        """
         if self.port == '/dev/ttyUSB0':
             # Right hand
-            position_list = self.clamp_list(position_list, position_limits_right)
+            return None, self.position_limits or position_limits_right
         if self.port == '/dev/ttyUSB1':
             # Left hand
-            # position_list = self.err_comp(position_list)
-            position_list = self.clamp_list(self.err_comp(position_list), position_limits_left)
-        complete_list = position_list + force_list + speed_list + acc_list
-        return self.send_modbus_command(function_code=0x10,
-                                        register_address=position_register_address,
-                                        data=complete_list,
-                                        data_length=len(complete_list))
+            return DH5_LEFT_GAIN_ERR, self.position_limits or position_limits_left
+        return None, self.position_limits
+
+    def send_command(self, command):
+        """
+        发送 hand_types.DH5HandCommand, 帧在命令对象中已编码并缓存
+        :return: 同 set_all
+        """
+        start = time.perf_counter()
+        result = self.send_request(command.frame(self.modbus_id))
+        if self.recorder is not None:
+            self.recorder.record_command(command.registers, time.perf_counter() - start)
+        return result
+
+    def send_command_nowait(self, command):
+        """流水线模式下的 send_command, 需先调用 start_pipeline()"""
+        if self.pipeline is None:
+            return self.ERROR_CONNECTION_FAILED
+        return self.pipeline.submit(command.frame(self.modbus_id))
+
+    def read_state(self, state):
+        """
+        读取24个反馈寄存器, 直接解码到 hand_types.DH5HandState 中 (不经过缓存和列表)
+        :return: SUCCESS 或错误码
+        """
+        return self.send_request(self._state_frame(), decode=state.update_from_response)
 
-    def get_all_feedback(self):
+    def _state_frame(self):
+        """:return: 读 0x0201..0x0218 的 FC03 请求帧, modbus_id 不变时返回缓存"""
+        if self._state_request is None or self._state_request_id != self.modbus_id:
+            self._state_request = bytes(self._build_request(0x03, 0x0201, data_length=24))
+            self._state_request_id = self.modbus_id
+        return self._state_request
+
+    def get_all_feedback(self, max_age=None):
         register_address = 0x0201
-        return self.send_modbus_command(function_code=0x03, register_address=register_address, data_length=24)
+        start = time.perf_counter()
+        response = self.read_holding_registers(register_address, data_length=24, max_age=max_age)
+        if self.recorder is not None and isinstance(response, list):
+            self.recorder.record_feedback(response, latency=time.perf_counter() - start)
+        return response
 
     def parse_axis_state(self, response_data):
         """
@@ -357,7 +1136,7 @@ class DH5ModbusAPI:
             'current': current
         }
 
-    def get_all_state(self):
+    def get_all_state(self, max_age=None):
         """
         state
           - [0]: 运动中
@@ -365,15 +1144,15 @@ class DH5ModbusAPI:
           - [2]: 堵转
         """
         register_address = 0x0201
-        return self.send_modbus_command(function_code=0x03, register_address=register_address, data_length=6)
+        return self.read_holding_registers(register_address, data_length=6, max_age=max_age)
 
-    def get_axis_position(self, axis):
+    def get_axis_position(self, axis, max_age=None):
         if axis < 1 or axis > 6:
             return self.ERROR_INVALID_COMMAND
         register_address = 0x0207 + (axis - 1)
-        return self.send_modbus_command(function_code=0x03, register_address=register_address)
+        return self.read_holding_registers(register_address, max_age=max_age)
 
-    def get_all_position(self):
+    def get_all_position(self, max_age=None):
         """
         state
           - [0]: 运动中
@@ -381,7 +1160,7 @@ class DH5ModbusAPI:
           - [2]: 堵转
         """
         register_address = 0x0207
-        return self.send_modbus_command(function_code=0x03, register_address=register_address, data_length=6)
+        return self.read_holding_registers(register_address, data_length=6, max_age=max_age)
 
     def get_axis_speed(self, axis):
         if axis < 1 or axis > 6:
@@ -389,9 +1168,9 @@ class DH5ModbusAPI:
         register_address = 0x020D + (axis - 1)
         return self.send_modbus_command(function_code=0x03, register_address=register_address)
 
-    def get_all_speed(self):
+    def get_all_speed(self, max_age=None):
         register_address = 0x020D
-        return self.send_modbus_command(function_code=0x03, register_address=register_address, data_length=6)
+        return self.read_holding_registers(register_address, data_length=6, max_age=max_age)
 
     def get_axis_current(self, axis):
         if axis < 1 or axis > 6:
@@ -399,9 +1178,9 @@ class DH5ModbusAPI:
         register_address = 0x0213 + (axis - 1)
         return self.send_modbus_command(function_code=0x03, register_address=register_address)
 
-    def get_all_current(self):
+    def get_all_current(self, max_age=None):
         register_address = 0x0213
-        return self.send_modbus_command(function_code=0x03, register_address=register_address, data_length=6)
+        return self.read_holding_registers(register_address, data_length=6, max_age=max_age)
 
     def get_cur_faults(self):
         return self.send_modbus_command(function_code=0x03, register_address=0x021F, data_length=1)
@@ -432,7 +1211,7 @@ class DH5ModbusAPI:
     def err_comp(self, right, gain_err=None):
         """误差补偿"""
         if gain_err is None:
-            gain_err = [4, 0, 24, -30, 40, -43]
+            gain_err = DH5_LEFT_GAIN_ERR
         gain_left = [0, 0, 0, 0, 0, 0]
         for i in range(len(right)):
             gain_left[i] = gain_err[i] + right[i]
@@ -464,31 +1243,71 @@ class DH5ModbusAPI:
             time.sleep(0.5)
 
 
-def sync_demo():
-    threads = [
-        threading.Thread(target=api_r.demo),
-        threading.Thread(target=api_l.demo)
-    ]
-    for t in threads:
-        t.start()
+# RIGHT   [930, 1771, 1707, 1731, 1731, 981]
+gesture_list = {
+    "ONE": [30, 1770, 30, 30, 30, 825],
+    "YE": [30, 1770, 1707, 30, 30, 200],
+    "OK": [354, 1080, 1707, 1730, 1730, 418],
+    "GOOD": [930, 10, 30, 30, 30, 980],
+    "FIVE": [930, 1770, 1707, 1730, 1730, 980],
+    "ROCK": [930, 1770, 30, 30, 1730, 980]
+}
+
+#### Left Hand #### ttyUSB1
+"""
+axis_F1     30 - 934      大拇指左右转向
+axis_F2     10 - 1771     食指
+axis_F3     30 - 1731     中指
+axis_F4     30 - 1701     无名指 
+axis_F5     10 - 1771     小拇指
+axis_F6     30 - 938      大拇指上下转向
+"""
+position_limits_left = [
+    [30, 934],
+    [10, 1771],
+    [30, 1731],
+    [30, 1701],
+    [10, 1771],
+    [30, 938],
+]
+
+#### Right Hand #### ttyUSB0
+"""
+axis_F1     30 - 930     大拇指左右转向
+axis_F2     10 - 1771    食指
+axis_F3     30 - 1707    中指
+axis_F4     30 - 1731    无名指 
+axis_F5     30 - 1731    小拇指
+axis_F6     30 - 981     大拇指上下转向
+"""
+position_limits_right = [
+    [30, 930],
+    [10, 1771],
+    [30, 1707],
+    [30, 1731],
+    [30, 1731],
+    [30, 981],
+]
+
 
-    for t in threads:
-        t.join()
+def sync_demo():
+    with BimanualDispatcher(api_r, api_l) as dispatcher:
+        for j in range(1, 100):
+            gesture_name = random.choice(list(gesture_list.keys()))
+            dispatcher.set_all_position(gesture_list["FIVE"], gesture_list["FIVE"])
+            time.sleep(0.5)
+            dispatcher.set_all_position(gesture_list[gesture_name], gesture_list[gesture_name])
+            print(f"Perform {j}: {gesture_name}")
+            time.sleep(0.5)
+        print("Skew:", dispatcher.skew.summary())
 
 
 def grab():
     api_r.set_all_speed([1, 2, 3, 4, 5, 6], [30, 30, 30, 30, 30, 30])
     api_l.set_all_speed([1, 2, 3, 4, 5, 6], [30, 30, 30, 30, 30, 30])
-    threads = [
-        threading.Thread(target=api_r.set_all_position, args=([1, 2, 3, 4, 5, 6], [30, 1219, 1135, 1156, 1156, 144])),
-        threading.Thread(target=api_l.set_all_position, args=([1, 2, 3, 4, 5, 6], [30, 1272, 1173, 1128, 1198, 120]))
-    ]
-
-    for t in threads:
-        t.start()
-
-    for t in threads:
-        t.join()
+    with BimanualDispatcher(api_r, api_l) as dispatcher:
+        print(dispatcher.set_all_position([30, 1219, 1135, 1156, 1156, 144], [30, 1272, 1173, 1128, 1198, 120]))
+        print("Skew:", dispatcher.skew.summary())
 
     print("Grab Finish")
 
@@ -498,59 +1317,19 @@ if __name__ == '__main__':
     sudo chmod 666 /dev/ttyUSB0
     sudo chmod 666 /dev/ttyUSB1
     """
-    # RIGHT   [930, 1771, 1707, 1731, 1731, 981]
-    gesture_list = {
-        "ONE": [30, 1770, 30, 30, 30, 825],
-        "YE": [30, 1770, 1707, 30, 30, 200],
-        "OK": [354, 1080, 1707, 1730, 1730, 418],
-        "GOOD": [930, 10, 30, 30, 30, 980],
-        "FIVE": [930, 1770, 1707, 1730, 1730, 980],
-        "ROCK": [930, 1770, 30, 30, 1730, 980]
-    }
+    from hand_bringup import bring_up
 
     #### Left Hand Initialization #### ttyUSB1
-    """
-    axis_F1     30 - 934      大拇指左右转向
-    axis_F2     10 - 1771     食指
-    axis_F3     30 - 1731     中指
-    axis_F4     30 - 1701     无名指 
-    axis_F5     10 - 1771     小拇指
-    axis_F6     30 - 938      大拇指上下转向
-    """
-    position_limits_left = [
-        [30, 934],
-        [10, 1771],
-        [30, 1731],
-        [30, 1701],
-        [10, 1771],
-        [30, 938],
-    ]
     api_l = DH5ModbusAPI(port='/dev/ttyUSB1', baud_rate=115200)
-    print(api_l.open_connection())
-    print(api_l.initialize(0b10))
-    print(api_l.check_initialization())
 
     #### Right Hand Initialization #### ttyUSB0
-    """
-    axis_F1     30 - 930     大拇指左右转向
-    axis_F2     10 - 1771    食指
-    axis_F3     30 - 1707    中指
-    axis_F4     30 - 1731    无名指 
-    axis_F5     30 - 1731    小拇指
-    axis_F6     30 - 981     大拇指上下转向
-    """
     api_r = DH5ModbusAPI(port='/dev/ttyUSB0', baud_rate=115200)
-    print(api_r.open_connection())
-    print(api_r.initialize(0b10))
-    print(api_r.check_initialization())
-    position_limits_right = [
-        [30, 930],
-        [10, 1771],
-        [30, 1707],
-        [30, 1731],
-        [30, 1731],
-        [30, 981],
-    ]
+
+    # 两只手并行初始化, 轮询到初始化完成为止; 已初始化的手跳过
+    reports, seconds = bring_up({'left': api_l, 'right': api_r})
+    for report in reports.values():
+        print(report)
+    print(f"Bring-up took {seconds:.2f} s")
 
     """
     error_compensation:
@@ -560,8 +1339,6 @@ if __name__ == '__main__':
     """
     # err_gain = [4, 0, 24, -30, 40, -43]
 
-    time.sleep(3)
-
     r_state = api_r.get_all_feedback()
     r_parsed_data = api_r.parse_axis_state(r_state)
     print("RIGHT 运行状态:", r_parsed_data['state'])
@@ -2,12 +2,24 @@
 
 import rospy
 from aiui.srv import DH5SetPosition, DH5SetPositionResponse
+from sensor_msgs.msg import JointState
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
 import threading
 import serial
 import struct
 import random
 import numpy as np
 import time
+import itertools
+
+from hand_bringup import bring_up, MODE_OPEN, MODE_STROKE, DEFAULT_CACHE_PATH
+
+# 夹爪模式: state -> (位置, 速度)
+GRIPPER_POSES = {
+    "open": ([930, 1770, 1707, 1730, 1730, 980], [30, 30, 30, 30, 30, 30]),
+    "close": ([300, 500, 500, 500, 500, 400], [100, 30, 30, 30, 30, 30]),
+}
+
 
 class DH5ModbusAPI:
     SUCCESS = 0
@@ -23,6 +35,9 @@ class DH5ModbusAPI:
         self.stop_bits = stop_bits
         self.parity = parity
         self.serial_connection = None
+        # 服务线程、指令写线程和反馈轮询线程共用一个串口
+        self._bus_lock = threading.Lock()
+        self.position_limits = None  # 行程标定得到的限位, 见 hand_bringup.py
 
     def open_connection(self):
         try:
@@ -58,12 +73,31 @@ class DH5ModbusAPI:
             else:
                 return self.ERROR_INVALID_COMMAND
 
-            self.serial_connection.write(message)
-            response = self.serial_connection.read(256)
+            with self._bus_lock:
+                self.serial_connection.write(message)
+                response = self._read_response()
             return self._parse_response(response, function_code)
         except Exception as e:
             return f"Error: {str(e)}"
 
+    def _read_response(self):
+        """按功能码读取一个完整的RTU响应帧, 不必等待串口超时 (read(256) 每次都要等满1秒)"""
+        header = self.serial_connection.read(2)
+        if len(header) < 2:
+            return header
+        func_code = header[1]
+        if func_code & 0x80:  # 异常响应: 异常码 + CRC
+            remaining = 3
+        elif func_code == 0x03:
+            byte_count = self.serial_connection.read(1)
+            if len(byte_count) < 1:
+                return header
+            header += byte_count
+            remaining = byte_count[0] + 2
+        else:  # 0x06 / 0x10 回显: 地址 + 值/数量 + CRC
+            remaining = 6
+        return header + self.serial_connection.read(remaining)
+
     def _build_request(self, function_code, register_address, data_length=1, value=None, values=None):
         request = bytearray()
         request.append(self.modbus_id)
@@ -215,11 +249,11 @@ class DH5ModbusAPI:
         register_address = 0x0101
         if self.port == '/dev/ttyUSB0':
             # Right hand
-            position_list = self.clamp_list(position_list, position_limits_right)
+            position_list = self.clamp_list(position_list, self.position_limits or position_limits_right)
         if self.port == '/dev/ttyUSB1':
             # Left hand
             position_list = self.err_comp(position_list)
-            position_list = self.clamp_list(position_list, position_limits_left)
+            position_list = self.clamp_list(position_list, self.position_limits or position_limits_left)
 
         return self.send_modbus_command(function_code=0x10,
                                         register_address=register_address,
@@ -296,13 +330,13 @@ class DH5ModbusAPI:
         :param acc_list: 加速度列表
         :return:
         """
-        if axis_list is None or [0]:
+        if not axis_list:
             axis_list = [1, 2, 3, 4, 5, 6]
-        if force_list is None or [0]:
+        if not force_list:
             force_list = [100, 100, 100, 100, 100, 100]
-        if speed_list is None or [0]:
+        if not speed_list:
             speed_list = [50, 50, 50, 50, 50, 50]
-        if acc_list is None or [0]:
+        if not acc_list:
             acc_list = [100, 100, 100, 100, 100, 100]
         for axis in axis_list:
             if axis < 1 or axis > 6:
@@ -311,18 +345,25 @@ class DH5ModbusAPI:
         force_register_address = 0x0107
         speed_register_address = 0x010D
         acc_register_address = 0x0113
-        if self.port == '/dev/ttyUSB0':
-            # Right hand
-            position_list = self.clamp_list(position_list, position_limits_right)
-        if self.port == '/dev/ttyUSB1':
-            # Left hand
-            position_list = self.clamp_list(self.err_comp(position_list), position_limits_left)
-        complete_list = position_list + force_list + speed_list + acc_list
+        position_list = self.target_positions(position_list)
+        complete_list = position_list + list(force_list) + list(speed_list) + list(acc_list)
         return self.send_modbus_command(function_code=0x10,
                                         register_address=position_register_address,
                                         data=complete_list,
                                         data_length=len(complete_list))
 
+    def target_positions(self, position_list):
+        """set_all 实际写入的目标位置 (限位/误差补偿后)"""
+        position_list = list(position_list)
+        if self.port == '/dev/ttyUSB0':
+            # Right hand
+            position_list = self.clamp_list(position_list, self.position_limits or position_limits_right)
+        if self.port == '/dev/ttyUSB1':
+            # Left hand
+            position_list = self.clamp_list(self.err_comp(position_list),
+                                            self.position_limits or position_limits_left)
+        return position_list
+
     def get_all_feedback(self):
         register_address = 0x0201
         return self.send_modbus_command(function_code=0x03, register_address=register_address, data_length=24)
@@ -461,17 +502,411 @@ class DH5ModbusAPI:
             time.sleep(0.5)
     
     def gripper(self, state):
-        if state == "open":
-            # == OPEN == #
-            result = self.set_all([930, 1770, 1707, 1730, 1730, 980], speed_list=[30, 30, 30, 30, 30, 30])
-        elif state == "close":
-            # == CLOSE == #
-            result = self.set_all([300, 500, 500, 500, 500, 400], speed_list=[100, 30, 30, 30, 30, 30])
+        if state in GRIPPER_POSES:
+            position_list, speed_list = GRIPPER_POSES[state]
+            result = self.set_all(position_list, speed_list=speed_list)
         else:
             result = 2
         return result
 
 
+class _RateStats:
+    """统计实际频率 (最近一个统计周期内的次数 / 时长)"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self._window_start = time.monotonic()
+
+    def tick(self):
+        self.count += 1
+        self.total += 1
+
+    def rate(self):
+        """:return: 自上次调用以来的平均频率(Hz), 并开始新的统计周期"""
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        self.count = 0
+        self._window_start = now
+        return rate
+
+
+class HandStreamer:
+    """
+    一只手的流式接口:
+      - 订阅 /dh5/<hand>/command (sensor_msgs/JointState, position 为6个目标位置, 可选 effort 为力),
+        只保留最新一条, 由固定频率的写线程下发, 处理不过来时旧指令直接被覆盖
+      - 后台线程按固定频率读取24个反馈寄存器, 发布 /dh5/<hand>/joint_states
+        (position: 位置, velocity: 速度, effort: 电流)
+      - 每秒在 /diagnostics 上发布实际写入/轮询频率、被覆盖的指令数和指令年龄
+    """
+
+    def __init__(self, hand, api, command_rate=100.0, feedback_rate=50.0):
+        self.hand = hand
+        self.api = api
+        self.command_rate = command_rate
+        self.feedback_rate = feedback_rate
+        self.joint_names = [f"{hand}_F{i}" for i in range(1, 7)]
+        self._lock = threading.Lock()
+        self._latest = None  # (positions, force_list, 收到时间, header.stamp)
+        self._running = False
+        self._threads = []
+        self.received = _RateStats()
+        self.written = _RateStats()
+        self.polled = _RateStats()
+        self.superseded = 0
+        self.write_errors = 0
+        self.poll_errors = 0
+        self._ages = []
+        self._stamp_ages = []
+        self.feedback_pub = rospy.Publisher(f'/dh5/{hand}/joint_states', JointState, queue_size=1)
+        self.diagnostics_pub = rospy.Publisher('/diagnostics', DiagnosticArray, queue_size=1)
+        self.command_sub = rospy.Subscriber(f'/dh5/{hand}/command', JointState, self._on_command,
+                                            queue_size=1, tcp_nodelay=True)
+
+    def start(self):
+        self._running = True
+        for target, name in ((self._write_loop, 'writer'), (self._poll_loop, 'poller'),
+                             (self._stats_loop, 'stats')):
+            thread = threading.Thread(target=target, name=f"dh5-{self.hand}-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._running = False
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _on_command(self, msg):
+        if len(msg.position) != 6:
+            rospy.logwarn_throttle(1.0, f"{self.hand}: command requires exactly 6 positions")
+            return
+        positions = [int(round(p)) for p in msg.position]
+        force_list = [int(round(f)) for f in msg.effort] if len(msg.effort) == 6 else None
+        stamp = 0.0 if msg.header.stamp.is_zero() else msg.header.stamp.to_sec()
+        with self._lock:
+            if self._latest is not None:
+                self.superseded += 1
+            self._latest = (positions, force_list, time.monotonic(), stamp)
+        self.received.tick()
+
+    def _write_loop(self):
+        period = 1.0 / self.command_rate
+        next_time = time.monotonic()
+        while self._running:
+            with self._lock:
+                command, self._latest = self._latest, None
+            if command is not None:
+                positions, force_list, received, stamp = command
+                result = self.api.set_all(positions, force_list=force_list)
+                self._ages.append(time.monotonic() - received)
+                if stamp:
+                    self._stamp_ages.append(rospy.get_time() - stamp)
+                if result == DH5ModbusAPI.SUCCESS:
+                    self.written.tick()
+                else:
+                    self.write_errors += 1
+            next_time += period
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.monotonic()
+
+    def _poll_loop(self):
+        period = 1.0 / self.feedback_rate
+        next_time = time.monotonic()
+        msg = JointState()
+        msg.name = self.joint_names
+        while self._running:
+            response = self.api.get_all_feedback()
+            if isinstance(response, list) and len(response) == 24:
+                data = self.api.parse_axis_state(response)
+                msg.header.stamp = rospy.Time.now()
+                msg.position = data['position']
+                msg.velocity = data['speed']
+                msg.effort = data['current']
+                self.feedback_pub.publish(msg)
+                self.polled.tick()
+            else:
+                self.poll_errors += 1
+            next_time += period
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.monotonic()
+
+    def _stats_loop(self):
+        while self._running:
+            time.sleep(1.0)
+            ages, self._ages = self._ages, []
+            stamp_ages, self._stamp_ages = self._stamp_ages, []
+            values = {
+                'command_rate_hz': self.received.rate(),
+                'write_rate_hz': self.written.rate(),
+                'write_target_hz': self.command_rate,
+                'feedback_rate_hz': self.polled.rate(),
+                'feedback_target_hz': self.feedback_rate,
+                'superseded_commands': self.superseded,
+                'write_errors': self.write_errors,
+                'poll_errors': self.poll_errors,
+                'command_age_mean_ms': 1000 * sum(ages) / len(ages) if ages else 0.0,
+                'command_age_max_ms': 1000 * max(ages) if ages else 0.0,
+                'stamp_age_max_ms': 1000 * max(stamp_ages) if stamp_ages else 0.0,
+            }
+            status = DiagnosticStatus()
+            status.name = f"dh5/{self.hand}"
+            status.hardware_id = self.api.port
+            lagging = values['feedback_rate_hz'] < 0.8 * self.feedback_rate
+            status.level = DiagnosticStatus.WARN if lagging or self.write_errors else DiagnosticStatus.OK
+            status.message = 'feedback rate below target' if lagging else 'ok'
+            status.values = [KeyValue(key, f"{value:.2f}" if isinstance(value, float) else str(value))
+                             for key, value in values.items()]
+            diagnostics = DiagnosticArray()
+            diagnostics.header.stamp = rospy.Time.now()
+            diagnostics.status = [status]
+            self.diagnostics_pub.publish(diagnostics)
+
+
+# 目标ID在两只手之间唯一
+_goal_ids = itertools.count(1)
+
+GOAL_ACTIVE = 'active'
+GOAL_SUCCEEDED = 'succeeded'
+GOAL_STALLED = 'stalled'
+GOAL_PREEMPTED = 'preempted'
+GOAL_ABORTED = 'aborted'
+GOAL_TIMEOUT = 'timeout'
+
+_GOAL_LEVELS = {
+    GOAL_ACTIVE: DiagnosticStatus.OK,
+    GOAL_SUCCEEDED: DiagnosticStatus.OK,
+    GOAL_PREEMPTED: DiagnosticStatus.WARN,
+    GOAL_TIMEOUT: DiagnosticStatus.WARN,
+    GOAL_STALLED: DiagnosticStatus.ERROR,
+    GOAL_ABORTED: DiagnosticStatus.ERROR,
+}
+
+
+class _Goal:
+    __slots__ = ('goal_id', 'position_list', 'force_list', 'speed_list', 'acc_list', 'timeout', 'target', 'start',
+                 'started', 'progress', 'state', 'position')
+
+    def __init__(self, goal_id, position_list, force_list, speed_list, acc_list, timeout):
+        self.goal_id = goal_id
+        self.position_list = position_list
+        self.force_list = force_list
+        self.speed_list = speed_list
+        self.acc_list = acc_list
+        self.timeout = timeout
+        self.target = None
+        self.start = None
+        self.started = None
+        self.progress = [0.0] * 6
+        self.state = [0] * 6
+        self.position = [0] * 6
+
+
+class GoalWorker:
+    """
+    一只手的非阻塞目标执行器 (动作式接口):
+      - submit() 立即返回目标ID, 由工作线程下发 set_all 并按固定频率读取状态寄存器
+      - 在 /dh5/<hand>/goal_status (diagnostic_msgs/DiagnosticStatus) 上发布每个轴的进度,
+        name 为 dh5/<hand>/goal/<ID>, message 为 active / succeeded / stalled / preempted / aborted / timeout
+      - 结果由状态寄存器决定: 全部到达位置为 succeeded, 任一轴堵转为 stalled
+      - 新目标立即抢占正在执行的目标
+    """
+
+    def __init__(self, hand, api, rate=50.0, timeout=10.0, tolerance=20, settle=0.1):
+        """
+        :param rate: 执行中读取状态的频率(Hz)
+        :param timeout: 默认目标超时(秒)
+        :param tolerance: 到达判定的位置容差; 刚下发时状态寄存器可能还是上一个目标的"到达位置"
+        :param settle: 超过该时间(秒)后只以状态寄存器为准 (接触物体时位置可能达不到目标)
+        """
+        self.hand = hand
+        self.api = api
+        self.rate = rate
+        self.timeout = timeout
+        self.tolerance = tolerance
+        self.settle = settle
+        self.status_pub = rospy.Publisher(f'/dh5/{hand}/goal_status', DiagnosticStatus, queue_size=10)
+        self.results = {}  # 目标ID -> 最终结果, 只保留最近的目标
+        self._pending = None
+        self._cancel = False
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"dh5-{self.hand}-goals", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, position_list, force_list=None, speed_list=None, acc_list=None, timeout=None):
+        """:return: 目标ID"""
+        goal = _Goal(next(_goal_ids), list(position_list), force_list, speed_list, acc_list,
+                     self.timeout if timeout is None else timeout)
+        with self._cond:
+            replaced, self._pending = self._pending, goal
+            self._cond.notify()
+        if replaced is not None:
+            # 还没开始执行就被新目标替换
+            self._finish(replaced, GOAL_PREEMPTED)
+        return goal.goal_id
+
+    def cancel(self):
+        """抢占当前目标, 手停在当前位置"""
+        with self._cond:
+            self._cancel = True
+            self._cond.notify()
+
+    def _run(self):
+        period = 1.0 / self.rate
+        goal = None
+        while True:
+            with self._cond:
+                if goal is None:
+                    self._cond.wait_for(lambda: self._pending is not None or self._cancel or not self._running)
+                if not self._running:
+                    break
+                new, self._pending = self._pending, None
+                cancel, self._cancel = self._cancel, False
+            if cancel and goal is not None:
+                # 反馈位置已是设备坐标, 直接写回 (不再做限位/误差补偿)
+                self.api.send_modbus_command(function_code=0x10, register_address=0x0101,
+                                             data=[max(0, p) for p in goal.position], data_length=6)
+                self._finish(goal, GOAL_PREEMPTED, 'canceled')
+                goal = None
+            if new is not None:
+                if goal is not None:
+                    self._finish(goal, GOAL_PREEMPTED)
+                goal = self._begin(new)
+            if goal is not None:
+                goal = self._poll(goal)
+            with self._cond:
+                if goal is not None and self._pending is None and not self._cancel and self._running:
+                    self._cond.wait(period)
+        if goal is not None:
+            self._finish(goal, GOAL_ABORTED, 'node shutdown')
+
+    def _begin(self, goal):
+        position = self.api.get_all_position()
+        if not isinstance(position, list) or len(position) != 6:
+            self._finish(goal, GOAL_ABORTED, f"read position failed: {position}")
+            return None
+        goal.start = [self.api.to_signed_16bit(p) for p in position]
+        goal.position = list(goal.start)
+        goal.target = self.api.target_positions(goal.position_list)
+        result = self.api.set_all(goal.position_list, force_list=goal.force_list, speed_list=goal.speed_list,
+                                  acc_list=goal.acc_list)
+        if result != DH5ModbusAPI.SUCCESS:
+            self._finish(goal, GOAL_ABORTED, f"set_all failed: {result}")
+            return None
+        goal.started = time.monotonic()
+        self._publish(goal, GOAL_ACTIVE)
+        return goal
+
+    def _poll(self, goal):
+        """读取一次状态并发布进度, :return: 目标仍在执行时返回 goal, 否则 None"""
+        elapsed = time.monotonic() - goal.started
+        response = self.api.get_all_feedback()
+        if not isinstance(response, list) or len(response) != 24:
+            if elapsed > goal.timeout:
+                self._finish(goal, GOAL_TIMEOUT, f"read feedback failed: {response}")
+                return None
+            return goal
+        data = self.api.parse_axis_state(response)
+        goal.state = data['state']
+        goal.position = data['position']
+        for i in range(6):
+            distance = goal.target[i] - goal.start[i]
+            if abs(distance) <= self.tolerance:
+                goal.progress[i] = 1.0
+            else:
+                goal.progress[i] = min(1.0, max(0.0, (goal.position[i] - goal.start[i]) / distance))
+
+        stalled = [i + 1 for i in range(6) if goal.state[i] == 2]
+        arrived = all(state == 1 for state in goal.state)
+        within = all(abs(goal.position[i] - goal.target[i]) <= self.tolerance for i in range(6))
+        if stalled:
+            self._finish(goal, GOAL_STALLED, f"stalled axes: {stalled}")
+            return None
+        if arrived and (within or elapsed >= self.settle):
+            self._finish(goal, GOAL_SUCCEEDED)
+            return None
+        if elapsed > goal.timeout:
+            self._finish(goal, GOAL_TIMEOUT)
+            return None
+        self._publish(goal, GOAL_ACTIVE)
+        return goal
+
+    def _finish(self, goal, result, detail=''):
+        self.results[goal.goal_id] = result
+        while len(self.results) > 100:
+            self.results.pop(next(iter(self.results)))
+        if result == GOAL_SUCCEEDED:
+            goal.progress = [1.0] * 6
+        self._publish(goal, result, detail)
+        if result != GOAL_SUCCEEDED:
+            rospy.logwarn(f"{self.hand} goal {goal.goal_id} {result} {detail}")
+
+    def _publish(self, goal, result, detail=''):
+        status = DiagnosticStatus()
+        status.name = f"dh5/{self.hand}/goal/{goal.goal_id}"
+        status.hardware_id = self.api.port
+        status.level = _GOAL_LEVELS[result]
+        status.message = f"{result}: {detail}" if detail else result
+        elapsed = time.monotonic() - goal.started if goal.started is not None else 0.0
+        values = [KeyValue('goal_id', str(goal.goal_id)), KeyValue('result', result),
+                  KeyValue('elapsed', f"{elapsed:.3f}")]
+        for i in range(6):
+            values.append(KeyValue(f"F{i + 1}_progress", f"{goal.progress[i]:.3f}"))
+            values.append(KeyValue(f"F{i + 1}_state", str(goal.state[i])))
+            values.append(KeyValue(f"F{i + 1}_position", str(goal.position[i])))
+        status.values = values
+        self.status_pub.publish(status)
+
+
+def handle_submit_goal(req):
+    """
+    /dh5/submit_goal: 请求格式与 /dh5/set_all_position 相同, 立即返回目标ID (失败返回 -1),
+    进度和结果见 /dh5/<hand>/goal_status
+    """
+    worker = goal_workers.get(req.hand_type)
+    if worker is None:
+        rospy.logerr(f"Invalid hand_type: {req.hand_type}")
+        return DH5SetPositionResponse(-1)
+    if req.hand_mode == 'hand':
+        if len(req.position_list) != 6:
+            rospy.logerr("DH hand requires exactly 6 positions")
+            return DH5SetPositionResponse(-1)
+        goal_id = worker.submit(req.position_list, force_list=req.force_list, speed_list=req.speed_list,
+                                acc_list=req.acc_list)
+    elif req.hand_mode == 'gripper' and req.gripper_state in GRIPPER_POSES:
+        position_list, speed_list = GRIPPER_POSES[req.gripper_state]
+        goal_id = worker.submit(position_list, speed_list=speed_list)
+    elif req.hand_mode == 'cancel':
+        worker.cancel()
+        return DH5SetPositionResponse(0)
+    else:
+        rospy.logerr(f"Invalid hand_mode | gripper_state: {req.hand_mode} | {req.gripper_state}")
+        return DH5SetPositionResponse(-1)
+    rospy.loginfo(f"{req.hand_type} goal {goal_id} accepted")
+    return DH5SetPositionResponse(goal_id)
+
+
 def handle_set_position(req):
     # 根据请求中的hand_type决定使用哪个机械手
     if len(req.position_list) != 6 and req.hand_mode == 'hand':
@@ -513,6 +948,10 @@ def handle_set_position(req):
 
 def shutdown_hook():
     rospy.loginfo("Shutting down, closing connections")
+    for streamer in streamers:
+        streamer.stop()
+    for worker in goal_workers.values():
+        worker.stop()
     api_r.close_connection()
     api_l.close_connection()
 
@@ -546,9 +985,6 @@ if __name__ == '__main__':
     axis_F6     30 - 938      大拇指上下转向
     """
     api_l = DH5ModbusAPI(port='/dev/ttyUSB1', baud_rate=115200)
-    rospy.loginfo(api_l.open_connection())
-    rospy.loginfo(api_l.initialize(0b10))
-    rospy.loginfo(api_l.check_initialization())
     position_limits_left = [
         [30, 934],
         [10, 1771],
@@ -568,9 +1004,6 @@ if __name__ == '__main__':
     axis_F6     30 - 981     大拇指上下转向
     """
     api_r = DH5ModbusAPI(port='/dev/ttyUSB0', baud_rate=115200)
-    rospy.loginfo(api_r.open_connection())
-    rospy.loginfo(api_r.initialize(0b10))
-    rospy.loginfo(api_r.check_initialization())
     position_limits_right = [
         [30, 930],
         [10, 1771],
@@ -587,6 +1020,21 @@ if __name__ == '__main__':
         ERR_GAIN = LEFT - RIGHT  [+4, 0, +24, -30, +40, -43]
     """
     # err_gain = [4, 0, 24, -30, 40, -43]
+
+    # 两只手并行初始化 (已初始化则跳过), 行程限位从缓存读取; ~stroke_calibrate 为真时重新标定
+    reports, startup_seconds = bring_up({'left': api_l, 'right': api_r},
+                                         mode=MODE_STROKE if rospy.get_param('~stroke_calibrate', False) else MODE_OPEN,
+                                         calibrate=rospy.get_param('~stroke_calibrate', False),
+                                         cache_path=rospy.get_param('~bringup_cache', DEFAULT_CACHE_PATH))
+    for report in reports.values():
+        if report.error is None:
+            rospy.loginfo(str(report))
+        else:
+            rospy.logerr(str(report))
+    rospy.set_param('~startup_seconds', startup_seconds)
+    rospy.loginfo(f"Hands ready in {startup_seconds:.2f} s")
+    streamers = []
+    goal_workers = {}
     rospy.on_shutdown(shutdown_hook)
 
 
@@ -608,6 +1056,25 @@ if __name__ == '__main__':
     # 创建ROS服务
     service = rospy.Service('/dh5/set_all_position', DH5SetPosition, handle_set_position)
     rospy.loginfo("SetAllPosition service ready")
+
+    # 流式指令话题和反馈发布
+    command_rate = rospy.get_param('~command_rate', 100.0)
+    feedback_rate = rospy.get_param('~feedback_rate', 50.0)
+    streamers = [HandStreamer('right', api_r, command_rate, feedback_rate),
+                 HandStreamer('left', api_l, command_rate, feedback_rate)]
+    for streamer in streamers:
+        streamer.start()
+    rospy.loginfo(f"Streaming topics ready: command {command_rate} Hz, feedback {feedback_rate} Hz")
+
+    # 非阻塞目标接口, 两只手各自一个工作线程
+    goal_rate = rospy.get_param('~goal_rate', 50.0)
+    goal_timeout = rospy.get_param('~goal_timeout', 10.0)
+    goal_workers = {'right': GoalWorker('right', api_r, goal_rate, goal_timeout),
+                    'left': GoalWorker('left', api_l, goal_rate, goal_timeout)}
+    for worker in goal_workers.values():
+        worker.start()
+    goal_service = rospy.Service('/dh5/submit_goal', DH5SetPosition, handle_submit_goal)
+    rospy.loginfo("SubmitGoal service ready")
     
     # 进入事件循环
     rospy.spin()
@@ -0,0 +1,524 @@
+"""
+DH6 Modbus 从站模拟器 (对应 DH6Modbus 固件)
+  - 在伪终端上提供 Modbus RTU 从站, DexHandControl(port=emulator.port) 无需修改即可连接
+  - 实现 FC03 / FC06 / FC16 和命令 1-10 (单控/组控/清错/组合控制/读ID/设ID/ID扫描/轨迹播放/停止/定时执行)
+  - 可设置每个ID的应答时间和不在线ID的等待超时, 用于评估扫描耗时
+  - frames 统计应答的请求帧数, 用于比较逐点下发与轨迹缓冲区的总线流量
+  - 设备时钟 micros() 可设置偏差和漂移, 读时钟寄存器时锁存, 命令0x0A按设备时间定时执行
+  - 手掌反馈区按固件的轮询顺序和每次读取耗时在后台更新, 温度/电压取自 palm_sensors
+
+用法:
+    emulator = DH6Emulator(finger_ids=[1, 2, 3, 4, 5], palm_ids=[1, 2, 3])
+    port = emulator.start()
+    hand = DexHandControl(port=port)
+    print(hand.discover_device_ids())
+    emulator.stop()
+
+仅支持 Linux/macOS (os.openpty)
+"""
+
+import os
+import time
+import tty
+import select
+import struct
+import threading
+
+
+
+REG_COMMAND = 0
+REG_DEVICE_TYPE = 1
+REG_DEVICE_ID = 2
+REG_POSITION = 3
+REG_EXEC_TIME = 4
+REG_STATUS = 5
+REG_GROUP_COUNT = 6
+REG_NEW_ID = 7
+REG_ID_RESULT = 8
+REG_ID_SAVE = 9
+REG_GROUP_START = 10
+REG_HAND_FINGER_COUNT = 20
+REG_HAND_PALM_COUNT = 31
+REG_SCAN_STATUS = 48
+REG_SCAN_FINGER_MAP = 49
+REG_SCAN_PALM_MAP = 51
+SCAN_WINDOW = 32
+REG_TRAJ_STATUS = 56
+REG_TRAJ_INDEX = 57
+REG_TRAJ_ELAPSED = 58
+REG_TRAJ_FINGER_COUNT = 59
+REG_TRAJ_PALM_COUNT = 60
+REG_TRAJ_FINGER_IDS = 61
+REG_TRAJ_PALM_IDS = 66
+REG_TRAJ_POINTS = 71
+REG_TRAJ_BUFFER = 72
+TRAJ_BUFFER_SIZE = 1024
+REG_CLOCK_LO = REG_TRAJ_BUFFER + TRAJ_BUFFER_SIZE
+REG_CLOCK_HI = REG_CLOCK_LO + 1
+REG_EXEC_AT_LO = REG_CLOCK_LO + 2
+REG_EXEC_AT_HI = REG_CLOCK_LO + 3
+REG_EXEC_CMD = REG_CLOCK_LO + 4
+REG_EXEC_STATE = REG_CLOCK_LO + 5
+REG_EXEC_ACTUAL_LO = REG_CLOCK_LO + 6
+REG_EXEC_ACTUAL_HI = REG_CLOCK_LO + 7
+REG_PALM_FB_COUNT = REG_CLOCK_LO + 8
+REG_PALM_FB_IDS = REG_PALM_FB_COUNT + 1
+REG_PALM_FB_ROUNDS = REG_PALM_FB_COUNT + 6
+REG_PALM_FB_DATA = REG_PALM_FB_COUNT + 7
+PALM_FB_MAX = 5
+PALM_FB_STRIDE = 5
+PALM_FB_NO_DATA = 0xFFFF
+REGISTER_COUNT = REG_PALM_FB_DATA + PALM_FB_MAX * PALM_FB_STRIDE
+MAX_READ_QUANTITY = 125
+MAX_WRITE_QUANTITY = 123
+
+TRAJ_IDLE = 0
+TRAJ_PLAYING = 1
+TRAJ_DONE = 2
+TRAJ_STOPPED = 3
+
+EXEC_PENDING = 1
+EXEC_DONE = 2
+
+FINGER = 0
+PALM = 1
+BOTH = 2
+
+
+def _crc16(data):
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def _with_crc(body):
+    return body + struct.pack('<H', _crc16(body))
+
+
+class DH6Emulator:
+    def __init__(self, finger_ids=(1, 2, 3, 4, 5), palm_ids=(1, 2, 3), slave_id=1,
+                 reply_time=0.0002, absent_timeout=0.0015, frame_gap=0.00175, clock_offset=0.0,
+                 clock_drift_ppm=0.0, baudrate=None, palm_read_time=0.0013):
+        """
+        :param reply_time: 在线设备应答读ID请求的耗时(秒)
+        :param absent_timeout: 固件等待不在线设备的超时(秒)
+        :param frame_gap: 帧间静默时间(秒), 与固件 MODBUS_FRAME_GAP_US 一致
+        :param clock_offset: 设备时钟相对 time.monotonic() 的偏差(秒)
+        :param clock_drift_ppm: 设备时钟漂移 (ppm)
+        :param baudrate: 设置时按 8N1 模拟请求和应答在线上的传输时间 (伪终端本身没有传输延迟)
+        :param palm_read_time: 固件读一次舵机位置/温度/电压的耗时(秒); 不在线的舵机按 PALM_FB_TIMEOUT 计
+        """
+        self.slave_id = slave_id
+        self.reply_time = reply_time
+        self.absent_timeout = absent_timeout
+        self.frame_gap = frame_gap
+        self.clock_offset = clock_offset
+        self.clock_drift_ppm = clock_drift_ppm
+        self.baudrate = baudrate
+        self.registers = [0] * REGISTER_COUNT
+        self.registers[REG_STATUS] = 0xA0
+        # 设备类型 -> {ID: 当前位置}
+        self.devices = {FINGER: {i: 0 for i in finger_ids}, PALM: {i: 500 for i in palm_ids}}
+        # 舵机ID -> (温度℃, 电压mV)
+        self.palm_sensors = {i: (35, 7400) for i in palm_ids}
+        self.palm_read_time = palm_read_time
+        # 与固件 initializeHoldingRegisters 相同: 默认轮询舵机1-3
+        self.registers[REG_PALM_FB_COUNT] = 3
+        self.registers[REG_PALM_FB_IDS:REG_PALM_FB_IDS + 3] = [1, 2, 3]
+        for i in range(PALM_FB_MAX):
+            self.registers[REG_PALM_FB_DATA + i * PALM_FB_STRIDE + 3] = PALM_FB_NO_DATA
+        self._palm_fb_ids = [0] * PALM_FB_MAX
+        self._palm_fb_updated = [None] * PALM_FB_MAX
+        self._palm_fb_slot = 0
+        self._palm_fb_slow = 0
+        self._palm_fb_next = time.monotonic()
+        self.frames = 0
+        # 轨迹播放: (播放开始后的秒数, 路点下标), 便于检查时序
+        self.trajectory_log = []
+        self._traj_start = 0.0
+        self.port = None
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._running = False
+
+    # -------------------- 传输层 --------------------
+    def start(self):
+        """创建伪终端并在后台线程中应答, :return: 客户端应打开的串口路径"""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name='dh6-emulator', daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        os.close(self._master)
+        os.close(self._slave)
+
+    def _serve(self):
+        buffer = bytearray()
+        while self._running:
+            self.service_trajectory()
+            self.service_schedule()
+            self.service_palm_feedback()
+            idle = 0.001 if self.registers[REG_TRAJ_STATUS] == TRAJ_PLAYING else 0.05
+            if self.registers[REG_EXEC_STATE] == EXEC_PENDING:
+                idle = 0.0002
+            readable, _, _ = select.select([self._master], [], [], self.frame_gap if buffer else idle)
+            if readable:
+                buffer += os.read(self._master, 256)
+                continue
+            if buffer:
+                if self.baudrate:
+                    time.sleep(len(buffer) * 10 / self.baudrate)
+                response = self.handle_frame(bytes(buffer))
+                buffer.clear()
+                if response:
+                    if self.baudrate:
+                        time.sleep(len(response) * 10 / self.baudrate)
+                    os.write(self._master, response)
+
+    # -------------------- Modbus --------------------
+    def handle_frame(self, frame):
+        """处理一个完整的RTU请求帧, :return: 应答帧, 不应答时返回 None"""
+        if len(frame) < 6 or _crc16(frame[:-2]) != struct.unpack('<H', frame[-2:])[0]:
+            return None
+        slave, function_code = frame[0], frame[1]
+        if slave != self.slave_id:
+            return None
+        self.frames += 1
+        address, value = struct.unpack('>HH', frame[2:6])
+        self.service_trajectory()
+        if function_code == 0x03:
+            if not 1 <= value <= MAX_READ_QUANTITY:
+                return self._exception(function_code, 0x03)
+            if address + value > REGISTER_COUNT:
+                return self._exception(function_code, 0x02)
+            if address <= REG_CLOCK_HI and address + value > REG_CLOCK_LO:
+                now = self.micros()
+                self.registers[REG_CLOCK_LO], self.registers[REG_CLOCK_HI] = now & 0xFFFF, now >> 16
+            if address < REGISTER_COUNT and address + value > REG_PALM_FB_DATA:
+                self.service_palm_feedback()
+                self._latch_palm_age()
+            data = b''.join(struct.pack('>H', v) for v in self.registers[address:address + value])
+            return _with_crc(bytes([slave, 0x03, len(data)]) + data)
+        if function_code == 0x06:
+            if address >= REGISTER_COUNT:
+                return self._exception(function_code, 0x02)
+            if self._trajectory_locked(address, 1):
+                return self._exception(function_code, 0x06)
+            self.registers[address] = value
+            if address == REG_COMMAND:
+                self.execute(value)
+            return _with_crc(frame[:6])
+        if function_code == 0x10:
+            byte_count = frame[6] if len(frame) > 6 else 0
+            if not 1 <= value <= MAX_WRITE_QUANTITY or byte_count != value * 2 or len(frame) != 9 + byte_count:
+                return self._exception(function_code, 0x03)
+            if address + value > REGISTER_COUNT:
+                return self._exception(function_code, 0x02)
+            if self._trajectory_locked(address, value):
+                return self._exception(function_code, 0x06)
+            self.registers[address:address + value] = struct.unpack(f'>{value}H', frame[7:7 + byte_count])
+            if address == REG_COMMAND:
+                self.execute(self.registers[REG_COMMAND])
+            return _with_crc(frame[:6])
+        return self._exception(function_code, 0x01)
+
+    def _trajectory_locked(self, address, count):
+        return (self.registers[REG_TRAJ_STATUS] == TRAJ_PLAYING and address + count > REG_TRAJ_FINGER_COUNT
+                and address < REG_TRAJ_BUFFER + TRAJ_BUFFER_SIZE)
+
+    def _exception(self, function_code, code):
+        return _with_crc(bytes([self.slave_id, function_code | 0x80, code]))
+
+    # -------------------- 命令 --------------------
+    def execute(self, command):
+        regs = self.registers
+        dev_type = regs[REG_DEVICE_TYPE]
+        if command == 0x01:
+            self._move(dev_type, regs[REG_DEVICE_ID], regs[REG_POSITION])
+            regs[REG_STATUS] = 0xA0 if dev_type == FINGER else 0xB0
+        elif command == 0x02:
+            stride = 2 if dev_type == FINGER else 3
+            for i in range(regs[REG_GROUP_COUNT]):
+                base = REG_GROUP_START + i * stride
+                self._move(dev_type, regs[base], regs[base + 1])
+            regs[REG_STATUS] = 0xC0 if dev_type == FINGER else 0xD0
+        elif command == 0x03:
+            regs[REG_STATUS] = 0xF0
+        elif command == 0x04:
+            finger_count, palm_count = regs[REG_HAND_FINGER_COUNT], regs[REG_HAND_PALM_COUNT]
+            if finger_count > 5:
+                regs[REG_STATUS] = 0xE8
+                return
+            if palm_count > 5:
+                regs[REG_STATUS] = 0xE9
+                return
+            if finger_count == 0 and palm_count == 0:
+                regs[REG_STATUS] = 0xEB
+                return
+            for i in range(finger_count):
+                self._move(FINGER, regs[21 + i * 2], regs[22 + i * 2])
+            for i in range(palm_count):
+                self._move(PALM, regs[32 + i * 3], regs[33 + i * 3])
+            regs[REG_STATUS] = 0x90
+        elif command == 0x05:
+            self._read_id(dev_type, regs[REG_DEVICE_ID])
+        elif command == 0x06:
+            self._set_id(dev_type, regs[REG_DEVICE_ID], regs[REG_NEW_ID])
+        elif command == 0x07:
+            self._scan(dev_type, regs[REG_DEVICE_ID], regs[REG_POSITION])
+        elif command == 0x08:
+            self._start_trajectory()
+        elif command == 0x09:
+            if regs[REG_TRAJ_STATUS] == TRAJ_PLAYING:
+                regs[REG_TRAJ_STATUS] = TRAJ_STOPPED
+            regs[REG_STATUS] = 0x95
+        elif command == 0x0A:
+            if regs[REG_EXEC_CMD] not in (0x01, 0x02, 0x08, 0x09):
+                regs[REG_STATUS] = 0xF2
+                return
+            regs[REG_EXEC_STATE] = EXEC_PENDING
+            regs[REG_STATUS] = 0x96
+        else:
+            regs[REG_STATUS] = 0xE0
+
+    def _move(self, dev_type, dev_id, position):
+        devices = self.devices.get(dev_type, {})
+        if dev_id in devices:
+            devices[dev_id] = position
+
+    def _ping(self, dev_type, dev_id):
+        present = dev_id in self.devices.get(dev_type, {})
+        return present, self.reply_time if present else self.absent_timeout
+
+    def _read_id(self, dev_type, dev_id):
+        if dev_type not in (FINGER, PALM):
+            self.registers[REG_STATUS] = 0xE1
+            return
+        present, cost = self._ping(dev_type, dev_id)
+        time.sleep(cost)
+        if present:
+            self.registers[REG_ID_RESULT] = dev_id
+            self.registers[REG_STATUS] = 0x91
+        else:
+            self.registers[REG_STATUS] = 0xEC
+
+    def _set_id(self, dev_type, old_id, new_id):
+        devices = self.devices.get(dev_type)
+        if devices is None:
+            self.registers[REG_STATUS] = 0xE1
+        elif old_id not in devices or new_id in devices or not 1 <= new_id <= 253:
+            self.registers[REG_STATUS] = 0xED
+        else:
+            devices[new_id] = devices.pop(old_id)
+            self.registers[REG_ID_RESULT] = new_id
+            self.registers[REG_STATUS] = 0x92
+
+    def _scan(self, dev_type, start_id, count):
+        regs = self.registers
+        if dev_type not in (FINGER, PALM, BOTH):
+            regs[REG_STATUS] = regs[REG_SCAN_STATUS] = 0xE1
+            return
+        if start_id < 1 or not 1 <= count <= SCAN_WINDOW or start_id + count - 1 > 253:
+            regs[REG_STATUS] = regs[REG_SCAN_STATUS] = 0xEE
+            return
+        types = (FINGER, PALM) if dev_type == BOTH else (dev_type,)
+        maps = {FINGER: 0, PALM: 0}
+        elapsed = 0.0
+        for i in range(count):
+            # 两条串口同时发出请求, 耗时取较长者
+            costs = []
+            for t in types:
+                present, cost = self._ping(t, start_id + i)
+                if present:
+                    maps[t] |= 1 << i
+                costs.append(cost)
+            elapsed += max(costs)
+        time.sleep(elapsed)
+        regs[REG_SCAN_FINGER_MAP] = maps[FINGER] & 0xFFFF
+        regs[REG_SCAN_FINGER_MAP + 1] = maps[FINGER] >> 16
+        regs[REG_SCAN_PALM_MAP] = maps[PALM] & 0xFFFF
+        regs[REG_SCAN_PALM_MAP + 1] = maps[PALM] >> 16
+        regs[REG_STATUS] = regs[REG_SCAN_STATUS] = 0x93
+
+    # -------------------- 手掌反馈 --------------------
+    # 固件 PALM_FB_TIMEOUT_US
+    PALM_FB_TIMEOUT = 0.003
+
+    def service_palm_feedback(self):
+        """
+        补上距上次调用以来固件完成的读取: 每轮读所有舵机的位置, 再读一个舵机的温度或电压
+        每次读取按 palm_read_time (不在线按 PALM_FB_TIMEOUT) 推进, 与固件 servicePalmFeedback() 顺序相同
+        """
+        regs = self.registers
+        now = time.monotonic()
+        count = min(regs[REG_PALM_FB_COUNT], PALM_FB_MAX)
+        if count == 0:
+            self._palm_fb_slot = 0
+            self._palm_fb_next = now
+            return
+        # 空闲很久后只补最近的一段
+        self._palm_fb_next = max(self._palm_fb_next, now - 0.1)
+        while self._palm_fb_next <= now:
+            for i in range(count):
+                if self._palm_fb_ids[i] != regs[REG_PALM_FB_IDS + i]:
+                    base = REG_PALM_FB_DATA + i * PALM_FB_STRIDE
+                    self._palm_fb_ids[i] = regs[REG_PALM_FB_IDS + i]
+                    self._palm_fb_updated[i] = None
+                    regs[base:base + PALM_FB_STRIDE] = [0, 0, 0, PALM_FB_NO_DATA, 0]
+            if self._palm_fb_slot >= count:
+                if self._palm_fb_slow >= count * 2:
+                    self._palm_fb_slow = 0
+                slot, field = divmod(self._palm_fb_slow, 2)
+                field += 1
+                self._palm_fb_slow += 1
+                self._palm_fb_slot = 0
+                regs[REG_PALM_FB_ROUNDS] = (regs[REG_PALM_FB_ROUNDS] + 1) & 0xFFFF
+            else:
+                slot, field = self._palm_fb_slot, 0
+                self._palm_fb_slot += 1
+            base = REG_PALM_FB_DATA + slot * PALM_FB_STRIDE
+            dev_id = self._palm_fb_ids[slot]
+            if dev_id in self.devices[PALM]:
+                self._palm_fb_next += self.palm_read_time
+                if field == 0:
+                    regs[base] = self.devices[PALM][dev_id] & 0xFFFF
+                    self._palm_fb_updated[slot] = self._palm_fb_next
+                else:
+                    regs[base + field] = self.palm_sensors.get(dev_id, (0, 0))[field - 1]
+                regs[base + 4] = 0
+            else:
+                self._palm_fb_next += self.PALM_FB_TIMEOUT
+                regs[base + 4] = min(regs[base + 4] + 1, 0xFFFF)
+
+    def _latch_palm_age(self):
+        now = time.monotonic()
+        for i, updated in enumerate(self._palm_fb_updated):
+            age = None if updated is None else max(0, int((now - updated) * 1000))
+            self.registers[REG_PALM_FB_DATA + i * PALM_FB_STRIDE + 3] = (
+                PALM_FB_NO_DATA if age is None or age > 0xFFFE else age)
+
+    # -------------------- 时钟 --------------------
+    def micros(self):
+        """设备 micros(): 32位微秒计数"""
+        device_time = time.monotonic() * (1 + self.clock_drift_ppm * 1e-6) + self.clock_offset
+        return int(device_time * 1e6) & 0xFFFFFFFF
+
+    def service_schedule(self):
+        """与固件 serviceSchedule() 相同"""
+        regs = self.registers
+        if regs[REG_EXEC_STATE] != EXEC_PENDING:
+            return
+        now = self.micros()
+        at = regs[REG_EXEC_AT_LO] | (regs[REG_EXEC_AT_HI] << 16)
+        if (now - at) & 0xFFFFFFFF >= 0x80000000:
+            return
+        regs[REG_EXEC_ACTUAL_LO], regs[REG_EXEC_ACTUAL_HI] = now & 0xFFFF, now >> 16
+        regs[REG_EXEC_STATE] = EXEC_DONE
+        self.execute(regs[REG_EXEC_CMD])
+
+    # -------------------- 轨迹 --------------------
+    def _trajectory_shape(self):
+        regs = self.registers
+        finger_count, palm_count = regs[REG_TRAJ_FINGER_COUNT], regs[REG_TRAJ_PALM_COUNT]
+        return finger_count, palm_count, 1 + finger_count + palm_count, regs[REG_TRAJ_POINTS]
+
+    def _start_trajectory(self):
+        regs = self.registers
+        finger_count, palm_count, stride, points = self._trajectory_shape()
+        times = regs[REG_TRAJ_BUFFER:REG_TRAJ_BUFFER + points * stride:stride]
+        if (finger_count > 5 or palm_count > 5 or stride == 1 or points == 0
+                or points * stride > TRAJ_BUFFER_SIZE or any(b < a for a, b in zip(times, times[1:]))):
+            regs[REG_STATUS] = 0xF1
+            return
+        regs[REG_TRAJ_INDEX] = regs[REG_TRAJ_ELAPSED] = 0
+        regs[REG_TRAJ_STATUS] = TRAJ_PLAYING
+        regs[REG_STATUS] = 0x94
+        self.trajectory_log = []
+        self._traj_start = time.monotonic()
+        self.service_trajectory()
+
+    def service_trajectory(self):
+        """与固件 serviceTrajectory() 相同: 执行已到期的路点, 落后多个时只执行最新的一个"""
+        regs = self.registers
+        if regs[REG_TRAJ_STATUS] != TRAJ_PLAYING:
+            return
+        elapsed = time.monotonic() - self._traj_start
+        elapsed_ms = int(elapsed * 1000)
+        regs[REG_TRAJ_ELAPSED] = min(elapsed_ms, 0xFFFF)
+        finger_count, palm_count, stride, points = self._trajectory_shape()
+        index = regs[REG_TRAJ_INDEX]
+        due = None
+        while index < points and regs[REG_TRAJ_BUFFER + index * stride] <= elapsed_ms:
+            due = index
+            index += 1
+        if due is not None:
+            base = REG_TRAJ_BUFFER + due * stride
+            for i in range(finger_count):
+                self._move(FINGER, regs[REG_TRAJ_FINGER_IDS + i], regs[base + 1 + i])
+            for i in range(palm_count):
+                self._move(PALM, regs[REG_TRAJ_PALM_IDS + i], regs[base + 1 + finger_count + i])
+            regs[REG_TRAJ_INDEX] = index
+            self.trajectory_log.append((elapsed, due))
+        if index >= points:
+            regs[REG_TRAJ_STATUS] = TRAJ_DONE
+
+
+def benchmark_trajectory(points=20, interval_ms=50, **kwargs):
+    """
+    同一条轨迹: 逐点 move_hand (每点 写参数/写命令/读状态) 与 上传缓冲区+一次播放命令 的总线帧数和耗时
+    :return: {'per_point': (帧数, 秒), 'buffer': (帧数, 秒)}
+    """
+    from modbus_main import DexHandControl
+
+    finger_ids = [1, 2, 3, 4, 5]
+    palm_ids = [1, 2, 3]
+    waypoints = [(i * interval_ms, [20 + (i * 97) % 1980] * 5, [150 + (i * 37) % 700] * 3) for i in range(points)]
+    emulator = DH6Emulator(**kwargs)
+    port = emulator.start()
+    results = {}
+    try:
+        hand = DexHandControl(port=port, parity='N', timeout=1)
+        start = time.monotonic()
+        for time_ms, finger_positions, palm_positions in waypoints:
+            hand.move_hand(finger_ids, finger_positions, palm_ids, palm_positions, [interval_ms] * 3)
+        results['per_point'] = (emulator.frames, time.monotonic() - start)
+
+        emulator.frames = 0
+        start = time.monotonic()
+        hand.upload_trajectory(waypoints, finger_ids, palm_ids)
+        hand.play_trajectory()
+        hand.wait_trajectory(timeout=points * interval_ms / 1000 + 5)
+        results['buffer'] = (emulator.frames, time.monotonic() - start)
+    finally:
+        emulator.stop()
+    return results
+
+
+if __name__ == '__main__':
+    import sys
+
+    if '--bench' in sys.argv:
+        for name, (frames, seconds) in benchmark_trajectory().items():
+            print(f"{name:10s} {frames:4d} frames {seconds:6.2f} s")
+        sys.exit(0)
+
+    emulator = DH6Emulator()
+    print("DH6 emulator on", emulator.start())
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop()
@@ -0,0 +1,94 @@
+"""
+把 main_udp.DexHandControl 的手势方法编译为控制器上的手势宏
+  - 用虚拟时钟执行手势方法: 发出的 MoveFingers / MovePalms / ServoMove 记录为关键帧, _sleep 只推进时钟
+  - 同一时刻的手指和舵机命令合并为一个关键帧
+  - 上传一次后, 每次播放只需一个两字节的数据报, 关键帧间隔由控制器的 millis() 保证
+
+用法:
+    hand = DexHandControl(hand_ip="192.168.4.5")
+    upload_gestures(hand)
+    play_gesture(hand, 'dex_boxing')
+"""
+
+from main_udp import DexHandControl, MACRO_MAX_STEPS
+
+
+# 宏ID = 下标 + 1, 上传和播放使用同一张表
+GESTURES = ('boxing', 'index2thumb', 'middle2thumb', 'ring2thumb', 'dex_boxing', 'ye', 'rock', 'one', 'back',
+            'free', 'demo')
+
+
+class MacroRecorder(DexHandControl):
+    """不发送任何数据, 只按虚拟时间记录手势发出的命令"""
+
+    def __init__(self):
+        super().__init__()
+        self.clock = 0.0
+        self.steps = []
+
+    def _sleep(self, seconds):
+        self.clock += seconds
+
+    def _send_udp_message(self, message_dict):
+        cmd = message_dict['Cmd']
+        if cmd == 'MoveFingers':
+            self._add('F', {'F_ID': list(message_dict['ID_list']), 'F_pos': list(message_dict['pos_list'])})
+        elif cmd == 'MovePalms':
+            self._add('P', {'P_ID': list(message_dict['ID_list']), 'P_pos': list(message_dict['pos_list']),
+                            'P_time': list(message_dict['time_list'])})
+        elif cmd == 'ServoMove':
+            self._add('P', {'P_ID': [message_dict['ID']], 'P_pos': [message_dict['Pos']],
+                            'P_time': [message_dict['Time']]})
+        else:
+            raise ValueError(f"命令 {cmd} 不能编译为手势宏")
+
+    def _add(self, kind, fields):
+        t = int(round(self.clock * 1000))
+        last = self.steps[-1] if self.steps else None
+        # 同一时刻且该关键帧还没有这类设备时合并
+        if last is not None and last['T'] == t and f'{kind}_ID' not in last:
+            last.update(fields)
+        else:
+            step = {'T': t}
+            step.update(fields)
+            self.steps.append(step)
+
+
+def compile_gesture(name):
+    """
+    :param name: DexHandControl 的手势方法名, 例如 'dex_boxing'
+    :return: 关键帧列表, 可直接传给 DexHandControl.upload_macro
+    """
+    recorder = MacroRecorder()
+    getattr(recorder, name)()
+    if len(recorder.steps) > MACRO_MAX_STEPS:
+        raise ValueError(f"手势 {name} 有 {len(recorder.steps)} 个关键帧, 超过 {MACRO_MAX_STEPS}")
+    return recorder.steps
+
+
+def macro_id(name):
+    return GESTURES.index(name) + 1
+
+
+def upload_gestures(hand, names=GESTURES):
+    """
+    编译并上传手势
+    :return: {手势名: 是否上传成功}
+    """
+    return {name: hand.upload_macro(macro_id(name), compile_gesture(name)) for name in names}
+
+
+def play_gesture(hand, name):
+    hand.play_macro(macro_id(name))
+
+
+if __name__ == "__main__":
+    import sys
+
+    if '--upload' in sys.argv:
+        for name, ok in upload_gestures(DexHandControl()).items():
+            print(f"{name:14s} {'ok' if ok else 'FAILED'}")
+    else:
+        for name in GESTURES:
+            steps = compile_gesture(name)
+            print(f"{macro_id(name):2d} {name:14s} {len(steps):2d} steps, {steps[-1]['T']} ms")
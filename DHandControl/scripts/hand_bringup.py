@@ -0,0 +1,265 @@
+"""
+DH5 并行上电初始化与行程标定
+  - 所有手同时打开串口并初始化, 轮询 check_initialization 直到全部轴初始化完成, 不再固定 sleep
+  - 已经初始化的手 (例如只重启了上位机程序) 跳过初始化, 手不会再动作一次
+  - 行程标定 (初始化模式 0b11 + 测量张开/闭合的极限位置) 的结果按手的身份保存在缓存文件中,
+    之后启动直接读取并设置为 api.position_limits. 身份是从手上读回的 Modbus ID (寄存器 0x0302),
+    而不是串口名, 左右手的 /dev/ttyUSB* 枚举顺序互换也不会加载到另一只手的限位;
+    因此使用缓存的多只手需要设置不同的 Modbus ID, 同一次启动中身份重复的手不使用缓存
+  - 每只手和整体的启动耗时写入 hand_metrics (transport='bringup')
+
+用法:
+    api_l = DH5ModbusAPI(port='/dev/ttyUSB1')
+    api_r = DH5ModbusAPI(port='/dev/ttyUSB0')
+    reports, seconds = bring_up({'left': api_l, 'right': api_r})
+    for r in reports.values(): print(r)
+
+只依赖 api 的 open_connection / initialize / check_initialization / send_modbus_command 等方法,
+dh5_control_ros.py 中的 DH5ModbusAPI 也可以使用
+"""
+
+import os
+import json
+import time
+import threading
+from collections import namedtuple
+
+from hand_metrics import REGISTRY
+
+
+DEFAULT_CACHE_PATH = os.path.expanduser('~/.dhand/bringup.json')
+
+MODE_CLOSE = 0b01
+MODE_OPEN = 0b10
+MODE_STROKE = 0b11
+
+# 标定时驱动到的两端目标 (超出行程的部分由电缸自行限位)
+STROKE_MIN_TARGET = 0
+STROKE_MAX_TARGET = 2000
+
+STATE_MOVING = 0
+
+REG_UART_CONFIG = 0x0302  # Modbus ID, 波特率, 停止位, 校验 (见 dh5_baud.py)
+
+# name: 手的名字; identity: 从设备读回的身份 (缓存的键), 读取失败为 None; skipped: 已初始化而跳过; init_seconds: 初始化耗时;
+# limits_source: 'cache' / 'measured' / 'default'; total_seconds: 该手启动总耗时; error: 失败原因或 None
+BringUpReport = namedtuple('BringUpReport', ['name', 'port', 'identity', 'skipped', 'init_seconds', 'limits_source',
+                                             'limits', 'total_seconds', 'error'])
+
+
+def is_initialized(status):
+    return isinstance(status, dict) and len(status) == 6 and all(v == 'initialized' for v in status.values())
+
+
+def wait_initialized(api, timeout=15.0, poll_interval=0.05):
+    """
+    轮询初始化状态
+    :return: (是否全部初始化完成, 最后一次状态)
+    """
+    deadline = time.monotonic() + timeout
+    status = None
+    while True:
+        status = api.check_initialization()
+        if is_initialized(status):
+            return True, status
+        if time.monotonic() >= deadline:
+            return False, status
+        time.sleep(poll_interval)
+
+
+def ensure_initialized(api, mode=MODE_OPEN, force=False, timeout=15.0, poll_interval=0.05):
+    """
+    只有在还没有初始化 (或 force) 时才执行初始化
+    :return: (是否跳过, 是否完成, 最后一次状态)
+    """
+    if not force and is_initialized(api.check_initialization()):
+        return True, True, None
+    api.initialize(mode)
+    # 初始化命令生效前状态寄存器可能仍是上一次的"已初始化", 先等一个轮询周期
+    time.sleep(poll_interval)
+    done, status = wait_initialized(api, timeout, poll_interval)
+    return False, done, status
+
+
+def _wait_settled(api, timeout, poll_interval):
+    """等待所有轴不再处于运动中 (到达或堵转), :return: 当前位置列表或 None"""
+    deadline = time.monotonic() + timeout
+    time.sleep(poll_interval)
+    while time.monotonic() < deadline:
+        state = api.get_all_state()
+        if isinstance(state, list) and len(state) == 6 and STATE_MOVING not in state:
+            position = api.get_all_position()
+            if isinstance(position, list) and len(position) == 6:
+                return [api.to_signed_16bit(p) for p in position]
+        time.sleep(poll_interval)
+    return None
+
+
+def _drive_raw(api, value):
+    """不经过限位/误差补偿直接写6个目标位置"""
+    return api.send_modbus_command(function_code=0x10, register_address=0x0101, data=[value] * 6, data_length=6)
+
+
+def calibrate_stroke(api, timeout=15.0, poll_interval=0.05):
+    """
+    行程标定: 以 0b11 模式初始化, 再分别驱动到两端, 记录实际到达的位置
+    :return: [[min, max]] * 6, 失败返回 None
+    """
+    skipped, done, status = ensure_initialized(api, MODE_STROKE, force=True, timeout=timeout,
+                                               poll_interval=poll_interval)
+    if not done:
+        print(f"{api.port}: 行程初始化超时 {status}")
+        return None
+    _drive_raw(api, STROKE_MIN_TARGET)
+    low = _wait_settled(api, timeout, poll_interval)
+    _drive_raw(api, STROKE_MAX_TARGET)
+    high = _wait_settled(api, timeout, poll_interval)
+    if low is None or high is None:
+        print(f"{api.port}: 行程测量超时")
+        return None
+    return [[min(lo, hi), max(lo, hi)] for lo, hi in zip(low, high)]
+
+
+def hand_identity(api):
+    """
+    从设备读回保存的 Modbus ID 作为手的身份, 与串口枚举顺序无关
+    :return: 'modbus-id-<n>', 读取失败返回 None
+    """
+    response = api.send_modbus_command(function_code=0x03, register_address=REG_UART_CONFIG, data_length=1)
+    if isinstance(response, list) and len(response) == 1:
+        return f"modbus-id-{response[0]}"
+    return None
+
+
+def load_cache(path=DEFAULT_CACHE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, path=DEFAULT_CACHE_PATH):
+    """先写临时文件再改名, 多个进程同时启动也不会读到半个文件"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def bring_up_hand(name, api, mode=MODE_OPEN, force=False, calibrate=False, cache=None, timeout=15.0,
+                  poll_interval=0.05):
+    """
+    单只手: 打开串口 -> 初始化 (已初始化则跳过) -> 行程限位 (缓存或标定)
+    :param cache: load_cache() 的结果, 按 hand_identity() 索引; 标定结果会写回其中 (由调用者保存).
+                  读不到身份时既不使用也不写入缓存. 这里不检查身份是否与其他手重复,
+                  同时使用多只手时应通过 bring_up() 启动
+    :return: BringUpReport
+    """
+    start = time.monotonic()
+    init_seconds = 0.0
+    skipped = False
+    limits_source = 'default'
+    limits = None
+    identity = None
+    error = None
+    try:
+        if api.serial_connection is None or not api.serial_connection.is_open:
+            result = api.open_connection()
+            if result != api.SUCCESS:
+                raise ConnectionError(result)
+
+        identity = hand_identity(api)
+        entry = (cache or {}).get(identity) if identity is not None else None
+        if calibrate or (mode == MODE_STROKE and entry is None):
+            init_start = time.monotonic()
+            limits = calibrate_stroke(api, timeout, poll_interval)
+            init_seconds = time.monotonic() - init_start
+            if limits is None:
+                raise TimeoutError("stroke calibration failed")
+            limits_source = 'measured'
+            if cache is not None and identity is not None:
+                cache[identity] = {'limits': limits, 'port': api.port, 'calibrated_at': time.time()}
+            # 标定后停在张开位置, 与 MODE_OPEN 初始化的结果一致
+        else:
+            init_start = time.monotonic()
+            skipped, done, status = ensure_initialized(api, MODE_OPEN if mode == MODE_STROKE else mode, force,
+                                                       timeout, poll_interval)
+            init_seconds = time.monotonic() - init_start
+            if not done:
+                raise TimeoutError(f"initialization timed out: {status}")
+            if entry is not None:
+                limits = entry['limits']
+                limits_source = 'cache'
+        if limits is not None:
+            api.position_limits = limits
+    except Exception as e:
+        error = str(e)
+    total_seconds = time.monotonic() - start
+    REGISTRY.transport('bringup', api.port).observe('hand', total_seconds,
+                                                    outcome='ok' if error is None else 'error', busy=False)
+    return BringUpReport(name, api.port, identity, skipped, init_seconds, limits_source, limits, total_seconds, error)
+
+
+def bring_up(apis, mode=MODE_OPEN, force=False, calibrate=False, cache_path=DEFAULT_CACHE_PATH, timeout=15.0,
+             poll_interval=0.05):
+    """
+    并行启动多只手
+    :param apis: {name: api}
+    :param mode: 初始化模式, MODE_STROKE 时没有缓存的手会做行程标定
+    :param force: 即使已初始化也重新初始化
+    :param calibrate: 忽略缓存, 重新做行程标定
+    :return: ({name: BringUpReport}, 整体耗时秒数)
+    """
+    start = time.monotonic()
+    cache = load_cache(cache_path) if cache_path else {}
+    reports = {}
+
+    def run(name, api):
+        reports[name] = bring_up_hand(name, api, mode, force, calibrate, cache, timeout, poll_interval)
+
+    threads = [threading.Thread(target=run, args=(name, api), name=f"bringup-{name}", daemon=True)
+               for name, api in apis.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 身份重复时无法区分缓存属于哪只手: 撤销从缓存加载的限位, 也不保存这些手的标定结果
+    identities = [r.identity for r in reports.values() if r.identity is not None]
+    duplicates = {identity for identity in identities if identities.count(identity) > 1}
+    for identity in sorted(duplicates):
+        hands = ', '.join(f"{r.name}({r.port})" for r in reports.values() if r.identity == identity)
+        print(f"警告: {hands} 的身份都是 {identity}, 无法区分行程缓存, 使用默认限位; "
+              f"为每只手设置不同的 Modbus ID 后才能使用缓存")
+    for name, report in list(reports.items()):
+        if report.identity not in duplicates:
+            continue
+        cache.pop(report.identity, None)
+        if report.limits_source == 'cache':
+            apis[name].position_limits = None
+            reports[name] = report._replace(limits_source='default', limits=None)
+
+    if cache_path and any(r.limits_source == 'measured' and r.identity not in duplicates
+                          for r in reports.values()):
+        save_cache(cache, cache_path)
+    seconds = time.monotonic() - start
+    REGISTRY.transport('bringup', 'all').observe('startup', seconds,
+                                                 outcome='ok' if all(r.error is None for r in reports.values())
+                                                 else 'error', busy=False)
+    return reports, seconds
+
+
+if __name__ == '__main__':
+    import sys
+
+    from dh5_control import DH5ModbusAPI
+
+    ports = [a for a in sys.argv[1:] if not a.startswith('--')] or ['/dev/ttyUSB0', '/dev/ttyUSB1']
+    apis = {port: DH5ModbusAPI(port=port, baud_rate=115200) for port in ports}
+    reports, seconds = bring_up(apis, mode=MODE_STROKE if '--stroke' in sys.argv else MODE_OPEN,
+                       force='--force' in sys.argv, calibrate='--calibrate' in sys.argv)
+    for report in reports.values():
+        print(report)
+    print(f"Bring-up took {seconds:.2f} s")
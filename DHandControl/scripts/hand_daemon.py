@@ -0,0 +1,545 @@
+"""
+本地手部控制守护进程: 常驻进程独占所有串口, 通过 Unix 域套接字为多个客户端进程提供二进制RPC
+  - 手在守护进程启动时初始化一次, 客户端脚本/notebook 连接后即可直接下发指令
+  - 每只手一个工作线程, 请求按优先级执行 (同优先级先到先得); 同一时刻的多个状态读取合并为一次总线读
+  - 客户端可以把多条请求打包一次写入 (HandClient.batch), 也可以发送不需要应答的流式指令
+
+帧格式 (小端):
+  请求: body_len(u32) request_id(u32) hand(u8) op(u8) priority(u8) flags(u8) + body
+  应答: body_len(u32) request_id(u32) status(i16) reserved(u16) + body
+  status: 0 成功; >0 设备错误码 (DH5ModbusAPI.ERROR_* / DH6 命令失败为1); <0 守护进程错误 (STATUS_*)
+
+  OP_HELLO      body: 默认优先级(u8)              -> JSON [[name, kind], ...]
+  OP_SET_ALL    body: 6 或 24 个 u16 (DH5)         -> 空
+  OP_READ_STATE body: 空 (DH5)                     -> 48字节大端反馈寄存器 0x0201..0x0218
+  OP_MOVE_HAND  body: 手指数(u8) 手掌数(u8) (id,位置)*u16 (id,位置,时间)*u16 (DH6) -> 空
+  OP_CALL       body: JSON {"method", "args", "kwargs"} -> JSON 返回值
+
+用法:
+    python3 hand_daemon.py                      # 自动发现所有手
+    python3 hand_daemon.py --hand right=dh5:/dev/ttyUSB0 --hand left=dh5:/dev/ttyUSB1
+
+    from hand_daemon import HandClient
+    client = HandClient()
+    client.set_all('right', [500] * 6)
+    print(client.read_state('right').position)
+"""
+
+import os
+import json
+import time
+import heapq
+import socket
+import struct
+import threading
+from contextlib import contextmanager
+
+from dh5_control import DH5ModbusAPI
+from hand_fleet import HandSpec, open_hand, close_hand, discover_hands
+from hand_types import DH5HandCommand, DH5HandState, DH6HandCommand
+from hand_bringup import bring_up
+
+
+DEFAULT_SOCKET_PATH = '/tmp/dhand.sock'
+
+REQUEST_HEADER = struct.Struct('<IIBBBB')
+RESPONSE_HEADER = struct.Struct('<IIhH')
+
+OP_HELLO = 0
+OP_SET_ALL = 1
+OP_READ_STATE = 2
+OP_MOVE_HAND = 3
+OP_CALL = 4
+
+FLAG_NO_REPLY = 0x01  # 流式指令: 不返回应答, 错误只记录在守护进程中
+
+STATUS_OK = 0
+STATUS_UNKNOWN_OP = -1
+STATUS_UNKNOWN_HAND = -2
+STATUS_BAD_REQUEST = -3
+STATUS_EXCEPTION = -4
+
+DEFAULT_PRIORITY = 100
+
+
+class HandDaemonError(RuntimeError):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class _Connection:
+    __slots__ = ('sock', 'send_lock', 'closed', 'priority')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.send_lock = threading.Lock()
+        self.closed = False
+        self.priority = DEFAULT_PRIORITY
+
+    def reply(self, request_id, status, body=b''):
+        frame = RESPONSE_HEADER.pack(len(body), request_id, status, 0) + body
+        with self.send_lock:
+            if self.closed:
+                return
+            try:
+                self.sock.sendall(frame)
+            except OSError:
+                self.closed = True
+
+
+class _HandWorker:
+    """一只手的执行线程, 请求按 (优先级, 到达顺序) 出队"""
+
+    def __init__(self, index, spec, api):
+        self.index = index
+        self.spec = spec
+        self.api = api
+        self.command = None  # 复用的 DH5HandCommand
+        self.state = DH5HandState() if spec.kind == 'dh5' else None
+        self.errors = 0
+        self._heap = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"daemon-{self.spec.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, connection, request_id, op, priority, flags, body):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._heap, (-priority, self._seq, connection, request_id, op, flags, body))
+            self._cond.notify()
+
+    def _take(self):
+        """取出最高优先级的请求; 若为状态读取, 一并取出队列中所有状态读取"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._heap or not self._running)
+            if not self._running:
+                return []
+            batch = [heapq.heappop(self._heap)]
+            if batch[0][4] == OP_READ_STATE and any(item[4] == OP_READ_STATE for item in self._heap):
+                batch += [item for item in self._heap if item[4] == OP_READ_STATE]
+                self._heap = [item for item in self._heap if item[4] != OP_READ_STATE]
+                heapq.heapify(self._heap)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if not batch:
+                return
+            op, body = batch[0][4], batch[0][6]
+            try:
+                status, result = self.execute(op, body)
+            except Exception as e:
+                status, result = STATUS_EXCEPTION, f"Error: {str(e)}".encode()
+            for _, _, connection, request_id, _, flags, _ in batch:
+                if status != STATUS_OK:
+                    self.errors += 1
+                if not flags & FLAG_NO_REPLY:
+                    connection.reply(request_id, status, result)
+
+    def execute(self, op, body):
+        """:return: (status, 应答body)"""
+        api = self.api
+        if op == OP_CALL:
+            request = json.loads(body)
+            result = getattr(api, request['method'])(*request.get('args', ()), **request.get('kwargs', {}))
+            return STATUS_OK, json.dumps(result).encode()
+        if self.spec.kind == 'dh5':
+            if op == OP_SET_ALL:
+                if len(body) == 12:
+                    positions = struct.unpack('<6H', body)
+                    if self.command is None:
+                        self.command = DH5HandCommand.for_api(api, positions)
+                    else:
+                        self.command.set_positions(positions)
+                elif len(body) == 48:
+                    values = struct.unpack('<24H', body)
+                    self.command = DH5HandCommand.for_api(api, values[0:6], values[6:12], values[12:18],
+                                                          values[18:24])
+                else:
+                    return STATUS_BAD_REQUEST, b'set_all expects 6 or 24 registers'
+                return _status_of(api.send_command(self.command)), b''
+            if op == OP_READ_STATE:
+                result = api.read_state(self.state)
+                return _status_of(result), bytes(self.state.raw) if result == DH5ModbusAPI.SUCCESS else b''
+        elif op == OP_MOVE_HAND:
+            finger_count, palm_count = body[0], body[1]
+            if len(body) != 2 + finger_count * 4 + palm_count * 6:
+                return STATUS_BAD_REQUEST, b'move_hand payload length mismatch'
+            fingers = struct.unpack_from(f'<{finger_count * 2}H', body, 2)
+            palms = struct.unpack_from(f'<{palm_count * 3}H', body, 2 + finger_count * 4)
+            try:
+                command = DH6HandCommand(fingers[0::2], fingers[1::2], palms[0::3], palms[1::3], palms[2::3])
+            except ValueError as e:
+                return STATUS_BAD_REQUEST, str(e).encode()
+            return (STATUS_OK if api.send_hand_command(command) else 1), b''
+        return STATUS_UNKNOWN_OP, f"op {op} not supported on {self.spec.kind}".encode()
+
+
+def _status_of(result):
+    if result == DH5ModbusAPI.SUCCESS:
+        return STATUS_OK
+    if isinstance(result, int):
+        return result
+    return STATUS_EXCEPTION
+
+
+class HandDaemon:
+    """
+    用法:
+        daemon = HandDaemon()
+        daemon.add_hands([HandSpec('right', 'dh5', '/dev/ttyUSB0'), HandSpec('left', 'dh5', '/dev/ttyUSB1')])
+        daemon.serve_forever()
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET_PATH, initialize=True):
+        self.path = path
+        self.initialize = initialize
+        self.workers = []
+        self._names = {}
+        self._server = None
+        self._thread = None
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def add_hand(self, spec, api=None):
+        """打开并初始化一只手; api 不为空时直接使用已打开的控制对象 (不初始化)"""
+        if api is None:
+            return self.add_hands([spec])[0]
+        self._check_new_hands([spec])
+        return self._add_worker(spec, api)
+
+    def add_hands(self, specs):
+        """
+        打开并初始化多只手. DH5 手通过一次 bring_up() 并行初始化 (已初始化则跳过), 行程限位从缓存读取;
+        Modbus ID 相同的手无法区分缓存, bring_up() 会给出警告并使用默认限位. 同时使用的手应一次加入
+        :return: [_HandWorker]
+        """
+        self._check_new_hands(specs)
+        apis = []
+        try:
+            for spec in specs:
+                apis.append(open_hand(spec))
+        except Exception:
+            for spec, api in zip(specs, apis):
+                close_hand(spec, api)
+            raise
+        dh5_apis = {spec.name: api for spec, api in zip(specs, apis) if spec.kind == 'dh5'}
+        if self.initialize and dh5_apis:
+            reports, _ = bring_up(dh5_apis, timeout=10.0)
+            for report in reports.values():
+                if report.error is not None:
+                    print(f"警告: {report.name} 初始化失败: {report.error}")
+        return [self._add_worker(spec, api) for spec, api in zip(specs, apis)]
+
+    def _check_new_hands(self, specs):
+        names = [spec.name for spec in specs]
+        for name in names:
+            if name in self._names or names.count(name) > 1:
+                raise ValueError(f"Duplicate hand name: {name}")
+        if len(self.workers) + len(specs) > 256:
+            raise ValueError("At most 256 hands")
+
+    def _add_worker(self, spec, api):
+        worker = _HandWorker(len(self.workers), spec, api)
+        self.workers.append(worker)
+        self._names[spec.name] = worker.index
+        if self._running:
+            worker.start()
+        return worker
+
+    def start(self):
+        if os.path.exists(self.path):
+            # 上一次未正常退出留下的套接字文件; 若仍有守护进程在监听则不覆盖
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                probe.close()
+                raise RuntimeError(f"Another daemon is listening on {self.path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        os.chmod(self.path, 0o660)
+        self._server.listen(16)
+        self._server.settimeout(0.2)
+        self._running = True
+        for worker in self.workers:
+            worker.start()
+        self._thread = threading.Thread(target=self._accept_loop, name='daemon-accept', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            self._close_connection(connection)
+        for worker in self.workers:
+            worker.stop()
+            close_hand(worker.spec, worker.api)
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            os.unlink(self.path)
+
+    def serve_forever(self):
+        self.start()
+        print(f"手部守护进程监听 {self.path}: " + ', '.join(f"{w.spec.name}({w.spec.kind})" for w in self.workers))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                sock, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            connection = _Connection(sock)
+            with self._lock:
+                self._connections.add(connection)
+            threading.Thread(target=self._client_loop, args=(connection,), name='daemon-client',
+                             daemon=True).start()
+
+    def _close_connection(self, connection):
+        with connection.send_lock:
+            connection.closed = True
+        try:
+            connection.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        connection.sock.close()
+        with self._lock:
+            self._connections.discard(connection)
+
+    def _client_loop(self, connection):
+        """一次 recv 可能包含一批请求, 全部解析后分发到各手的队列"""
+        buffer = bytearray()
+        try:
+            while self._running and not connection.closed:
+                chunk = connection.sock.recv(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+                offset = 0
+                while len(buffer) - offset >= REQUEST_HEADER.size:
+                    body_len, request_id, hand, op, priority, flags = REQUEST_HEADER.unpack_from(buffer, offset)
+                    end = offset + REQUEST_HEADER.size + body_len
+                    if len(buffer) < end:
+                        break
+                    self._dispatch(connection, request_id, hand, op, priority, flags,
+                                   bytes(buffer[offset + REQUEST_HEADER.size:end]))
+                    offset = end
+                del buffer[:offset]
+        except OSError:
+            pass
+        finally:
+            self._close_connection(connection)
+
+    def _dispatch(self, connection, request_id, hand, op, priority, flags, body):
+        if op == OP_HELLO:
+            if body:
+                connection.priority = body[0]
+            hands = [[w.spec.name, w.spec.kind] for w in self.workers]
+            connection.reply(request_id, STATUS_OK, json.dumps(hands).encode())
+            return
+        if hand >= len(self.workers):
+            if not flags & FLAG_NO_REPLY:
+                connection.reply(request_id, STATUS_UNKNOWN_HAND, b'')
+            return
+        # priority 为0时使用连接的默认优先级
+        self.workers[hand].submit(connection, request_id, op, priority or connection.priority, flags, body)
+
+
+class _Pending:
+    __slots__ = ('request_id', 'op', 'status', 'body', 'done')
+
+    def __init__(self, request_id, op):
+        self.request_id = request_id
+        self.op = op
+        self.status = None
+        self.body = None
+        self.done = False
+
+    def result(self):
+        if not self.done:
+            raise RuntimeError("Batch has not been flushed")
+        return _decode_result(self.op, self.status, self.body)
+
+
+def _decode_result(op, status, body):
+    if status != STATUS_OK:
+        raise HandDaemonError(body.decode(errors='replace') or f"status {status}", status)
+    if op == OP_READ_STATE:
+        state = DH5HandState()
+        state.raw[:] = body
+        return state
+    if op == OP_CALL:
+        return json.loads(body)
+    return True
+
+
+class HandClient:
+    """
+    守护进程客户端 (非线程安全, 每个线程各自创建一个)
+    :param priority: 本连接请求的默认优先级 (1-255, 越大越先执行)
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET_PATH, priority=DEFAULT_PRIORITY):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.priority = priority
+        self._request_id = 0
+        self._batch = None
+        self._buffer = bytearray()
+        hands = self._call(0, OP_HELLO, bytes([priority]), decode=lambda body: json.loads(body))
+        self.hands = {name: (index, kind) for index, (name, kind) in enumerate(hands)}
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _index(self, hand):
+        try:
+            return self.hands[hand][0]
+        except KeyError:
+            raise HandDaemonError(f"Unknown hand: {hand}", STATUS_UNKNOWN_HAND) from None
+
+    def _frame(self, hand, op, body, priority, flags):
+        self._request_id = (self._request_id + 1) & 0xFFFFFFFF
+        return self._request_id, REQUEST_HEADER.pack(len(body), self._request_id, hand, op, priority or 0,
+                                                     flags) + body
+
+    def _recv_response(self):
+        while True:
+            if len(self._buffer) >= RESPONSE_HEADER.size:
+                body_len, request_id, status, _ = RESPONSE_HEADER.unpack_from(self._buffer)
+                end = RESPONSE_HEADER.size + body_len
+                if len(self._buffer) >= end:
+                    body = bytes(self._buffer[RESPONSE_HEADER.size:end])
+                    del self._buffer[:end]
+                    return request_id, status, body
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Hand daemon closed the connection")
+            self._buffer += chunk
+
+    def _call(self, hand, op, body=b'', priority=None, flags=0, decode=None):
+        request_id, frame = self._frame(hand, op, body, priority, flags)
+        if self._batch is not None:
+            pending = _Pending(request_id, op)
+            self._batch.append((frame, None if flags & FLAG_NO_REPLY else pending))
+            return pending
+        self.sock.sendall(frame)
+        if flags & FLAG_NO_REPLY:
+            return None
+        while True:
+            reply_id, status, reply = self._recv_response()
+            if reply_id == request_id:
+                break
+        if decode is not None and status == STATUS_OK:
+            return decode(reply)
+        return _decode_result(op, status, reply)
+
+    @contextmanager
+    def batch(self):
+        """
+        批量模式: 块内的调用返回 _Pending, 退出时一次写入并收齐应答, 之后用 .result() 取结果
+            with client.batch():
+                a = client.read_state('right')
+                b = client.read_state('left')
+            print(a.result().position, b.result().position)
+        """
+        self._batch = []
+        try:
+            yield self._batch
+            frames = self._batch
+        finally:
+            self._batch = None
+        self.sock.sendall(b''.join(frame for frame, _ in frames))
+        waiting = {pending.request_id: pending for _, pending in frames if pending is not None}
+        while waiting:
+            reply_id, status, body = self._recv_response()
+            pending = waiting.pop(reply_id, None)
+            if pending is not None:
+                pending.status, pending.body, pending.done = status, body, True
+
+    def set_all(self, hand, position_list, force_list=None, speed_list=None, acc_list=None, priority=None,
+                wait=True):
+        """DH5 set_all; wait=False 时不等待应答 (流式控制)"""
+        if force_list is None and speed_list is None and acc_list is None:
+            body = struct.pack('<6H', *position_list)
+        else:
+            gains = [100] * 6
+            body = struct.pack('<24H', *position_list, *(force_list or gains), *(speed_list or gains),
+                               *(acc_list or gains))
+        return self._call(self._index(hand), OP_SET_ALL, body, priority, 0 if wait else FLAG_NO_REPLY)
+
+    def read_state(self, hand, priority=None):
+        """:return: hand_types.DH5HandState"""
+        return self._call(self._index(hand), OP_READ_STATE, b'', priority)
+
+    def move_hand(self, hand, finger_ids=(), finger_positions=(), palm_ids=(), palm_positions=(), palm_times=(),
+                  priority=None, wait=True):
+        """DH6 组合控制, 参数同 DexHandControl.move_hand"""
+        body = struct.pack(f'<BB{len(finger_ids) * 2}H{len(palm_ids) * 3}H', len(finger_ids), len(palm_ids),
+                           *[v for pair in zip(finger_ids, finger_positions) for v in pair],
+                           *[v for triple in zip(palm_ids, palm_positions, palm_times) for v in triple])
+        return self._call(self._index(hand), OP_MOVE_HAND, body, priority, 0 if wait else FLAG_NO_REPLY)
+
+    def call(self, hand, method, *args, priority=None, **kwargs):
+        """调用控制对象的任意方法, 参数和返回值需可JSON序列化"""
+        body = json.dumps({'method': method, 'args': args, 'kwargs': kwargs}).encode()
+        return self._call(self._index(hand), OP_CALL, body, priority)
+
+
+def _parse_hand(text):
+    """'right=dh5:/dev/ttyUSB0' -> HandSpec"""
+    name, target = text.split('=', 1)
+    kind, port = target.split(':', 1)
+    return HandSpec(name, kind, port)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Hand control daemon (Unix socket RPC)')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH)
+    parser.add_argument('--hand', action='append', help='name=kind:port, e.g. right=dh5:/dev/ttyUSB0')
+    parser.add_argument('--no-init', action='store_true', help='skip DH5 initialization at start-up')
+    args = parser.parse_args()
+
+    daemon = HandDaemon(args.socket, initialize=not args.no_init)
+    daemon.add_hands([_parse_hand(h) for h in args.hand] if args.hand else discover_hands())
+    daemon.serve_forever()
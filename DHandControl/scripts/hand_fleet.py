@@ -0,0 +1,296 @@
+import time
+import threading
+import queue
+import multiprocessing
+from collections import namedtuple
+
+from serial.tools import list_ports
+
+from dh5_control import DH5ModbusAPI
+
+
+# name: 手的名字; kind: 'dh5' 或 'dh6'; port: 串口号
+HandSpec = namedtuple('HandSpec', ['name', 'kind', 'port'])
+
+DH5_FEEDBACK_FIELDS = ['state', 'position', 'speed', 'current', 'cur_faults']
+
+
+def open_hand(spec):
+    """按类型创建并打开手的控制对象"""
+    if spec.kind == 'dh5':
+        api = DH5ModbusAPI(port=spec.port, baud_rate=115200)
+        result = api.open_connection()
+        if result != DH5ModbusAPI.SUCCESS:
+            raise RuntimeError(f"{spec.name}: {result}")
+        return api
+    if spec.kind == 'dh6':
+        from modbus_main import DexHandControl
+        return DexHandControl(port=spec.port, baudrate=115200, parity='E', stopbits=1, bytesize=8, timeout=1)
+    raise ValueError(f"Unknown hand kind: {spec.kind}")
+
+
+def close_hand(spec, api):
+    if spec.kind == 'dh5':
+        api.close_connection()
+    else:
+        api.disconnect()
+
+
+def read_feedback(spec, api, max_age=None):
+    """读取一只手的反馈: DH5 为状态/位置/速度/电流/故障, DH6 为最后的状态码"""
+    if spec.kind == 'dh5':
+        return api.read_fields(DH5_FEEDBACK_FIELDS, max_age=max_age)
+    return {'status': api.get_status(), 'description': api.decode_status()}
+
+
+def _probe_dh5(port):
+    api = DH5ModbusAPI(port=port, baud_rate=115200)
+    if api.open_connection() != DH5ModbusAPI.SUCCESS:
+        return False
+    try:
+        return isinstance(api.check_initialization(), dict)
+    finally:
+        api.close_connection()
+
+
+def _probe_dh6(port):
+    from modbus_main import DexHandControl
+    hand = DexHandControl(port=port, baudrate=115200, parity='E', stopbits=1, bytesize=8, timeout=0.2)
+    if not hand.connect():
+        return False
+    try:
+        hand._read_register_checked(5, "读取状态寄存器")
+        return True
+    except Exception:
+        return False
+    finally:
+        hand.disconnect()
+
+
+def discover_hands(ports=None, kinds=('dh5', 'dh6')):
+    """
+    探测串口上的手
+    :param ports: 串口列表, 默认枚举所有 USB 串口
+    :param kinds: 依次尝试的手类型
+    :return: [HandSpec, ...], 名字按发现顺序为 hand0, hand1, ...
+    """
+    if ports is None:
+        ports = sorted(p.device for p in list_ports.comports()
+                       if 'USB' in p.device or 'ACM' in p.device or p.device.startswith('COM'))
+    probes = {'dh5': _probe_dh5, 'dh6': _probe_dh6}
+    found = []
+    for port in ports:
+        for kind in kinds:
+            try:
+                present = probes[kind](port)
+            except Exception:
+                present = False
+            if present:
+                found.append(HandSpec(f"hand{len(found)}", kind, port))
+                break
+    return found
+
+
+def _serve(spec, api, recv, send):
+    """总线工作循环: 逐条执行请求 (method, args, kwargs) 并返回 (ok, result)"""
+    while True:
+        request = recv()
+        if request is None:
+            break
+        method, args, kwargs = request
+        try:
+            if method == 'feedback':
+                result = read_feedback(spec, api, *args, **kwargs)
+            else:
+                result = getattr(api, method)(*args, **kwargs)
+            send((True, result))
+        except Exception as e:
+            send((False, f"Error: {str(e)}"))
+    close_hand(spec, api)
+
+
+class _ThreadBusWorker:
+    """在线程中独占一条总线"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self._requests = queue.Queue()
+        self._replies = queue.Queue()
+        self._ready = queue.Queue()
+        self.lock = threading.Lock()  # 一次只有一个调用者在本总线上 post/result
+        self.broken = False  # 请求已下发但应答未读取 (调用中途出错), 应答队列不再可信
+        self._thread = threading.Thread(target=self._run, name=f"fleet-{spec.name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        ok, error = self._ready.get()
+        if not ok:
+            raise RuntimeError(error)
+
+    def _run(self):
+        try:
+            api = open_hand(self.spec)
+        except Exception as e:
+            self._ready.put((False, str(e)))
+            return
+        self._ready.put((True, None))
+        _serve(self.spec, api, self._requests.get, self._replies.put)
+
+    def post(self, method, args, kwargs):
+        self._requests.put((method, args, kwargs))
+
+    def result(self):
+        return self._replies.get()
+
+    def stop(self):
+        self._requests.put(None)
+        self._thread.join()
+
+
+def _process_main(spec, conn):
+    try:
+        api = open_hand(spec)
+    except Exception as e:
+        conn.send((False, str(e)))
+        return
+    conn.send((True, None))
+    _serve(spec, api, conn.recv, conn.send)
+
+
+class _ProcessBusWorker:
+    """在独立进程中独占一条总线, 串口在子进程内打开, 不受主进程GIL影响"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self._conn, child_conn = multiprocessing.Pipe()
+        self.lock = threading.Lock()
+        self.broken = False
+        self._process = multiprocessing.Process(target=_process_main, args=(spec, child_conn),
+                                                name=f"fleet-{spec.name}", daemon=True)
+
+    def start(self):
+        self._process.start()
+        ok, error = self._conn.recv()
+        if not ok:
+            raise RuntimeError(error)
+
+    def post(self, method, args, kwargs):
+        self._conn.send((method, args, kwargs))
+
+    def result(self):
+        return self._conn.recv()
+
+    def stop(self):
+        try:
+            self._conn.send(None)
+        except (OSError, EOFError):
+            self._process.terminate()
+        self._process.join()
+
+
+class HandFleet:
+    """
+    多手管理: 每条总线一个工作者(线程或进程), 对外提供统一的广播命令和反馈汇总
+    用法:
+        fleet = HandFleet(discover_hands(), mode='process')
+        fleet.start()
+        fleet.broadcast('set_all', [930, 1770, 1707, 1730, 1730, 980], kinds=('dh5',))
+        print(fleet.feedback())   # {name: (ok, 反馈)}
+        fleet.stop()
+    """
+
+    def __init__(self, specs, mode='thread'):
+        if mode not in ('thread', 'process'):
+            raise ValueError("mode must be 'thread' or 'process'")
+        self.specs = {spec.name: spec for spec in specs}
+        self.mode = mode
+        self._workers = {}
+        self.last_call_duration = None
+
+    def start(self):
+        """任一工作者启动失败时停止已启动的工作者并抛出异常"""
+        worker_class = _ThreadBusWorker if self.mode == 'thread' else _ProcessBusWorker
+        try:
+            for name, spec in self.specs.items():
+                worker = worker_class(spec)
+                worker.start()
+                self._workers[name] = worker
+        except Exception:
+            self.stop()
+            raise
+
+    def stop(self):
+        for worker in self._workers.values():
+            worker.stop()
+        self._workers.clear()
+
+    def names(self, kinds=None):
+        return [name for name, spec in self.specs.items() if kinds is None or spec.kind in kinds]
+
+    def call(self, name, method, *args, **kwargs):
+        """在指定手上执行一个API方法, :return: (ok, 结果), 失败时结果为错误信息"""
+        return self.call_many([name], method, args, kwargs)[name]
+
+    def broadcast(self, method, *args, kinds=None, **kwargs):
+        """
+        在所有手(或指定类型的手)上并行执行同一个API方法
+        :return: {name: (ok, 结果)}
+        """
+        return self.call_many(self.names(kinds), method, args, kwargs)
+
+    def call_many(self, names, method, args=(), kwargs=None):
+        """
+        先向所有总线下发请求, 再收集结果, 各总线互不等待
+        每条总线单独加锁 (按名字顺序获取, 避免死锁), 其他调用者只等待它们用到的总线
+        :return: {name: (ok, 结果)}, ok 为 False 时结果为错误信息
+        下发或读取中途出错时, 已下发但未读取应答的工作者标记为 broken (其应答会错配给下一次调用),
+        之后对它的调用直接返回错误, 需要 stop()/start() 重建
+        """
+        kwargs = kwargs or {}
+        names = sorted(set(names))
+        workers = [self._workers[name] for name in names]
+        start = time.monotonic()
+        results = {}
+        held = []
+        pending = []
+        try:
+            for worker in workers:
+                worker.lock.acquire()
+                held.append(worker)
+                if not worker.broken:
+                    pending.append(worker)
+                    worker.post(method, args, kwargs)
+            for name, worker in zip(names, workers):
+                if worker.broken:
+                    results[name] = (False, f"Error: bus worker {name} is broken by an earlier failed call")
+                else:
+                    results[name] = tuple(worker.result())
+                    pending.remove(worker)
+                held.remove(worker)
+                worker.lock.release()
+        finally:
+            for worker in pending:
+                worker.broken = True
+            for worker in held:
+                worker.lock.release()
+        self.last_call_duration = time.monotonic() - start
+        return results
+
+    def feedback(self, max_age=None):
+        """汇总所有手的反馈 {name: (ok, 反馈)}"""
+        return self.call_many(self.names(), 'feedback', kwargs={'max_age': max_age})
+
+
+if __name__ == '__main__':
+    hands = discover_hands()
+    print("Discovered:", hands)
+    fleet = HandFleet(hands, mode='thread')
+    fleet.start()
+    try:
+        print(fleet.broadcast('initialize', 0b10, kinds=('dh5',)))
+        print(fleet.broadcast('free_all', kinds=('dh6',)))
+        time.sleep(3)
+        print(fleet.feedback())
+        print(f"Broadcast to {len(hands)} hands took {fleet.last_call_duration * 1000:.1f} ms")
+    finally:
+        fleet.stop()
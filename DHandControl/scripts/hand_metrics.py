@@ -0,0 +1,177 @@
+"""
+通信指标: 每次事务的耗时直方图、结果计数(成功/CRC错误/超时/其他)、重试、收发字节数和总线占用率
+以 Prometheus 文本格式导出: 写入 textfile collector 的抓取文件, 或在本地起一个 HTTP 端点
+
+用法:
+    from hand_metrics import REGISTRY, serve_http
+    api_r.metrics = REGISTRY.transport('dh5', '/dev/ttyUSB0')
+    hand.metrics = REGISTRY.transport('dh6', '/dev/ttyUSB0')
+    serve_http(9105)    # curl localhost:9105/metrics
+"""
+
+import os
+import time
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+OUTCOME_OK = 'ok'
+OUTCOME_CRC = 'crc'
+OUTCOME_TIMEOUT = 'timeout'
+OUTCOME_INVALID = 'invalid'
+OUTCOME_ERROR = 'error'
+
+
+class _OpStats:
+    __slots__ = ('bucket_counts', 'latency_sum', 'outcomes')
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.outcomes = {}
+
+
+class TransportMetrics:
+    """
+    一条总线(或一个UDP目标)的指标, observe() 在事务路径上调用, 只做几次整数累加
+    同一个对象会被多个线程同时更新 (流水线读线程与调用线程, HandStreamer 的写线程与轮询线程), 累加在锁内进行
+    """
+
+    def __init__(self, transport, port):
+        self.transport = transport
+        self.port = port
+        self.created = time.monotonic()
+        self.ops = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, op, latency, bytes_sent=0, bytes_received=0, outcome=OUTCOME_OK, busy=True):
+        """:param busy: latency 是否为总线占用时间 (网关排队时间等不计入占用率)"""
+        bucket = bisect_left(LATENCY_BUCKETS, latency)
+        with self._lock:
+            stats = self.ops.get(op)
+            if stats is None:
+                stats = self.ops[op] = _OpStats()
+            stats.bucket_counts[bucket] += 1
+            stats.latency_sum += latency
+            stats.outcomes[outcome] = stats.outcomes.get(outcome, 0) + 1
+            self.bytes_sent += bytes_sent
+            self.bytes_received += bytes_received
+            if busy:
+                self.busy_seconds += latency
+
+    def retry(self, op=None):
+        with self._lock:
+            self.retries += 1
+
+    def utilization(self):
+        elapsed = time.monotonic() - self.created
+        return self.busy_seconds / elapsed if elapsed > 0 else 0.0
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._transports = {}
+        self._lock = threading.Lock()
+
+    def transport(self, transport, port):
+        """获取(或创建) transport/port 对应的指标对象"""
+        key = (transport, port)
+        with self._lock:
+            if key not in self._transports:
+                self._transports[key] = TransportMetrics(transport, port)
+            return self._transports[key]
+
+    def render(self):
+        """:return: Prometheus 文本格式"""
+        with self._lock:
+            transports = list(self._transports.values())
+        lines = [
+            '# HELP dhand_transactions_total Transactions by operation and outcome.',
+            '# TYPE dhand_transactions_total counter',
+        ]
+        for m in transports:
+            for op, stats in list(m.ops.items()):
+                for outcome, count in list(stats.outcomes.items()):
+                    lines.append('dhand_transactions_total%s %d' % (
+                        _labels(transport=m.transport, port=m.port, op=op, outcome=outcome), count))
+
+        lines += [
+            '# HELP dhand_transaction_latency_seconds Transaction round-trip latency.',
+            '# TYPE dhand_transaction_latency_seconds histogram',
+        ]
+        for m in transports:
+            for op, stats in list(m.ops.items()):
+                cumulative = 0
+                for edge, count in zip(LATENCY_BUCKETS + ('+Inf',), stats.bucket_counts):
+                    cumulative += count
+                    lines.append('dhand_transaction_latency_seconds_bucket%s %d' % (
+                        _labels(transport=m.transport, port=m.port, op=op, le=edge), cumulative))
+                base = _labels(transport=m.transport, port=m.port, op=op)
+                lines.append('dhand_transaction_latency_seconds_sum%s %.6f' % (base, stats.latency_sum))
+                lines.append('dhand_transaction_latency_seconds_count%s %d' % (base, cumulative))
+
+        for name, kind, help_text, getter in (
+                ('dhand_bytes_sent_total', 'counter', 'Bytes written to the transport.', lambda m: m.bytes_sent),
+                ('dhand_bytes_received_total', 'counter', 'Bytes read from the transport.',
+                 lambda m: m.bytes_received),
+                ('dhand_retries_total', 'counter', 'Retried transactions.', lambda m: m.retries),
+                ('dhand_bus_busy_seconds_total', 'counter', 'Time spent inside transactions.',
+                 lambda m: m.busy_seconds),
+                ('dhand_bus_utilization', 'gauge', 'Busy time / wall time since start.',
+                 lambda m: m.utilization())):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for m in transports:
+                lines.append('%s%s %s' % (name, _labels(transport=m.transport, port=m.port), getter(m)))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def write_scrape_file(path, interval=5.0, registry=REGISTRY):
+    """后台线程定期写入抓取文件 (先写临时文件再改名, 抓取方不会读到半个文件)"""
+    def run():
+        while True:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(registry.render())
+            os.replace(tmp_path, path)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='dhand-metrics-file', daemon=True)
+    thread.start()
+    return thread
+
+
+def serve_http(port=9105, host='127.0.0.1', registry=REGISTRY):
+    """在后台线程中提供 http://host:port/metrics"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='dhand-metrics-http', daemon=True).start()
+    return server
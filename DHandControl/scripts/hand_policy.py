@@ -0,0 +1,147 @@
+"""
+通信错误类型与重试/超时预算策略 (DH5 / DH6 / UDP 共用)
+
+  - 每次调用有一个截止时间预算, 整个调用不会超过预算; 单次尝试的应答超时默认为预算的 1/max_attempts,
+    一帧丢失不会耗尽整个预算
+  - 只有幂等操作 (读、绝对位置/参数写入) 会在可恢复错误 (超时、CRC、帧错误) 后重试
+  - 触发动作的写入 (DH6 REG_COMMAND、DH5 初始化、保存参数等) 只尝试一次
+  - 重试间隔按指数退避并加入随机抖动, 避免多条总线同步重试
+
+用法:
+    from hand_policy import RetryPolicy, HandError, HandTimeoutError
+    api.policy = RetryPolicy(budget=0.004)       # DH5: 250Hz 控制周期内完成
+    hand.policy = RetryPolicy(budget=0.05)       # DH6
+    try:
+        api.transact(0x03, 0x0207, data_length=6)
+    except HandTimeoutError:
+        ...
+"""
+
+import time
+import random
+
+
+class HandError(RuntimeError):
+    """所有通信错误的基类; code 为对应的 DH5ModbusAPI 错误码 (若有)"""
+    retryable = False
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class HandConnectionError(HandError):
+    """端口未打开或底层连接失败"""
+
+
+class HandTimeoutError(HandError):
+    """在超时时间内没有收到完整应答"""
+    retryable = True
+
+
+class HandCRCError(HandError):
+    """应答CRC校验失败"""
+    retryable = True
+
+
+class HandFrameError(HandError):
+    """应答帧不完整或功能码不匹配 (线路噪声)"""
+    retryable = True
+
+
+class HandDeviceError(HandError):
+    """设备返回Modbus异常应答或错误状态码, 重试不会改变结果"""
+
+    def __init__(self, message, code=None, status=None):
+        super().__init__(message, code)
+        self.status = status
+
+
+class HandBusyError(HandError):
+    """流水线窗口已满等本地资源不足"""
+
+
+class HandDeadlineExceeded(HandTimeoutError):
+    """调用的截止时间预算已用完"""
+    retryable = False
+
+
+class Deadline:
+    def __init__(self, budget):
+        """:param budget: 秒, None 表示不限"""
+        self.expires = None if budget is None else time.monotonic() + budget
+
+    def remaining(self):
+        if self.expires is None:
+            return None
+        return self.expires - time.monotonic()
+
+    def extend(self, seconds):
+        """把不属于总线事务的等待 (例如设备执行时间) 排除在预算之外"""
+        if self.expires is not None:
+            self.expires += seconds
+
+
+class RetryPolicy:
+    def __init__(self, budget=0.05, max_attempts=3, attempt_timeout=None, base_delay=0.0005, max_delay=0.005,
+                 jitter=0.5, min_timeout=0.001):
+        """
+        :param budget: 每次调用的截止时间预算(秒), None 表示只受 max_attempts 限制
+        :param max_attempts: 幂等操作的最大尝试次数 (含第一次)
+        :param attempt_timeout: 单次尝试的应答超时(秒), 默认 budget / max_attempts
+        :param base_delay: 第一次重试前的等待(秒), 之后每次翻倍, 不超过 max_delay
+        :param jitter: 等待时间随机缩短的比例 (0~1)
+        :param min_timeout: 剩余预算小于该值时不再发起新的尝试
+        """
+        self.budget = budget
+        self.max_attempts = max_attempts
+        if attempt_timeout is None and budget is not None:
+            attempt_timeout = budget / max_attempts
+        self.attempt_timeout = attempt_timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.min_timeout = min_timeout
+
+    def deadline(self, budget=None):
+        return Deadline(self.budget if budget is None else budget)
+
+    def backoff(self, attempt):
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * (1.0 - self.jitter * random.random())
+
+    def run(self, attempt_fn, op, idempotent, deadline=None, metrics=None, on_retry=None):
+        """
+        :param attempt_fn: attempt_fn(timeout) 执行一次尝试, 失败时抛出 HandError;
+                           timeout 为本次应答超时(秒), None 表示使用传输层默认值
+        :param op: 操作名, 用于错误信息和 metrics.retry()
+        :param idempotent: 是否允许重试
+        :param deadline: 多个步骤共用一个预算时传入同一个 Deadline
+        :param on_retry: 每次重试前调用, 例如清空串口接收缓冲区
+        """
+        if deadline is None:
+            deadline = self.deadline()
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline.remaining()
+            if remaining is not None and remaining < self.min_timeout:
+                raise HandDeadlineExceeded(f"{op}: 超出时间预算 (已尝试 {attempt - 1} 次)")
+            # 不重试的操作只有一次机会, 可以用完整个剩余预算
+            timeout = self.attempt_timeout if idempotent else None
+            if remaining is not None and (timeout is None or remaining < timeout):
+                timeout = remaining
+            try:
+                return attempt_fn(timeout)
+            except HandError as e:
+                if not (idempotent and e.retryable) or attempt >= self.max_attempts:
+                    raise
+                delay = self.backoff(attempt)
+                remaining = deadline.remaining()
+                if remaining is not None and remaining - delay < self.min_timeout:
+                    raise HandDeadlineExceeded(f"{op}: 超出时间预算, 最后错误: {e}", e.code) from e
+                if metrics is not None:
+                    metrics.retry(op)
+                if on_retry is not None:
+                    on_retry()
+                time.sleep(delay)
@@ -0,0 +1,213 @@
+"""
+共享内存手部状态总线
+  - 一个轮询进程独占串口, 把解码后的反馈块写入 multiprocessing.shared_memory
+  - 任意数量的本地进程按名字挂载同一段内存, 读取一致的快照, 不产生总线流量
+
+内存布局 (小端):
+  header: magic(u32) version(u16) slot_count(u16) latest(u32) reserved(u32) publish_count(u64)
+  slot x2: seq(u64) monotonic(f64) wall_time(f64) sample_id(u64)
+           state[6] position[6] speed[6] current[6] (i16) cur_faults(u16) init_status(u16)
+
+写入采用双缓冲 + 每个槽位独立的 seqlock:
+  写者总是写非 latest 的槽位, seq 先变奇数, 写数据, 再变偶数, 最后更新 latest
+  读者读取 latest 槽位, 前后 seq 相同且为偶数则快照一致, 否则重试
+"""
+
+import time
+import struct
+import threading
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+from dh5_control import DH5ModbusAPI
+
+
+MAGIC = 0x53354844  # 'DH5S'
+VERSION = 1
+SLOT_COUNT = 2
+
+_HEADER = struct.Struct('<IHHIIQ')
+_SLOT_SEQ = struct.Struct('<Q')
+_SLOT_BODY = struct.Struct('<ddQ24hHH')
+_SLOT_SIZE = _SLOT_SEQ.size + _SLOT_BODY.size
+SEGMENT_SIZE = _HEADER.size + SLOT_COUNT * _SLOT_SIZE
+
+HandStateSample = namedtuple('HandStateSample', [
+    'monotonic', 'wall_time', 'sample_id', 'state', 'position', 'speed', 'current', 'cur_faults', 'init_status'])
+
+FEEDBACK_FIELDS = ['init_status', 'state', 'position', 'speed', 'current', 'cur_faults']
+
+# 本进程中由 HandStateWriter 持有的段: 同进程的读者不能把它们从 resource_tracker 注销
+_writer_segments = set()
+
+
+def _slot_offset(index):
+    return _HEADER.size + index * _SLOT_SIZE
+
+
+class HandStateWriter:
+    """共享内存段的唯一写者"""
+
+    def __init__(self, name):
+        self.name = name
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_SIZE)
+        except FileExistsError:
+            # 上次轮询进程异常退出留下的段, 直接复用
+            self.shm = shared_memory.SharedMemory(name=name, create=False)
+        _writer_segments.add(self.shm._name)
+        self._buf = self.shm.buf
+        self._latest = 0
+        self._publish_count = 0
+        self._sample_id = 0
+        for index in range(SLOT_COUNT):
+            _SLOT_SEQ.pack_into(self._buf, _slot_offset(index), 0)
+        _HEADER.pack_into(self._buf, 0, MAGIC, VERSION, SLOT_COUNT, 0, 0, 0)
+
+    def publish(self, snapshot, monotonic=None, wall_time=None):
+        """
+        写入一份反馈快照
+        :param snapshot: DH5Snapshot (需包含 state/position/speed/current)
+        """
+        monotonic = time.monotonic() if monotonic is None else monotonic
+        wall_time = time.time() if wall_time is None else wall_time
+        self._sample_id += 1
+        index = (self._latest + 1) % SLOT_COUNT
+        offset = _slot_offset(index)
+        seq = _SLOT_SEQ.unpack_from(self._buf, offset)[0]
+
+        _SLOT_SEQ.pack_into(self._buf, offset, seq + 1)
+        _SLOT_BODY.pack_into(self._buf, offset + _SLOT_SEQ.size, monotonic, wall_time, self._sample_id,
+                             *snapshot.state, *snapshot.position, *snapshot.speed, *snapshot.current,
+                             snapshot.cur_faults or 0, snapshot.init_status or 0)
+        _SLOT_SEQ.pack_into(self._buf, offset, seq + 2)
+
+        self._latest = index
+        self._publish_count += 1
+        _HEADER.pack_into(self._buf, 0, MAGIC, VERSION, SLOT_COUNT, index, 0, self._publish_count)
+
+    def close(self, unlink=True):
+        self._buf = None
+        _writer_segments.discard(self.shm._name)
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class HandStateReader:
+    """按名字挂载共享内存段, 读取最新的一致快照"""
+
+    def __init__(self, name, retries=100):
+        self.name = name
+        self.retries = retries
+        self.shm = shared_memory.SharedMemory(name=name, create=False)
+        # 读者不拥有该段: 避免 resource_tracker 在读者退出时把它删除;
+        # 写者在同一进程时注册属于写者, 注销后写者 unlink 会让 resource_tracker 报 KeyError
+        if self.shm._name not in _writer_segments:
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self._buf = self.shm.buf
+        magic, version, slot_count, _, _, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION or slot_count != SLOT_COUNT:
+            self.shm.close()
+            raise ValueError(f"Shared memory '{name}' is not a DH5 state segment")
+
+    def publish_count(self):
+        return _HEADER.unpack_from(self._buf, 0)[5]
+
+    def read(self):
+        """
+        :return: HandStateSample, 尚无数据时返回 None
+        数据直接从共享内存解包, 不经过序列化或中间拷贝
+        """
+        for _ in range(self.retries):
+            _, _, _, latest, _, count = _HEADER.unpack_from(self._buf, 0)
+            if count == 0:
+                return None
+            offset = _slot_offset(latest)
+            seq_before = _SLOT_SEQ.unpack_from(self._buf, offset)[0]
+            if seq_before & 1:
+                continue
+            body = _SLOT_BODY.unpack_from(self._buf, offset + _SLOT_SEQ.size)
+            if _SLOT_SEQ.unpack_from(self._buf, offset)[0] == seq_before:
+                regs = body[3:27]
+                return HandStateSample(body[0], body[1], body[2], regs[0:6], regs[6:12], regs[12:18],
+                                       regs[18:24], body[27], body[28])
+        raise RuntimeError(f"Could not read a consistent snapshot from '{self.name}'")
+
+    def wait_next(self, last_sample_id=0, timeout=1.0, poll_interval=0.0005):
+        """等待比 last_sample_id 更新的快照, 超时返回 None"""
+        deadline = time.monotonic() + timeout
+        while True:
+            sample = self.read()
+            if sample is not None and sample.sample_id > last_sample_id:
+                return sample
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def close(self):
+        self._buf = None
+        self.shm.close()
+
+
+class HandStatePoller:
+    """后台轮询线程: 以固定频率读取 DH5 反馈并发布到共享内存"""
+
+    def __init__(self, api, name, rate_hz=200):
+        self.api = api
+        self.writer = HandStateWriter(name)
+        self.period = 1.0 / rate_hz
+        self.errors = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"dh5-shm-{self.writer.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.writer.close()
+
+    def _run(self):
+        deadline = time.monotonic()
+        while self._running:
+            snapshot = self.api.read_fields(FEEDBACK_FIELDS)
+            if isinstance(snapshot, tuple):
+                self.writer.publish(snapshot)
+            else:
+                self.errors += 1
+            deadline += self.period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'read':
+        reader = HandStateReader('dh5_right')
+        last = 0
+        while True:
+            sample = reader.wait_next(last)
+            if sample is not None:
+                last = sample.sample_id
+                print(sample.position, sample.state, sample.cur_faults)
+    else:
+        api = DH5ModbusAPI(port='/dev/ttyUSB0', baud_rate=115200)
+        print(api.open_connection())
+        poller = HandStatePoller(api, 'dh5_right', rate_hz=200)
+        poller.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            poller.stop()
+            api.close_connection()
@@ -0,0 +1,104 @@
+"""
+命令流水线的区间追踪, 导出 Chrome trace JSON (chrome://tracing 或 https://ui.perfetto.dev 打开)
+
+默认关闭, 关闭时 span() 直接返回一个共享的空上下文, begin() 返回 None, 开销只有一次属性判断
+用法:
+    from hand_trace import TRACER
+    TRACER.enable()
+    ... 运行遥操作 ...
+    TRACER.export_chrome('teleop_trace.json')
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.end(self.name, self.start, self.cat, self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self, max_events=1000000):
+        self.enabled = False
+        self._events = deque(maxlen=max_events)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self._events.clear()
+
+    def span(self, name, cat='dhand', **args):
+        """with TRACER.span('encode'): ..."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, cat, args or None)
+
+    def begin(self):
+        """无法用 with 包裹的区间: t0 = TRACER.begin(); ...; TRACER.end('validate', t0)"""
+        if not self.enabled:
+            return None
+        return time.perf_counter_ns()
+
+    def end(self, name, start, cat='dhand', args=None):
+        if start is None:
+            return
+        now = time.perf_counter_ns()
+        # deque.append 是原子操作, 多线程记录无需加锁
+        self._events.append((name, cat, start, now - start, threading.get_ident(), args))
+
+    def export_chrome(self, path):
+        """写出 Chrome trace event 格式 (完整事件 ph='X', 时间单位微秒)"""
+        pid = os.getpid()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        events = []
+        tids = set()
+        for name, cat, start, duration, tid, args in list(self._events):
+            event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start / 1000.0, 'dur': duration / 1000.0,
+                     'pid': pid, 'tid': tid}
+            if args:
+                event['args'] = args
+            events.append(event)
+            tids.add(tid)
+        for tid in tids:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': thread_names.get(tid, str(tid))}})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+TRACER = Tracer()
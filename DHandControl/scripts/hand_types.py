@@ -0,0 +1,249 @@
+"""
+紧凑的命令/状态类型 (DH5 / DH6)
+  - 构造时校验一次, 之后直接编码为总线帧; 控制循环中复用同一个对象, 不产生 dict/list
+  - DH5HandCommand: 24个目标寄存器 (array('H')), 缓存 FC16 帧, 修改位置后才重新编码
+  - DH5HandState: 24个反馈寄存器的原始字节, 通过 numpy 视图读取, 应答帧直接拷贝进来
+  - DH6HandCommand: 组合控制 (命令4) 的寄存器 20..46, 可直接传给 DexHandControl.execute_command
+  - DH6PalmFeedback: 固件后台轮询的手掌舵机反馈 (位置/温度/电压), decode_palm_feedback 从一次读取的寄存器解码
+
+用法:
+    command = DH5HandCommand.for_api(api, [500] * 6)
+    state = DH5HandState()
+    while running:
+        command.set_positions(targets)
+        api.send_command(command)
+        api.read_state(state)
+        print(state.position)
+"""
+
+import sys
+import struct
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+from dh5_control import DH5ModbusAPI
+
+
+DH5_TARGET_START = 0x0101
+DH5_TARGET_COUNT = 24
+DH5_FEEDBACK_START = 0x0201
+DH5_FEEDBACK_COUNT = 24
+
+DH6_HAND_FINGER_COUNT = 20
+DH6_HAND_PALM_COUNT = 31
+DH6_MAX_GROUP = 5
+# 手掌反馈区: 数量, ID*5, 轮数, 之后每个舵机5个寄存器 (位置, 温度, 电压, 数据年龄, 连续失败次数)
+DH6_PALM_FB_STRIDE = 5
+DH6_PALM_FB_COUNT = 7 + DH6_MAX_GROUP * DH6_PALM_FB_STRIDE
+DH6_PALM_FB_NO_DATA = 0xFFFF
+
+_DEFAULT_GAINS = (100, 100, 100, 100, 100, 100)
+
+
+def _u16_array(values, name, count=6):
+    values = array('H', [0] * count) if values is None else values
+    if len(values) != count:
+        raise ValueError(f"{name} 需要 {count} 个值, 实际 {len(values)} 个")
+    try:
+        return array('H', values)
+    except (OverflowError, TypeError) as e:
+        raise ValueError(f"{name} 超出范围 (0-65535): {list(values)}") from e
+
+
+class DH5HandCommand:
+    """DH5 set_all 的24个目标寄存器: 位置(误差补偿/限位后) + 力 + 速度 + 加速度"""
+
+    __slots__ = ('registers', 'offsets', 'limits', '_frame', '_frame_id')
+
+    def __init__(self, positions, force=_DEFAULT_GAINS, speed=_DEFAULT_GAINS, acc=_DEFAULT_GAINS,
+                 offsets=None, limits=None):
+        """
+        :param positions: 6个目标位置
+        :param offsets: 位置误差补偿 (左手), None 表示不补偿
+        :param limits: [[min, max]] * 6 位置限位, None 表示不限位
+        """
+        self.offsets = None if offsets is None else tuple(offsets)
+        self.limits = None if limits is None else tuple((int(lo), int(hi)) for lo, hi in limits)
+        self.registers = array('H', [0] * DH5_TARGET_COUNT)
+        self.registers[6:12] = _u16_array(force, 'force')
+        self.registers[12:18] = _u16_array(speed, 'speed')
+        self.registers[18:24] = _u16_array(acc, 'acc')
+        self._frame = None
+        self._frame_id = None
+        self.set_positions(positions)
+
+    @classmethod
+    def for_api(cls, api, positions, force=_DEFAULT_GAINS, speed=_DEFAULT_GAINS, acc=_DEFAULT_GAINS):
+        """按 api 的左右手配置 (DH5ModbusAPI.position_calibration) 构造"""
+        offsets, limits = api.position_calibration()
+        return cls(positions, force, speed, acc, offsets, limits)
+
+    def set_positions(self, positions):
+        """原地更新6个目标位置, 与 set_all 相同的补偿和限位"""
+        if len(positions) != 6:
+            raise ValueError(f"positions 需要 6 个值, 实际 {len(positions)} 个")
+        registers = self.registers
+        offsets = self.offsets
+        limits = self.limits
+        for i in range(6):
+            value = int(positions[i])
+            if offsets is not None:
+                value += offsets[i]
+            if limits is not None:
+                lo, hi = limits[i]
+                value = lo if value < lo else hi if value > hi else value
+            if not 0 <= value <= 0xFFFF:
+                raise ValueError(f"位置 {value} 超出范围 (0-65535)")
+            registers[i] = value
+        self._frame = None
+
+    @property
+    def positions(self):
+        return self.registers[0:6]
+
+    def frame(self, modbus_id=1):
+        """:return: 写 0x0101..0x0118 的 FC16 请求帧 (带CRC), 寄存器不变时返回缓存"""
+        if self._frame is not None and self._frame_id == modbus_id:
+            return self._frame
+        payload = array('H', self.registers)
+        if sys.byteorder == 'little':
+            payload.byteswap()
+        body = struct.pack('>BBHHB', modbus_id, 0x10, DH5_TARGET_START, DH5_TARGET_COUNT,
+                           DH5_TARGET_COUNT * 2) + payload.tobytes()
+        self._frame = body + struct.pack('<H', DH5ModbusAPI._calculate_crc(body))
+        self._frame_id = modbus_id
+        return self._frame
+
+
+class DH5HandState:
+    """DH5 反馈寄存器 0x0201..0x0218 (状态/位置/速度/电流), 字段为原始缓冲区上的只读视图"""
+
+    __slots__ = ('raw', 'state', 'position', 'speed', 'current', '_view')
+
+    def __init__(self):
+        self.raw = bytearray(DH5_FEEDBACK_COUNT * 2)
+        # 大端寄存器字节上的视图, 更新时只拷贝字节, 不重新分配
+        unsigned = np.frombuffer(self.raw, dtype='>u2')
+        signed = np.frombuffer(self.raw, dtype='>i2')
+        self.state = unsigned[0:6]
+        self.position = signed[6:12]
+        self.speed = signed[12:18]
+        self.current = signed[18:24]
+        self._view = memoryview(self.raw)
+        for view in (self.state, self.position, self.speed, self.current):
+            view.flags.writeable = False
+
+    def update_from_response(self, response):
+        """
+        从 FC03 应答帧 (id, 0x03, 字节数, 数据..., CRC) 拷贝数据; 调用前应已校验CRC
+        """
+        if len(response) != DH5_FEEDBACK_COUNT * 2 + 5 or response[2] != DH5_FEEDBACK_COUNT * 2:
+            raise ValueError(f"应答长度 {len(response)} 与 {DH5_FEEDBACK_COUNT} 个寄存器不符")
+        self._view[:] = response[3:-2]
+
+    def update(self, values):
+        """从24个寄存器值 (例如 get_all_feedback 的结果) 更新"""
+        struct.pack_into('>24H', self.raw, 0, *(v & 0xFFFF for v in values))
+
+    def as_list(self):
+        return self.state.tolist() + self.position.tolist() + self.speed.tolist() + self.current.tolist()
+
+
+class DH6HandCommand:
+    """DH6 组合控制 (命令4) 的参数寄存器 20..46, 校验与 DexHandControl.move_hand 相同"""
+
+    __slots__ = ('finger_count', 'palm_count', 'registers')
+
+    def __init__(self, finger_ids=(), finger_positions=(), palm_ids=(), palm_positions=(), palm_times=()):
+        """:raise ValueError: 参数不合法, 信息与 move_hand 打印的一致"""
+        if len(finger_ids) != len(finger_positions):
+            raise ValueError("错误: 手指ID列表和位置列表长度不一致")
+        if len(palm_ids) != len(palm_positions) or len(palm_ids) != len(palm_times):
+            raise ValueError("错误: 手掌ID列表、位置列表和时间列表长度不一致")
+        finger_count = len(finger_ids)
+        palm_count = len(palm_ids)
+        if finger_count == 0 and palm_count == 0:
+            raise ValueError("错误: 组合控制至少需要一个手指或手掌设备")
+        if finger_count > DH6_MAX_GROUP:
+            raise ValueError("错误: 手指组控数量不能超过5")
+        if palm_count > DH6_MAX_GROUP:
+            raise ValueError("错误: 手掌组控数量不能超过5")
+        for id_val in list(finger_ids) + list(palm_ids):
+            if not isinstance(id_val, int) or id_val < 0 or id_val > 255:
+                raise ValueError(f"错误: 设备ID {id_val} 超出范围 (0-255)")
+        for pos in finger_positions:
+            if not isinstance(pos, int) or pos < 0 or pos > 2000:
+                raise ValueError(f"错误: 手指位置值 {pos} 超出范围 (0-2000)")
+        for pos in palm_positions:
+            if not isinstance(pos, int) or pos < 0 or pos > 1000:
+                raise ValueError(f"错误: 手掌位置值 {pos} 超出范围 (0-1000)")
+        for time_val in palm_times:
+            if not isinstance(time_val, int) or time_val < 0 or time_val > 65535:
+                raise ValueError(f"错误: 手掌运动时间 {time_val} 超出范围 (0-65535)")
+
+        self.finger_count = finger_count
+        self.palm_count = palm_count
+        # 下标0对应寄存器20
+        registers = array('H', [0] * (1 + DH6_MAX_GROUP * 2 + 1 + DH6_MAX_GROUP * 3))
+        registers[0] = finger_count
+        for i in range(finger_count):
+            registers[1 + i * 2] = finger_ids[i]
+            registers[2 + i * 2] = finger_positions[i]
+        registers[DH6_HAND_PALM_COUNT - DH6_HAND_FINGER_COUNT] = palm_count
+        for i in range(palm_count):
+            base = DH6_HAND_PALM_COUNT - DH6_HAND_FINGER_COUNT + 1 + i * 3
+            registers[base] = palm_ids[i]
+            registers[base + 1] = palm_positions[i]
+            registers[base + 2] = palm_times[i]
+        self.registers = registers
+
+    @classmethod
+    def from_normalized(cls, hand, finger_ids=(), finger_positions=(), palm_ids=(), palm_positions=(),
+                        palm_times=()):
+        """归一化值 (0.0-1.0) 经 hand.map_finger_positions / map_palm_positions 映射后构造"""
+        mapped_fingers = hand.map_finger_positions(dict(zip(finger_ids, finger_positions))) if finger_ids else {}
+        mapped_palms = hand.map_palm_positions(dict(zip(palm_ids, palm_positions))) if palm_ids else {}
+        return cls(finger_ids, [mapped_fingers[i] for i in finger_ids],
+                   palm_ids, [mapped_palms[i] for i in palm_ids], palm_times)
+
+    def __len__(self):
+        return 2 + self.finger_count * 2 + self.palm_count * 3
+
+    def items(self):
+        """(寄存器地址, 值), 顺序与 move_hand 写入的顺序一致"""
+        registers = self.registers
+        yield DH6_HAND_FINGER_COUNT, registers[0]
+        yield DH6_HAND_PALM_COUNT, registers[DH6_HAND_PALM_COUNT - DH6_HAND_FINGER_COUNT]
+        for i in range(1, 1 + self.finger_count * 2):
+            yield DH6_HAND_FINGER_COUNT + i, registers[i]
+        palm_base = DH6_HAND_PALM_COUNT - DH6_HAND_FINGER_COUNT + 1
+        for i in range(palm_base, palm_base + self.palm_count * 3):
+            yield DH6_HAND_FINGER_COUNT + i, registers[i]
+
+
+# position: 舵机位置 (有符号); temperature: ℃; voltage: mV; age: 数据年龄 (ms); errors: 连续读取失败次数
+# 尚未读到的值为 None
+DH6PalmFeedback = namedtuple('DH6PalmFeedback', ['id', 'position', 'temperature', 'voltage', 'age', 'errors'])
+
+
+def decode_palm_feedback(registers):
+    """
+    :param registers: 从手掌反馈区起始地址读取的 DH6_PALM_FB_COUNT 个寄存器
+    :return: (轮数, {舵机ID: DH6PalmFeedback}), 只包含固件正在轮询的舵机
+    """
+    if len(registers) != DH6_PALM_FB_COUNT:
+        raise ValueError(f"手掌反馈需要 {DH6_PALM_FB_COUNT} 个寄存器, 实际 {len(registers)} 个")
+    count = min(registers[0], DH6_MAX_GROUP)
+    feedback = {}
+    for i in range(count):
+        base = 7 + i * DH6_PALM_FB_STRIDE
+        position, temperature, voltage, age, errors = registers[base:base + DH6_PALM_FB_STRIDE]
+        if age == DH6_PALM_FB_NO_DATA:
+            position = age = None
+        elif position >= 0x8000:
+            position -= 0x10000
+        feedback[registers[1 + i]] = DH6PalmFeedback(registers[1 + i], position, temperature or None,
+                                                     voltage or None, age, errors)
+    return registers[6], feedback
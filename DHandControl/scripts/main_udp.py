@@ -1,6 +1,29 @@
 import json
+import errno
+import random
 import socket
 import time
+from contextlib import contextmanager
+
+from hand_policy import HandError, HandConnectionError
+from clock_sync import ClockSync
+
+
+# 绝对位置命令, 重复发送结果相同, 可以重试
+IDEMPOTENT_CMDS = ('ServoMove', 'MovePalms', 'MoveFingers')
+# 发送缓冲区暂时已满等可恢复的发送错误
+_TRANSIENT_ERRNOS = (errno.EAGAIN, errno.ENOBUFS, errno.EINTR)
+
+# 手势宏 (固件 UDP.h): 宏ID 1..MACRO_MAX, 每个最多 MACRO_MAX_STEPS 个关键帧, 每帧最多5个手指和5个舵机
+MACRO_MAX = 16
+MACRO_MAX_STEPS = 32
+MACRO_MAX_DEVICES = 5
+MACRO_PLAY_BYTE = b'M'
+
+
+class HandSendError(HandError):
+    """UDP发送暂时失败"""
+    retryable = True
 
 
 class DexHandControl:
@@ -19,13 +42,49 @@ class DexHandControl:
         self.hand_ip = hand_ip
         self.pc_ip = pc_ip
         self.udp_port = udp_port
+        self.metrics = None  # 可选 hand_metrics.TransportMetrics
+        self.policy = None  # 可选 hand_policy.RetryPolicy, 位置命令在发送暂时失败时重试
+        self.clock_sync = ClockSync()  # 与控制器 micros() 的时钟同步, 见 sync_clock()
+        self._clock_sock = None
+        self._execute_at = None
+        self._seq = 0
+        self._pending_executions = 0
 
     def _send_udp_message(self, message_dict):
         """内部方法：发送JSON格式的UDP消息到手部控制器"""
+        if self._execute_at is not None:
+            self._send_scheduled(message_dict)
+            return
+        self._send_raw(json.dumps(message_dict).encode(), message_dict.get('Cmd', 'unknown'))
+
+    def _send_raw(self, json_message, cmd):
+        """发送一个数据报 (JSON 或手势宏的二进制命令)"""
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        json_message = json.dumps(message_dict)
-        sock.sendto(json_message.encode(), (self.hand_ip, self.udp_port))
-        sock.close()
+        try:
+            if self.policy is None:
+                self._sendto(sock, json_message, cmd)
+            else:
+                self.policy.run(lambda timeout: self._send_attempt(sock, json_message, cmd, timeout), cmd,
+                                cmd in IDEMPOTENT_CMDS, metrics=self.metrics)
+        finally:
+            sock.close()
+
+    def _sendto(self, sock, json_message, cmd):
+        start = time.perf_counter()
+        sock.sendto(json_message, (self.hand_ip, self.udp_port))
+        if self.metrics is not None:
+            self.metrics.observe(cmd, time.perf_counter() - start, len(json_message))
+
+    def _send_attempt(self, sock, json_message, cmd, timeout):
+        sock.settimeout(timeout)
+        try:
+            self._sendto(sock, json_message, cmd)
+        except socket.timeout as e:
+            raise HandSendError(f"{cmd}: 发送超时") from e
+        except OSError as e:
+            if e.errno in _TRANSIENT_ERRNOS:
+                raise HandSendError(f"{cmd}: {e}") from e
+            raise HandConnectionError(f"{cmd}: {e}") from e
 
     def servo_move(self, servo_id, position, time_in_ms):
         """
@@ -82,71 +141,229 @@ class DexHandControl:
         }
         self._send_udp_message(cmd)
 
+    # -------------------- 时钟同步与定时执行 --------------------
+    def _clock_socket(self):
+        """同步和定时命令使用同一个长期套接字, 控制器的应答发回这里"""
+        if self._clock_sock is None:
+            self._clock_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        return self._clock_sock
+
+    def _next_seq(self):
+        self._seq = (self._seq + 1) & 0xFFFF
+        return self._seq
+
+    def _handle_reply(self, reply):
+        if reply.get('Cmd') == "Executed":
+            self._pending_executions = max(0, self._pending_executions - 1)
+            self.clock_sync.record_execution(reply['At'], reply['Actual'])
+
+    def _receive_reply(self, sock):
+        """:return: 应答dict, 超时返回 None"""
+        try:
+            reply = json.loads(sock.recv(256))
+        except socket.timeout:
+            return None
+        except ValueError:
+            return {}
+        return reply if isinstance(reply, dict) else {}
+
+    def sync_clock(self, samples=8, timeout=0.2):
+        """
+        NTP方式与控制器同步时钟, 可定期调用以跟踪漂移
+        :param samples: 本次采样次数
+        :param timeout: 每次等待应答的时间(秒)
+        :return: clock_sync.ClockEstimate (偏差/漂移/延迟)
+        """
+        sock = self._clock_socket()
+        sock.settimeout(timeout)
+        for _ in range(samples):
+            seq = self._next_seq()
+            message = json.dumps({'Cmd': "Sync", 'Seq': seq}).encode()
+            t_send = self.clock_sync.clock()
+            sock.sendto(message, (self.hand_ip, self.udp_port))
+            while True:
+                reply = self._receive_reply(sock)
+                if reply is None:
+                    break
+                if reply.get('Cmd') == "SyncReply" and reply.get('Seq') == seq:
+                    self.clock_sync.add_sample(t_send, reply['Rx'], self.clock_sync.clock(), reply['Tx'])
+                    break
+                self._handle_reply(reply)
+        if not self.clock_sync.synchronized:
+            print("时钟同步失败: 控制器无应答")
+        return self.clock_sync.estimate()
+
+    @contextmanager
+    def execute_at(self, host_time):
+        """
+        with 块内发出的命令由控制器在 host_time (上位机 time.monotonic()) 对应的控制器时刻执行
+            hand.sync_clock()
+            with hand.execute_at(time.monotonic() + 0.05):
+                hand.move_fingers([1, 2], [2000, 2000])
+        """
+        if not self.clock_sync.synchronized:
+            raise RuntimeError("时钟尚未同步, 请先调用 sync_clock()")
+        self._execute_at = host_time
+        try:
+            yield self
+        finally:
+            self._execute_at = None
+
+    def _send_scheduled(self, message_dict):
+        message = {'Cmd': "At", 'At': self.clock_sync.to_device(self._execute_at), 'Seq': self._next_seq(),
+                   'Do': message_dict}
+        self._clock_socket().sendto(json.dumps(message).encode(), (self.hand_ip, self.udp_port))
+        self._pending_executions += 1
+
+    def collect_executions(self, timeout=0.0):
+        """
+        读取控制器的执行应答并统计执行时间误差
+        :param timeout: 最多等待多久 (秒), 所有定时命令都已应答时立即返回
+        """
+        sock = self._clock_socket()
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            sock.settimeout(max(remaining, 0.0) if self._pending_executions else 0.0)
+            try:
+                reply = self._receive_reply(sock)
+            except BlockingIOError:
+                return
+            if reply is None:
+                return
+            self._handle_reply(reply)
+
+    def clock_report(self, timeout=0.0):
+        """:return: 偏差/漂移(ppm)/最小延迟/执行时间误差, 见 ClockSync.report"""
+        self.collect_executions(timeout)
+        return self.clock_sync.report()
+
+    def _sleep(self, seconds):
+        """手势中关键帧之间的等待, gesture_macros 编译宏时记录为关键帧时间"""
+        time.sleep(seconds)
+
+    def upload_macro(self, macro_id, steps, timeout=0.5, retries=3):
+        """
+        上传手势宏, 控制器保存在NVS中, 之后 play_macro(macro_id) 即可播放
+        :param macro_id: 宏ID (1-16)
+        :param steps: 关键帧列表 [{'T': ms, 'F_ID': [..], 'F_pos': [..], 'P_ID': [..], 'P_pos': [..], 'P_time': [..]}],
+                      T 相对宏开始且不递减, 手指/舵机字段可省略 (见 gesture_macros.compile_gesture)
+        :param timeout: 等待控制器应答的时间(秒), 超时后重新上传整个宏
+                        (每帧带上传序号和帧数, 控制器不依赖数据报的到达顺序)
+        :return: 控制器是否确认保存
+        """
+        if not 1 <= macro_id <= MACRO_MAX:
+            raise ValueError(f"宏ID {macro_id} 超出范围 (1-{MACRO_MAX})")
+        if not 1 <= len(steps) <= MACRO_MAX_STEPS:
+            raise ValueError(f"关键帧数 {len(steps)} 超出范围 (1-{MACRO_MAX_STEPS})")
+        last_time = 0
+        for step in steps:
+            if step['T'] < last_time or step['T'] > 65535:
+                raise ValueError(f"关键帧时间 {step['T']} 必须不递减且不超过65535")
+            last_time = step['T']
+            if len(step.get('F_ID', ())) > MACRO_MAX_DEVICES or len(step.get('P_ID', ())) > MACRO_MAX_DEVICES:
+                raise ValueError(f"每个关键帧最多 {MACRO_MAX_DEVICES} 个手指和 {MACRO_MAX_DEVICES} 个舵机")
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.settimeout(timeout)
+        address = (self.hand_ip, self.udp_port)
+        try:
+            for _ in range(retries):
+                seq = random.randrange(1, 0x10000)
+                for index, step in enumerate(steps):
+                    message = {'Cmd': "MacroStep", 'MacroID': macro_id, 'Seq': seq, 'Count': len(steps),
+                               'Index': index}
+                    message.update(step)
+                    sock.sendto(json.dumps(message, separators=(',', ':')).encode(), address)
+                deadline = time.monotonic() + timeout
+                while time.monotonic() < deadline:
+                    try:
+                        reply = json.loads(sock.recv(256))
+                    except socket.timeout:
+                        break
+                    except ValueError:
+                        continue
+                    if (reply.get('Cmd') == "MacroSaved" and reply.get('MacroID') == macro_id
+                            and reply.get('Seq') == seq):
+                        return True
+            print(f"手势宏 {macro_id} 上传失败: 控制器无应答")
+            return False
+        finally:
+            sock.close()
+
+    def play_macro(self, macro_id):
+        """播放已上传的手势宏, 只发送两个字节"""
+        self._send_raw(MACRO_PLAY_BYTE + bytes([macro_id]), 'PlayMacro')
+
+    def stop_macro(self):
+        """停止正在播放的手势宏 (已发出的关键帧不撤回)"""
+        self._send_raw(MACRO_PLAY_BYTE + b'\x00', 'PlayMacro')
+
     def boxing(self):
         """拳头手势（握拳）"""
         self.move_fingers([2, 3, 4, 5], [2000, 2000, 2000, 2000])
-        time.sleep(0.4)
+        self._sleep(0.4)
         self.move_fingers([1], [690])
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.free()
 
     def index2thumb(self):
         """食指碰拇指（OK手势）"""
         self.move_fingers([1, 2], [600, 1330])
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.free()
 
     def middle2thumb(self):
         """中指碰拇指"""
         self.move_fingers([1, 3], [1130, 1700])
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.free()
 
     def ring2thumb(self):
         """无名指碰拇指"""
         self.move_palms([2, 1], [380, 530], [1000, 1000])
         self.move_fingers([1, 4], [820, 1360])
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.free_no_delay()
 
     def dex_boxing(self):
         """特殊拳击手势"""
         self.move_palms([1, 2], [1000, 131], [1000, 1000])
         self.move_fingers([2, 3, 5], [2000, 2000, 2000])
-        time.sleep(0.8)
+        self._sleep(0.8)
         self.move_fingers([1, 4], [210, 1060])
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.free_no_delay()
 
     def ye(self):
         """"耶"手势（伸出食指和中指）"""
         self.move_fingers([1, 4, 5], [1550, 2000, 2000])
         self.move_palms([3], [426], [1000])
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.free_no_delay()
 
     def rock(self):
         """摇滚手势（伸出食指和小指）"""
         self.move_fingers([1, 3, 4], [1050, 2000, 2000])
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.free_no_delay()
 
     def one(self):
         """伸出食指（表示数字1）"""
         self.move_fingers([1, 3, 4, 5], [1000, 2000, 2000, 2000])
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.free()
 
     def back(self):
         """手掌向后弯曲"""
         self.move_palms([2], [649], [1000])
-        time.sleep(1)
+        self._sleep(1)
         self.free()
 
     def finger_free(self):
         """手指舒展（张开所有手指）"""
         self.move_fingers([1, 2, 3, 4, 5], [0, 0, 0, 0, 0])
-        time.sleep(1)
+        self._sleep(1)
 
     def hand_free(self):
         """手掌回中立位"""
@@ -167,30 +384,30 @@ class DexHandControl:
     def demo(self):
         """执行预定义的完整演示序列"""
         self.boxing()
-        time.sleep(1)
+        self._sleep(1)
         self.one()
-        time.sleep(1)
+        self._sleep(1)
         self.ye()
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.rock()
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.index2thumb()
-        time.sleep(1)
+        self._sleep(1)
         self.middle2thumb()
-        time.sleep(1)
+        self._sleep(1)
         self.ring2thumb()
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.back()
-        time.sleep(1.5)
+        self._sleep(1.5)
         self.dex_boxing()
 
     def start(self):
         """初始复位并开始演示"""
         self.free()
-        time.sleep(2)
+        self._sleep(2)
         for _ in range(200):
             self.demo()
-            time.sleep(2.5)  # 演示循环间增加短暂停顿
+            self._sleep(2.5)  # 演示循环间增加短暂停顿
 
 
 # 使用示例
@@ -0,0 +1,426 @@
+"""
+Modbus TCP -> RTU 网关: 本机持有 USB-RS485 串口, 其他机器通过 Modbus TCP 单元号访问各只手
+  - 每个单元号映射到 (串口总线, RTU从站地址), 多个单元可以共用一条总线
+  - 客户端可以连续发送多个请求而不等待应答 (按事务号匹配), 网关在总线上背靠背执行
+  - 每条总线一个工作线程, 每个客户端在每条总线上有独立的队列, 工作线程在这些队列之间轮转,
+    一个客户端的大量请求不会饿死其他客户端
+  - 多个客户端同时读取同一区间 (FC03) 时合并成一次总线事务
+  - 指标 (hand_metrics): 总线事务耗时, 以及网关额外引入的排队时间和处理开销
+
+用法:
+    python3 modbus_gateway.py --unit 1=/dev/ttyUSB0:1 --unit 2=/dev/ttyUSB1:1 --metrics-port 9105
+    python3 modbus_gateway.py --unit 1=/dev/ttyUSB0:1 --parity E   # DH6 总线为 8E1
+
+    # 远程主机
+    from pymodbus.client import ModbusTcpClient
+    client = ModbusTcpClient('gateway-host', port=1502)
+    client.read_holding_registers(0x0207, count=6, device_id=1)
+
+仅转发 FC03 / FC06 / FC16 (DH5 与 DH6 固件使用的功能码)
+"""
+
+import time
+import socket
+import struct
+import threading
+from collections import deque
+
+from dh5_control import DH5ModbusAPI
+from hand_metrics import REGISTRY
+
+
+SUPPORTED_FUNCTIONS = (0x03, 0x06, 0x10)
+
+# Modbus 异常码
+EXC_ILLEGAL_FUNCTION = 0x01
+EXC_DEVICE_BUSY = 0x06
+EXC_GATEWAY_PATH_UNAVAILABLE = 0x0A
+EXC_GATEWAY_TARGET_FAILED = 0x0B
+
+MBAP_HEADER = struct.Struct('>HHHB')
+
+
+def _exception_pdu(function_code, code):
+    return bytes([(function_code | 0x80) & 0xFF, code])
+
+
+class _Client:
+    """一个TCP连接, 应答可能由多个总线线程写回, 写入需加锁"""
+
+    __slots__ = ('sock', 'name', 'send_lock', 'closed')
+
+    def __init__(self, sock, name):
+        self.sock = sock
+        self.name = name
+        self.send_lock = threading.Lock()
+        self.closed = False
+
+    def send(self, transaction_id, unit_id, pdu):
+        frame = MBAP_HEADER.pack(transaction_id, 0, len(pdu) + 1, unit_id) + pdu
+        with self.send_lock:
+            if self.closed:
+                return False
+            try:
+                self.sock.sendall(frame)
+                return True
+            except OSError:
+                self.closed = True
+                return False
+
+
+class _Request:
+    __slots__ = ('client', 'transaction_id', 'unit_id', 'slave_id', 'pdu', 'received')
+
+    def __init__(self, client, transaction_id, unit_id, slave_id, pdu, received):
+        self.client = client
+        self.transaction_id = transaction_id
+        self.unit_id = unit_id
+        self.slave_id = slave_id
+        self.pdu = pdu
+        self.received = received
+
+
+class RTUBus:
+    """
+    一条 RS485 总线及其工作线程
+    :param queue_depth: 每个客户端在本总线上最多排队的请求数, 超出时立即返回 EXC_DEVICE_BUSY
+    :param max_queue_age: 请求排队超过该时间(秒)后不再下发 (过期的控制指令比没有更糟), 返回 EXC_GATEWAY_TARGET_FAILED
+    """
+
+    def __init__(self, port, baud_rate=115200, stop_bits=1, parity='N', timeout=0.05, queue_depth=16,
+                 max_queue_age=0.5, api=None):
+        self.port = port
+        self.api = api if api is not None else DH5ModbusAPI(port=port, baud_rate=baud_rate, stop_bits=stop_bits,
+                                                            parity=parity)
+        self.timeout = timeout
+        self.queue_depth = queue_depth
+        self.max_queue_age = max_queue_age
+        self.metrics = REGISTRY.transport('rtu', port)
+        self.gateway_metrics = REGISTRY.transport('gateway', port)
+        self._pending = {}  # 客户端 -> 在本总线上排队的 _Request, 由 self._cond 保护
+        self._ready = deque()  # 有待处理请求的客户端, 轮转顺序
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.stats = {'transactions': 0, 'coalesced': 0, 'busy': 0, 'expired': 0, 'timeouts': 0}
+
+    def open(self):
+        if self.api.serial_connection is None or not self.api.serial_connection.is_open:
+            result = self.api.open_connection()
+            if result != DH5ModbusAPI.SUCCESS:
+                return result
+        return DH5ModbusAPI.SUCCESS
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, name=f"gateway-{self.port}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, request):
+        """:return: 是否已入队; 队列已满时返回 False"""
+        client = request.client
+        with self._cond:
+            pending = self._pending.get(client)
+            if pending is None:
+                pending = self._pending[client] = deque()
+                self._ready.append(client)
+            elif len(pending) >= self.queue_depth:
+                self.stats['busy'] += 1
+                return False
+            pending.append(request)
+            self._cond.notify()
+        return True
+
+    def _pop(self, client):
+        """取出客户端在本总线上的队首请求, 调用时须持有 self._cond"""
+        pending = self._pending[client]
+        request = pending.popleft()
+        if not pending:
+            del self._pending[client]
+        return request
+
+    def _next_request(self):
+        """按客户端轮转取下一个请求, 同时取出其他客户端队首相同的读请求一起应答"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._ready or not self._running)
+            if not self._running:
+                return None, ()
+            client = self._ready.popleft()
+            request = self._pop(client)
+            if client in self._pending:
+                self._ready.append(client)
+            followers = []
+            if request.pdu[0] == 0x03:
+                for other in list(self._ready):
+                    head = self._pending[other][0]
+                    if head.slave_id == request.slave_id and head.pdu == request.pdu:
+                        self._pop(other)
+                        if other not in self._pending:
+                            self._ready.remove(other)
+                        followers.append(head)
+            return request, followers
+
+    def _worker(self):
+        while True:
+            request, followers = self._next_request()
+            if request is None:
+                return
+            dequeued = time.perf_counter()
+            live = [r for r in (request,) + tuple(followers) if not r.client.closed]
+            if not live:
+                continue
+            fresh = [r for r in live if dequeued - r.received <= self.max_queue_age]
+            for r in live:
+                if r not in fresh:
+                    self.stats['expired'] += 1
+                    self._reply(r, _exception_pdu(r.pdu[0], EXC_GATEWAY_TARGET_FAILED), dequeued, 0.0, 'expired')
+            if not fresh:
+                continue
+            self.stats['coalesced'] += len(fresh) - 1
+            start = time.perf_counter()
+            response, outcome = self.transact(fresh[0].slave_id, fresh[0].pdu)
+            bus_time = time.perf_counter() - start
+            if response is None:
+                response = _exception_pdu(fresh[0].pdu[0], EXC_GATEWAY_TARGET_FAILED)
+            for r in fresh:
+                self._reply(r, response, dequeued, bus_time, outcome)
+
+    def _reply(self, request, pdu, dequeued, bus_time, outcome):
+        request.client.send(request.transaction_id, request.unit_id, pdu)
+        now = time.perf_counter()
+        metrics = self.gateway_metrics
+        metrics.observe('queue_wait', dequeued - request.received, outcome=outcome, busy=False)
+        metrics.observe('gateway_added', now - request.received - bus_time, outcome=outcome, busy=False)
+
+    def transact(self, slave_id, pdu):
+        """
+        在总线上执行一个RTU事务
+        :return: (应答PDU 或 None, 结果 'ok'/'timeout'/'crc'/'invalid'/'error')
+        """
+        api = self.api
+        body = bytes([slave_id]) + pdu
+        frame = body + struct.pack('<H', DH5ModbusAPI._calculate_crc(body))
+        start = time.perf_counter()
+        try:
+            with api._bus_lock:
+                if api.pipeline is not None:
+                    api.pipeline.drain()
+                connection = api.serial_connection
+                default_timeout = connection.timeout
+                connection.timeout = self.timeout
+                try:
+                    connection.write(frame)
+                    response = api._read_response()
+                finally:
+                    connection.timeout = default_timeout
+        except Exception as e:
+            print(f"网关: {self.port} 串口错误: {e}")
+            self.metrics.observe(f"fc{pdu[0]:02x}", time.perf_counter() - start, len(frame), 0, 'error')
+            return None, 'error'
+        self.stats['transactions'] += 1
+
+        if len(response) < 5:
+            outcome = 'timeout'
+            self.stats['timeouts'] += 1
+            if response:
+                # 半帧残留会污染下一个事务
+                api.serial_connection.reset_input_buffer()
+        elif (response[-1] << 8 | response[-2]) != DH5ModbusAPI._calculate_crc(response[:-2]):
+            outcome = 'crc'
+        elif response[0] != slave_id or response[1] & 0x7F != pdu[0]:
+            outcome = 'invalid'
+        else:
+            outcome = 'ok'
+        self.metrics.observe(f"fc{pdu[0]:02x}", time.perf_counter() - start, len(frame), len(response), outcome)
+        if outcome != 'ok':
+            return None, outcome
+        return bytes(response[1:-2]), outcome
+
+
+class ModbusTCPGateway:
+    """
+    用法:
+        gateway = ModbusTCPGateway(port=1502)
+        bus = gateway.add_bus('/dev/ttyUSB0')
+        gateway.add_unit(1, bus, slave_id=1)
+        gateway.start()
+    """
+
+    def __init__(self, host='0.0.0.0', port=1502):
+        self.host = host
+        self.port = port
+        self.buses = {}
+        self.units = {}  # 单元号 -> (RTUBus, 从站地址)
+        self._server = None
+        self._thread = None
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def add_bus(self, port, **kwargs):
+        """打开(或复用)串口总线, 参数见 RTUBus"""
+        if port not in self.buses:
+            bus = RTUBus(port, **kwargs)
+            result = bus.open()
+            if result != DH5ModbusAPI.SUCCESS:
+                raise ConnectionError(f"{port}: {result}")
+            self.buses[port] = bus
+            if self._running:
+                bus.start()
+        return self.buses[port]
+
+    def add_unit(self, unit_id, bus, slave_id=1):
+        if not 0 <= unit_id <= 255:
+            raise ValueError(f"单元号 {unit_id} 超出范围 (0-255)")
+        self.units[unit_id] = (bus, slave_id)
+
+    def start(self):
+        """:return: 实际监听的端口 (port=0 时由系统分配)"""
+        self._server = socket.create_server((self.host, self.port))
+        self._server.settimeout(0.2)
+        self.port = self._server.getsockname()[1]
+        self._running = True
+        for bus in self.buses.values():
+            bus.start()
+        self._thread = threading.Thread(target=self._accept_loop, name='gateway-accept', daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            self._close_client(client)
+        for bus in self.buses.values():
+            bus.stop()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def serve_forever(self):
+        self.start()
+        print(f"Modbus TCP 网关监听 {self.host}:{self.port}, 单元: "
+              + ', '.join(f"{u}->{b.port}:{s}" for u, (b, s) in sorted(self.units.items())))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                sock, address = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = _Client(sock, f"{address[0]}:{address[1]}")
+            with self._lock:
+                self._clients.add(client)
+            threading.Thread(target=self._client_loop, args=(client,), name=f"gateway-{client.name}",
+                             daemon=True).start()
+
+    def _close_client(self, client):
+        with client.send_lock:
+            client.closed = True
+        try:
+            client.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client.sock.close()
+        with self._lock:
+            self._clients.discard(client)
+
+    @staticmethod
+    def _recv_exact(sock, size):
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _client_loop(self, client):
+        """读取客户端请求并入队, 不等待应答, 因此同一连接上的请求可以流水线发送"""
+        try:
+            while self._running and not client.closed:
+                header = self._recv_exact(client.sock, MBAP_HEADER.size)
+                if header is None:
+                    break
+                transaction_id, protocol_id, length, unit_id = MBAP_HEADER.unpack(header)
+                if protocol_id != 0 or not 2 <= length <= 254:
+                    print(f"网关: {client.name} 帧头错误, 断开连接")
+                    break
+                pdu = self._recv_exact(client.sock, length - 1)
+                if pdu is None:
+                    break
+                self._dispatch(client, transaction_id, unit_id, pdu, time.perf_counter())
+        except OSError:
+            pass
+        finally:
+            self._close_client(client)
+
+    def _dispatch(self, client, transaction_id, unit_id, pdu, received):
+        function_code = pdu[0]
+        if function_code not in SUPPORTED_FUNCTIONS:
+            client.send(transaction_id, unit_id, _exception_pdu(function_code, EXC_ILLEGAL_FUNCTION))
+            return
+        target = self.units.get(unit_id)
+        if target is None:
+            client.send(transaction_id, unit_id, _exception_pdu(function_code, EXC_GATEWAY_PATH_UNAVAILABLE))
+            return
+        bus, slave_id = target
+        if not bus.submit(_Request(client, transaction_id, unit_id, slave_id, pdu, received)):
+            client.send(transaction_id, unit_id, _exception_pdu(function_code, EXC_DEVICE_BUSY))
+
+
+def _parse_unit(text):
+    """'1=/dev/ttyUSB0:1' -> (1, '/dev/ttyUSB0', 1); 从站地址省略时为1"""
+    unit, target = text.split('=', 1)
+    port, _, slave = target.rpartition(':')
+    if not port or not slave.isdigit():
+        port, slave = target, '1'
+    return int(unit), port, int(slave)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from hand_metrics import serve_http
+
+    parser = argparse.ArgumentParser(description='Modbus TCP gateway for DH5/DH6 RS485 buses')
+    parser.add_argument('--unit', action='append', required=True, help='unit=port[:slave], e.g. 1=/dev/ttyUSB0:1')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=1502)
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--parity', choices=('N', 'E', 'O'), default='N', help='DH6 buses use E (8E1)')
+    parser.add_argument('--timeout', type=float, default=0.05, help='RTU response timeout (s)')
+    parser.add_argument('--queue-depth', type=int, default=16)
+    parser.add_argument('--metrics-port', type=int, default=None)
+    args = parser.parse_args()
+
+    gateway = ModbusTCPGateway(args.host, args.port)
+    for spec in args.unit:
+        unit_id, serial_port, slave_id = _parse_unit(spec)
+        gateway.add_unit(unit_id, gateway.add_bus(serial_port, baud_rate=args.baud, parity=args.parity,
+                                                  timeout=args.timeout, queue_depth=args.queue_depth), slave_id)
+    if args.metrics_port is not None:
+        serve_http(args.metrics_port, host=args.host)
+    gateway.serve_forever()
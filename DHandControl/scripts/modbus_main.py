@@ -1,8 +1,15 @@
 
 from pymodbus import FramerType
 from pymodbus.client import ModbusSerialClient as ModbusClient
+from pymodbus.exceptions import ConnectionException, ModbusIOException
 import time
 import threading
+from contextlib import contextmanager
+
+from hand_trace import TRACER
+from hand_policy import HandConnectionError, HandTimeoutError, HandDeviceError
+from hand_types import DH6HandCommand, DH6_MAX_GROUP, DH6_PALM_FB_COUNT, decode_palm_feedback
+from clock_sync import ClockSync
 
 
 class DexHandControl:
@@ -31,6 +38,13 @@ class DexHandControl:
             timeout=timeout
         )
         self.last_status = 0
+        self.port = port
+        self._hold_open = 0
+        self.metrics = None  # 可选 hand_metrics.TransportMetrics
+        self.policy = None  # 可选 hand_policy.RetryPolicy, 参数写入和状态读取按策略重试, 命令寄存器从不重试
+        self.clock_sync = ClockSync()  # 与设备 micros() 的时钟同步, 见 sync_clock()
+        self._scheduled_at = None
+        self.palm_feedback_rounds = None  # 固件完成的手掌反馈轮询轮数, 见 read_palm_feedback()
 
         # self.palm_limit = {1: (753, 150), 2: (500, 870), 3: (500, 574)}
         self.palm_limit = {1: (753, 150), 2: (500, 870), 3: (500, 574)}
@@ -104,17 +118,76 @@ class DexHandControl:
             return False
 
     def disconnect(self):
-        """断开Modbus连接"""
+        """断开Modbus连接 (session() 内不断开)"""
+        if self._hold_open:
+            return
         self.client.close()
 
+    @contextmanager
+    def session(self):
+        """
+        在 with 块内保持串口打开, 其中的命令不再每次连接/断开
+            with hand.session():
+                hand.read_palm_id(1)
+                hand.read_palm_id(2)
+        """
+        if not self.connect():
+            raise RuntimeError("Modbus连接失败")
+        self._hold_open += 1
+        try:
+            yield self
+        finally:
+            self._hold_open -= 1
+            self.disconnect()
+
+    def _wire_time(self, byte_count):
+        """byte_count 个字节在线上的传输时间(秒), 每字符 起始位+8数据位+校验位+停止位"""
+        params = self.client.comm_params
+        bits = 1 + 8 + (0 if params.parity == 'N' else 1) + params.stopbits
+        return byte_count * bits / params.baudrate
+
+    @contextmanager
+    def _fast_timeout(self, timeout):
+        """临时把应答超时降到 timeout 秒并关闭重试, 不在线的ID不会拖慢扫描"""
+        params = self.client.comm_params
+        old_timeout, old_retries = params.timeout_connect, self.client.transaction.retries
+        params.timeout_connect = timeout
+        self.client.transaction.retries = 0
+        try:
+            yield
+        finally:
+            params.timeout_connect = old_timeout
+            self.client.transaction.retries = old_retries
+
     def _ensure_ok(self, response, operation_name):
-        """验证Modbus响应，失败时抛出带上下文的异常"""
+        """验证Modbus响应，失败时抛出带上下文的异常 (hand_policy 中的类型, 均为 RuntimeError 子类)"""
         if response is None:
-            raise RuntimeError(f"{operation_name} 无响应")
+            raise HandTimeoutError(f"{operation_name} 无响应")
         if response.isError():
-            raise RuntimeError(f"{operation_name} 返回Modbus错误: {response}")
+            raise HandDeviceError(f"{operation_name} 返回Modbus错误: {response}")
         return response
 
+    def _request(self, operation_name, request, idempotent, deadline=None):
+        """
+        执行一次Modbus请求并验证响应
+        设置了 self.policy 时, 每次尝试的超时取剩余预算, 幂等请求在超时/帧错误后重试
+        :param request: 无参函数, 发出请求并返回 pymodbus 响应
+        """
+        if self.policy is None:
+            return self._ensure_ok(request(), operation_name)
+
+        def attempt(timeout):
+            with self._fast_timeout(self.client.comm_params.timeout_connect if timeout is None else timeout):
+                try:
+                    response = request()
+                except ModbusIOException as e:
+                    raise HandTimeoutError(f"{operation_name} 无响应") from e
+                except ConnectionException as e:
+                    raise HandConnectionError(f"{operation_name} 连接错误: {e}") from e
+            return self._ensure_ok(response, operation_name)
+
+        return self.policy.run(attempt, operation_name, idempotent, deadline, self.metrics)
+
     def _write_register_checked(self, address, value, operation_name=None):
         """写单个寄存器并验证响应"""
         operation_name = operation_name or f"写寄存器 {address}"
@@ -137,36 +210,74 @@ class DexHandControl:
         :param params: 参数字典 {寄存器地址: 值}
         :return: 是否成功执行
         """
-        if not self.connect():
-            print("Modbus连接失败")
+        try:
+            self.execute_command(cmd, params)
+            return True
+        except Exception as e:
+            print(f"Modbus通信错误: {e}")
             return False
 
+    def execute_command(self, cmd, params=None, budget=None):
+        """
+        发送Modbus命令, 失败时抛出异常 (hand_policy.HandError 及其子类)
+        参数寄存器写入的是绝对值, 可以重试; 命令寄存器写入会触发动作, 只尝试一次
+        :param budget: 时间预算(秒), 不含等待设备执行的时间; 仅在设置了 self.policy 时生效
+        :return: 状态寄存器的值
+        """
+        start = time.perf_counter()
+        t0 = TRACER.begin()
+        with TRACER.span('connect', 'dh6'):
+            connected = self.connect()
+        if not connected:
+            if self.metrics is not None:
+                self.metrics.observe(f"cmd{cmd}", time.perf_counter() - start, outcome='error')
+            raise HandConnectionError("Modbus连接失败")
+
+        deadline = self.policy.deadline(budget) if self.policy is not None else None
+        writes = 0
         try:
             # 先设置参数，最后设置命令寄存器触发执行
             if params:
-                for addr, value in params.items():
-                    result = self.client.write_register(address=addr, value=value, device_id=1)
-                    self._ensure_ok(result, f"写参数寄存器 {addr}")
+                with TRACER.span('write_params', 'dh6', count=len(params)):
+                    for addr, value in params.items():
+                        self._request(f"写参数寄存器 {addr}",
+                                      lambda: self.client.write_register(address=addr, value=value, device_id=1),
+                                      idempotent=True, deadline=deadline)
+                        writes += 1
 
             # 最后设置命令寄存器触发执行
-            result = self.client.write_register(address=0, value=cmd, device_id=1)
-            self._ensure_ok(result, "写命令寄存器")
+            with TRACER.span('write_command', 'dh6', cmd=cmd):
+                self._request("写命令寄存器",
+                              lambda: self.client.write_register(address=0, value=cmd, device_id=1),
+                              idempotent=False, deadline=deadline)
+            writes += 1
 
             # 等待命令执行完成
-            time.sleep(0.1)
+            with TRACER.span('device_settle', 'dh6'):
+                time.sleep(0.1)
+            if deadline is not None:
+                deadline.extend(0.1)
 
             # 读取状态反馈
-            result = self.client.read_holding_registers(address=5, count=1, device_id=1)
-            result = self._ensure_ok(result, "读取状态寄存器")
+            with TRACER.span('read_status', 'dh6'):
+                result = self._request("读取状态寄存器",
+                                       lambda: self.client.read_holding_registers(address=5, count=1, device_id=1),
+                                       idempotent=True, deadline=deadline)
             if not hasattr(result, "registers") or len(result.registers) < 1:
                 raise RuntimeError("读取状态寄存器响应缺少寄存器数据")
             self.last_status = result.registers[0]
-            return True
-        except Exception as e:
-            print(f"Modbus通信错误: {e}")
-            return False
+            if self.metrics is not None:
+                # 写单寄存器请求/响应各8字节, 读1个寄存器请求8字节/响应7字节
+                self.metrics.observe(f"cmd{cmd}", time.perf_counter() - start, writes * 8 + 8, writes * 8 + 7)
+            return self.last_status
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.observe(f"cmd{cmd}", time.perf_counter() - start, writes * 8, writes * 8,
+                                     outcome='error')
+            raise
         finally:
             self.disconnect()
+            TRACER.end('_send_command', t0, 'dh6')
 
     def move_fingers(self, id_list, pos_list):
         """
@@ -324,70 +435,26 @@ class DexHandControl:
         :param palm_times: 舵机运动时间列表(ms)
         :return: 是否成功执行
         """
-        finger_ids = [] if finger_ids is None else list(finger_ids)
-        finger_positions = [] if finger_positions is None else list(finger_positions)
-        palm_ids = [] if palm_ids is None else list(palm_ids)
-        palm_positions = [] if palm_positions is None else list(palm_positions)
-        palm_times = [] if palm_times is None else list(palm_times)
-
-        if len(finger_ids) != len(finger_positions):
-            print("错误: 手指ID列表和位置列表长度不一致")
-            return False
-
-        if len(palm_ids) != len(palm_positions) or len(palm_ids) != len(palm_times):
-            print("错误: 手掌ID列表、位置列表和时间列表长度不一致")
-            return False
-
-        finger_count = len(finger_ids)
-        palm_count = len(palm_ids)
-
-        if finger_count == 0 and palm_count == 0:
-            print("错误: 组合控制至少需要一个手指或手掌设备")
-            return False
-
-        if finger_count > 5:
-            print("错误: 手指组控数量不能超过5")
-            return False
-
-        if palm_count > 5:
-            print("错误: 手掌组控数量不能超过5")
+        t0 = TRACER.begin()
+        try:
+            command = DH6HandCommand([] if finger_ids is None else list(finger_ids),
+                                     [] if finger_positions is None else list(finger_positions),
+                                     [] if palm_ids is None else list(palm_ids),
+                                     [] if palm_positions is None else list(palm_positions),
+                                     [] if palm_times is None else list(palm_times))
+        except ValueError as e:
+            print(e)
             return False
+        TRACER.end('move_hand_validate', t0, 'dh6')
 
-        for id_val in finger_ids + palm_ids:
-            if not isinstance(id_val, int) or id_val < 0 or id_val > 255:
-                print(f"错误: 设备ID {id_val} 超出范围 (0-255)")
-                return False
+        return self._send_command(4, command)
 
-        for pos in finger_positions:
-            if not isinstance(pos, int) or pos < 0 or pos > 2000:
-                print(f"错误: 手指位置值 {pos} 超出范围 (0-2000)")
-                return False
-
-        for pos in palm_positions:
-            if not isinstance(pos, int) or pos < 0 or pos > 1000:
-                print(f"错误: 手掌位置值 {pos} 超出范围 (0-1000)")
-                return False
-
-        for time_val in palm_times:
-            if not isinstance(time_val, int) or time_val < 0 or time_val > 65535:
-                print(f"错误: 手掌运动时间 {time_val} 超出范围 (0-65535)")
-                return False
-
-        params = {
-            20: finger_count,  # REG_HAND_FINGER_COUNT
-            31: palm_count  # REG_HAND_PALM_COUNT
-        }
-
-        for i, (id_val, pos_val) in enumerate(zip(finger_ids, finger_positions)):
-            params[21 + i * 2] = id_val
-            params[21 + i * 2 + 1] = pos_val
-
-        for i, (id_val, pos_val, time_val) in enumerate(zip(palm_ids, palm_positions, palm_times)):
-            params[32 + i * 3] = id_val
-            params[32 + i * 3 + 1] = pos_val
-            params[32 + i * 3 + 2] = time_val
-
-        return self._send_command(4, params)
+    def send_hand_command(self, command):
+        """
+        发送预先构造并校验过的 hand_types.DH6HandCommand (组合控制)
+        :return: 是否成功执行
+        """
+        return self._send_command(4, command)
     
     def teleop_hand(self, finger_ids=None, finger_positions=None, palm_ids=None, palm_positions=None, palm_times=None):
         """
@@ -399,6 +466,7 @@ class DexHandControl:
         :param palm_times: 舵机运动时间列表(ms)
         :return: 是否成功执行
         """
+        t0 = TRACER.begin()
         if finger_ids is not None and finger_positions is not None:
             if len(finger_ids) != len(finger_positions):
                 print("错误: 手指ID列表和归一化位置列表长度不一致")
@@ -428,6 +496,7 @@ class DexHandControl:
             actual_palm_positions = [mapped_palm_positions[id_val] for id_val in palm_ids]
         else:
             actual_palm_positions = None
+        TRACER.end('normalize', t0, 'dh6')
 
         return self.move_hand(
             finger_ids=finger_ids,
@@ -613,18 +682,310 @@ class DexHandControl:
             print("错误: 设备类型必须为0(电缸)或1(舵机)")
             return []
 
+        return self.discover_device_ids((device_type,), start_id, end_id).get(device_type, [])
+
+    # 固件ID扫描 (命令0x07) 的结果块: 状态, 电缸位图(2), 舵机位图(2)
+    SCAN_RESULT_ADDR = 48
+    SCAN_WINDOW = 32
+    # 固件等待不在线设备的超时, 与 DH6Modbus.ino 中 SCAN_*_TIMEOUT_US 一致
+    SCAN_FINGER_TIMEOUT = 0.0015
+    SCAN_PALM_TIMEOUT = 0.003
+    # 帧间静默 (DH6Modbus.ino MODBUS_FRAME_GAP_US) 加上USB转换器的延迟 (FTDI 默认 latency timer 为16ms)
+    # 只在链路无应答时才会等满, 固件对不在线的ID也会应答, 所以不影响扫描速度
+    TURNAROUND = 0.00175 + 0.02
+
+    def discover_device_ids(self, device_types=(0, 1), start_id=1, end_id=30):
+        """
+        快速扫描设备ID: 整个扫描只打开一次串口
+        固件支持ID扫描命令时, 每32个ID只需一次命令和一次FC03读取, 电缸和舵机在固件内同时扫描;
+        否则退回逐个读ID, 超时降到线上传输的最小值, 不再固定等待100ms
+        :param device_types: 要扫描的设备类型 (0=电缸, 1=舵机)
+        :return: {设备类型: [ID, ...]}
+        """
+        device_types = tuple(sorted(set(device_types)))
+        if not device_types or any(t not in (0, 1) for t in device_types):
+            print("错误: 设备类型必须为0(电缸)或1(舵机)")
+            return {}
+
         if (not isinstance(start_id, int) or not isinstance(end_id, int) or
                 start_id < 1 or end_id > 253 or start_id > end_id):
             print("错误: 扫描范围必须在1..253内，且起始ID不能大于结束ID")
-            return []
+            return {}
 
-        found = []
-        for query_id in range(start_id, end_id + 1):
-            device_id = self.read_device_id(device_type, query_id)
-            if device_id is not None:
-                found.append(device_id)
+        found = {t: [] for t in device_types}
+        try:
+            with self.session():
+                for window_start in range(start_id, end_id + 1, self.SCAN_WINDOW):
+                    count = min(self.SCAN_WINDOW, end_id - window_start + 1)
+                    result = self._scan_window(device_types, window_start, count)
+                    if result is None:
+                        result = self._scan_sequential(device_types, window_start, count)
+                    for t in device_types:
+                        found[t] += result[t]
+        except Exception as e:
+            print(f"Modbus通信错误: {e}")
+        return found
+
+    def _scan_window(self, device_types, start_id, count):
+        """固件扫描命令, 固件不支持时返回 None"""
+        dev_type = 2 if len(device_types) == 2 else device_types[0]
+        per_id = max(self.SCAN_FINGER_TIMEOUT if 0 in device_types else 0,
+                     self.SCAN_PALM_TIMEOUT if 1 in device_types else 0)
+        with self._fast_timeout(self._wire_time(16) + self.TURNAROUND):
+            self._write_register_checked(1, dev_type, "写设备类型")
+            self._write_register_checked(2, start_id, "写起始ID")
+            self._write_register_checked(3, count, "写扫描数量")
+        # 固件扫描完成后才应答命令写入
+        with self._fast_timeout(self._wire_time(16) + self.TURNAROUND + count * per_id * 1.5):
+            self._write_register_checked(0, 0x07, "写ID扫描命令")
+        with self._fast_timeout(self._wire_time(8 + 15) + self.TURNAROUND):
+            result = self.client.read_holding_registers(address=self.SCAN_RESULT_ADDR, count=5, device_id=1)
+            result = self._ensure_ok(result, "读取扫描结果")
+        status, finger_lo, finger_hi, palm_lo, palm_hi = result.registers
+        self.last_status = status
+        if status != 0x93:
+            return None
+        bitmaps = {0: finger_lo | (finger_hi << 16), 1: palm_lo | (palm_hi << 16)}
+        return {t: [start_id + i for i in range(count) if bitmaps[t] >> i & 1] for t in device_types}
+
+    def _scan_sequential(self, device_types, start_id, count):
+        """逐个读ID: 写ID、写命令, 一次读取状态和结果寄存器 (5..8)"""
+        per_id = {0: self.SCAN_FINGER_TIMEOUT, 1: self.SCAN_PALM_TIMEOUT}
+        found = {t: [] for t in device_types}
+        for t in device_types:
+            with self._fast_timeout(self._wire_time(16) + self.TURNAROUND):
+                self._write_register_checked(1, t, "写设备类型")
+            for query_id in range(start_id, start_id + count):
+                with self._fast_timeout(self._wire_time(16) + self.TURNAROUND + per_id[t]):
+                    self._write_register_checked(2, query_id, "写查询ID")
+                    self._write_register_checked(0, 0x05, "写读取ID命令")
+                    result = self.client.read_holding_registers(address=5, count=4, device_id=1)
+                    result = self._ensure_ok(result, "读取ID结果")
+                self.last_status = result.registers[0]
+                if self.last_status == 0x91:
+                    found[t].append(result.registers[3])
+                elif self.last_status == 0xE0:
+                    # 固件不支持读ID命令
+                    return found
         return found
 
+    # 轨迹缓冲区 (命令0x08播放, 0x09停止), 寄存器布局见 DH6Modbus.ino
+    TRAJ_STATUS_ADDR = 56  # 状态, 已执行路点数, 已播放毫秒数
+    TRAJ_HEADER_ADDR = 59  # 手指数, 手掌数, 手指ID*5, 手掌ID*5, 路点数, 之后紧接路点
+    TRAJ_BUFFER_SIZE = 1024
+    TRAJ_MAX_WRITE = 123
+    TRAJ_STATES = {0: 'idle', 1: 'playing', 2: 'done', 3: 'stopped'}
+
+    def upload_trajectory(self, waypoints, finger_ids=(), palm_ids=()):
+        """
+        把整条轨迹写入设备缓冲区, 之后 play_trajectory() 一条命令开始播放, 由设备按自己的时钟执行,
+        不再每个路点一次完整的 写参数/写命令/读状态 往返
+        :param waypoints: [(时间ms, 手指位置列表, 手掌位置列表)], 时间相对播放开始, 不递减
+        :param finger_ids: 手指ID列表, 与每个路点的手指位置一一对应
+        :param palm_ids: 舵机ID列表, 运动时间由设备取到下一个路点的间隔
+        :return: 写入的寄存器数
+        :raise ValueError: 参数不合法; hand_policy.HandError: 通信失败 (例如正在播放时设备返回忙)
+        """
+        finger_ids, palm_ids = list(finger_ids), list(palm_ids)
+        stride = 1 + len(finger_ids) + len(palm_ids)
+        if not waypoints:
+            raise ValueError("错误: 轨迹至少需要一个路点")
+        if len(waypoints) * stride > self.TRAJ_BUFFER_SIZE:
+            raise ValueError(f"错误: 轨迹需要 {len(waypoints) * stride} 个寄存器, 超出缓冲区 {self.TRAJ_BUFFER_SIZE}")
+
+        registers = [len(finger_ids), len(palm_ids)]
+        registers += finger_ids + [0] * (5 - len(finger_ids))
+        registers += palm_ids + [0] * (5 - len(palm_ids))
+        registers.append(len(waypoints))
+        last_time = 0
+        for time_ms, finger_positions, palm_positions in waypoints:
+            # 与组合控制相同的ID/位置校验
+            DH6HandCommand(finger_ids, list(finger_positions), palm_ids, list(palm_positions), [0] * len(palm_ids))
+            if not isinstance(time_ms, int) or time_ms < last_time or time_ms > 65535:
+                raise ValueError(f"错误: 路点时间 {time_ms} 不能递减且不超过65535")
+            last_time = time_ms
+            registers.append(time_ms)
+            registers += finger_positions
+            registers += palm_positions
+
+        start = time.perf_counter()
+        sent = 0
+        with self.session():
+            try:
+                for offset in range(0, len(registers), self.TRAJ_MAX_WRITE):
+                    chunk = registers[offset:offset + self.TRAJ_MAX_WRITE]
+                    address = self.TRAJ_HEADER_ADDR + offset
+                    # 绝对值写入, 可以重试
+                    self._request(f"写轨迹寄存器 {address}",
+                                  lambda: self.client.write_registers(address=address, values=chunk, device_id=1),
+                                  idempotent=True)
+                    sent += 1
+            except Exception:
+                if self.metrics is not None:
+                    self.metrics.observe('traj_upload', time.perf_counter() - start, outcome='error')
+                raise
+        if self.metrics is not None:
+            # FC16 请求 9+2n 字节, 响应 8 字节
+            self.metrics.observe('traj_upload', time.perf_counter() - start, sent * 9 + len(registers) * 2, sent * 8)
+        return len(registers)
+
+    def play_trajectory(self):
+        """
+        从头播放已上传的轨迹
+        :return: 是否成功开始
+        """
+        if not self._send_command(8):
+            return False
+        if self.last_status == 0x94:
+            return True
+        print("轨迹播放失败:", self.decode_status())
+        return False
+
+    def stop_trajectory(self):
+        """停止播放, 设备停在当前路点"""
+        return self._send_command(9) and self.last_status == 0x95
+
+    def trajectory_progress(self):
+        """
+        :return: (状态 'idle'/'playing'/'done'/'stopped', 已执行路点数, 已播放毫秒数), 通信失败返回 None
+        """
+        try:
+            with self.session():
+                result = self._request("读取轨迹状态",
+                                       lambda: self.client.read_holding_registers(address=self.TRAJ_STATUS_ADDR,
+                                                                                  count=3, device_id=1),
+                                       idempotent=True)
+        except Exception as e:
+            print(f"Modbus通信错误: {e}")
+            return None
+        status, index, elapsed = result.registers
+        return self.TRAJ_STATES.get(status, status), index, elapsed
+
+    def wait_trajectory(self, timeout=10.0, poll_interval=0.05):
+        """
+        等待轨迹播放结束
+        :return: 最后一次 trajectory_progress() 的结果, 超时时状态仍为 'playing'
+        """
+        deadline = time.monotonic() + timeout
+        with self.session():
+            while True:
+                progress = self.trajectory_progress()
+                if progress is None or progress[0] != 'playing' or time.monotonic() >= deadline:
+                    return progress
+                time.sleep(poll_interval)
+
+    # 时钟同步与定时执行 (命令0x0A), 寄存器在轨迹缓冲区之后
+    CLOCK_ADDR = TRAJ_HEADER_ADDR + 13 + TRAJ_BUFFER_SIZE  # 设备 micros() 低/高16位, 读取时锁存
+    EXEC_AT_ADDR = CLOCK_ADDR + 2  # 执行时刻低/高16位, 命令, 状态, 实际执行时刻低/高16位
+    EXEC_CMD_ADDR = CLOCK_ADDR + 4
+    EXEC_DONE = 2
+    # 固件 MODBUS_FRAME_GAP_US: 请求帧结束后再等这么久才处理
+    FRAME_GAP = 0.00175
+
+    def sync_clock(self, samples=8):
+        """
+        与设备时钟同步, 可定期调用以跟踪漂移
+        每次采样读一次时钟寄存器; 设备在收到完整请求帧并经过帧间隔后锁存时钟, 锁存时刻由发送时刻推算
+        (pymodbus 收到应答后还要等待约2ms才返回, 用往返中点会有偏差)
+        :return: clock_sync.ClockEstimate (偏差/漂移/延迟), 通信失败时抛出异常
+        """
+        with self.session():
+            for _ in range(samples):
+                t_send = self.clock_sync.clock()
+                result = self._request("读取设备时钟",
+                                       lambda: self.client.read_holding_registers(address=self.CLOCK_ADDR, count=2,
+                                                                                  device_id=1),
+                                       idempotent=True)
+                t_recv = self.clock_sync.clock()
+                low, high = result.registers
+                self.clock_sync.add_point(t_send + self._wire_time(8) + self.FRAME_GAP, low | (high << 16),
+                                          t_recv - t_send)
+        return self.clock_sync.estimate()
+
+    def schedule_command(self, cmd, params, host_time):
+        """
+        让设备在 host_time (上位机 time.monotonic()) 对应的设备时刻执行命令
+        参数寄存器在执行时才读取, 执行前不要再发其他命令; host_time 要留出写参数寄存器的时间
+        :param cmd: 1 单控, 2 组控, 8 播放轨迹, 9 停止轨迹
+        :param params: 参数 {寄存器地址: 值} (或 DH6HandCommand 等有 items() 的对象)
+        :return: 计划执行的设备时刻 (micros()), 失败返回 None
+        """
+        if not self.clock_sync.synchronized:
+            raise RuntimeError("时钟尚未同步, 请先调用 sync_clock()")
+        at = self.clock_sync.to_device(host_time)
+        registers = dict(params.items()) if params else {}
+        registers.update({self.EXEC_AT_ADDR: at & 0xFFFF, self.EXEC_AT_ADDR + 1: at >> 16, self.EXEC_CMD_ADDR: cmd})
+        if not self._send_command(0x0A, registers):
+            return None
+        # 执行时刻很近时, 读状态前命令可能已经执行, 状态寄存器已是该命令的结果
+        if self.last_status == 0xF2:
+            print("定时命令失败:", self.decode_status())
+            return None
+        self._scheduled_at = at
+        return at
+
+    def play_trajectory_at(self, host_time):
+        """在 host_time 开始播放已上传的轨迹, 多只手可以用同一个 host_time 同时开始"""
+        return self.schedule_command(8, None, host_time) is not None
+
+    def execution_result(self):
+        """
+        读取最近一次定时命令的执行结果并计入 clock_report()
+        :return: 实际执行时刻 - 计划时刻 (秒), 尚未执行或没有定时命令时返回 None
+        """
+        if self._scheduled_at is None:
+            return None
+        with self.session():
+            result = self._request("读取定时执行结果",
+                                   lambda: self.client.read_holding_registers(address=self.EXEC_AT_ADDR + 3, count=3,
+                                                                              device_id=1),
+                                   idempotent=True)
+        state, actual_low, actual_high = result.registers
+        if state != self.EXEC_DONE:
+            return None
+        error = self.clock_sync.record_execution(self._scheduled_at, actual_low | (actual_high << 16))
+        self._scheduled_at = None
+        return error
+
+    def clock_report(self):
+        """:return: 偏差/漂移(ppm)/最小延迟/执行时间误差, 见 ClockSync.report"""
+        return self.clock_sync.report()
+
+    # 手掌舵机反馈, 固件在后台轮询, 寄存器在时钟区之后
+    PALM_FB_ADDR = CLOCK_ADDR + 8  # 数量, ID*5, 轮数, 每个舵机5个寄存器
+
+    def read_palm_feedback(self):
+        """
+        一次FC03读取所有手掌舵机的缓存反馈, 不等待舵机串口
+        :return: {舵机ID: hand_types.DH6PalmFeedback (位置, 温度℃, 电压mV, 数据年龄ms, 连续失败次数)},
+                 通信失败时抛出异常
+        """
+        with self.session():
+            result = self._request("读取手掌反馈",
+                                   lambda: self.client.read_holding_registers(address=self.PALM_FB_ADDR,
+                                                                              count=DH6_PALM_FB_COUNT, device_id=1),
+                                   idempotent=True)
+        self.palm_feedback_rounds, feedback = decode_palm_feedback(result.registers)
+        return feedback
+
+    def set_palm_feedback_ids(self, palm_ids):
+        """
+        设置固件轮询的手掌舵机, 改写后这些舵机的旧数据作废
+        :param palm_ids: 舵机ID列表 (最多5个), 空列表停止轮询
+        """
+        palm_ids = list(palm_ids)
+        if len(palm_ids) > DH6_MAX_GROUP:
+            raise ValueError(f"最多轮询 {DH6_MAX_GROUP} 个手掌舵机")
+        for id_val in palm_ids:
+            if not isinstance(id_val, int) or id_val < 0 or id_val > 253:
+                raise ValueError(f"错误: 设备ID {id_val} 超出范围 (0-253)")
+        values = [len(palm_ids)] + palm_ids + [0] * (DH6_MAX_GROUP - len(palm_ids))
+        with self.session():
+            # 绝对值写入, 可以重试
+            self._request("写手掌反馈ID",
+                          lambda: self.client.write_registers(address=self.PALM_FB_ADDR, values=values, device_id=1),
+                          idempotent=True)
+
     def get_status(self):
         """获取最后的状态码"""
         return self.last_status
@@ -642,6 +1003,10 @@ class DexHandControl:
             0x90: "组合手部控制命令已下发",
             0x91: "设备ID读取成功",
             0x92: "设备ID设置成功",
+            0x93: "设备ID扫描完成",
+            0x94: "轨迹开始播放",
+            0x95: "轨迹已停止",
+            0x96: "定时命令已登记",
             0xA0: "电缸控制成功",
             0xB0: "舵机控制成功",
             0xC0: "电缸组控成功",
@@ -662,7 +1027,9 @@ class DexHandControl:
             0xED: "设备ID设置失败",
             0xEE: "固件校验错误: 无效设备ID",
             0xEF: "设备ID操作暂不支持",
-            0xF0: "清除错误成功"
+            0xF0: "清除错误成功",
+            0xF1: "固件校验错误: 轨迹无效",
+            0xF2: "固件校验错误: 定时命令无效"
         }
 
         if status in status_map:
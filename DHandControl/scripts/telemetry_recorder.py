@@ -0,0 +1,159 @@
+"""
+二进制遥测记录器
+  - 定长记录追加写入预分配的内存映射文件, 文件写满后滚动到下一个文件
+  - 每条记录: 单调时间戳, 最近一次命令目标(24个寄存器), 24个反馈寄存器, 故障字, 事务耗时
+  - 读取: load_recording() 把记录文件映射为 NumPy 结构化数组
+  - 控制线程和轮询线程可以同时记录, 追加和 last_* 的更新在同一把锁内
+
+文件布局 (小端):
+  header(64字节): magic(u32) version(u16) record_size(u16) capacity(u32) reserved(u32) count(u64) start_wall_time(f64)
+  records: capacity x RECORD
+"""
+
+import os
+import mmap
+import glob
+import time
+import struct
+import threading
+
+import numpy as np
+
+
+MAGIC = 0x4D4C5444  # 'DTLM'
+VERSION = 1
+HEADER_SIZE = 64
+
+KIND_COMMAND = 1
+KIND_FEEDBACK = 2
+
+_HEADER = struct.Struct('<IHHIIQd')
+_RECORD = struct.Struct('<d24H24hHHf')
+
+RECORD_DTYPE = np.dtype([
+    ('t', '<f8'),               # time.monotonic()
+    ('command', '<u2', (24,)),  # 位置/力/速度/加速度 各6个
+    ('feedback', '<i2', (24,)),  # 状态/位置/速度/电流 各6个
+    ('faults', '<u2'),
+    ('kind', '<u2'),            # KIND_COMMAND / KIND_FEEDBACK
+    ('latency', '<f4'),         # 事务耗时(秒)
+])
+assert RECORD_DTYPE.itemsize == _RECORD.size
+
+
+class TelemetryRecorder:
+    """
+    用法:
+        recorder = TelemetryRecorder('logs/right')
+        api.recorder = recorder      # DH5ModbusAPI 在 set_all / 反馈读取后自动记录
+        ...
+        recorder.close()
+    """
+
+    def __init__(self, path_prefix, capacity=1 << 20):
+        """
+        :param path_prefix: 文件名前缀, 实际文件为 <prefix>_0000.bin, <prefix>_0001.bin ...
+        :param capacity: 每个文件的记录数
+        """
+        self.path_prefix = path_prefix
+        self.capacity = capacity
+        self.file_index = -1
+        self.count = 0
+        self.dropped = 0
+        self.last_command = (0,) * 24
+        self.last_feedback = (0,) * 24
+        self.last_faults = 0
+        self._file = None
+        self._mmap = None
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._roll_over()
+
+    def _roll_over(self):
+        self._close_file()
+        self.file_index += 1
+        self.path = f"{self.path_prefix}_{self.file_index:04d}.bin"
+        size = HEADER_SIZE + self.capacity * _RECORD.size
+        self._file = open(self.path, 'w+b')
+        self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self.count = 0
+        _HEADER.pack_into(self._mmap, 0, MAGIC, VERSION, _RECORD.size, self.capacity, 0, 0, time.time())
+
+    def _close_file(self):
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    def _append(self, kind, latency):
+        """调用时须持有 self._lock"""
+        if self._mmap is None:
+            self.dropped += 1
+            return
+        if self.count >= self.capacity:
+            self._roll_over()
+        _RECORD.pack_into(self._mmap, HEADER_SIZE + self.count * _RECORD.size, time.monotonic(),
+                          *self.last_command, *self.last_feedback, self.last_faults, kind, latency)
+        self.count += 1
+        # 记录数最后更新, 读者只会看到完整写入的记录
+        struct.pack_into('<Q', self._mmap, 16, self.count)
+
+    def record_command(self, command, latency=0.0):
+        """:param command: set_all 下发的24个寄存器值"""
+        command = tuple(command)
+        if len(command) != 24:
+            command = (command + (0,) * 24)[:24]
+        with self._lock:
+            self.last_command = command
+            self._append(KIND_COMMAND, latency)
+
+    def record_feedback(self, feedback, faults=None, latency=0.0):
+        """:param feedback: 24个反馈寄存器 (状态/位置/速度/电流)"""
+        feedback = tuple(v - 0x10000 if v >= 0x8000 else v for v in feedback)
+        with self._lock:
+            self.last_feedback = feedback
+            if faults is not None:
+                self.last_faults = faults
+            self._append(KIND_FEEDBACK, latency)
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+
+def load_recording(path):
+    """
+    读取单个记录文件
+    :return: NumPy 结构化数组 (dtype=RECORD_DTYPE), 只包含已写入的记录, 与文件共享内存
+    """
+    magic, version, record_size, capacity, _, count, _ = _HEADER.unpack(
+        np.fromfile(path, dtype=np.uint8, count=_HEADER.size).tobytes())
+    if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a DH5 telemetry recording")
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(capacity,))
+    return records[:count]
+
+
+def load_recordings(path_prefix):
+    """按顺序读取 <prefix>_*.bin 并拼接"""
+    paths = sorted(glob.glob(f"{path_prefix}_[0-9][0-9][0-9][0-9].bin"))
+    if not paths:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.concatenate([load_recording(path) for path in paths])
+
+
+if __name__ == '__main__':
+    import sys
+
+    data = load_recordings(sys.argv[1])
+    print(f"{len(data)} records")
+    feedback = data[data['kind'] == KIND_FEEDBACK]
+    if len(feedback) > 1:
+        print("poll rate: %.1f Hz" % ((len(feedback) - 1) / (feedback['t'][-1] - feedback['t'][0])))
+        print("latency p50/max: %.2f / %.2f ms" % (np.median(feedback['latency']) * 1000,
+                                                   feedback['latency'].max() * 1000))
@@ -0,0 +1,191 @@
+"""
+轨迹回放
+  - 把记录下来的命令流 (遥测记录或遥操作 JSON 日志) 按原始时间回放到 DH5 或 DH6
+  - 绝对截止时间调度, 误差不累积; 支持加速、循环和 lock-step (等待到位再发下一帧)
+  - 每帧记录实际发送时间误差, 可选同时采集反馈
+"""
+
+import json
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from dh5_control import DH5ModbusAPI, sleep_until
+
+
+# t: 原始时间戳(秒); payload: 目标相关的参数字典
+Frame = namedtuple('Frame', ['t', 'payload'])
+
+# scheduled: 相对回放开始的计划时间; error: 实际发送时间 - 计划时间(秒)
+FrameResult = namedtuple('FrameResult', ['loop', 'index', 'scheduled', 'error', 'result', 'feedback'])
+
+
+class Trajectory:
+    def __init__(self, frames):
+        self.frames = sorted(frames, key=lambda frame: frame.t)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def duration(self):
+        return self.frames[-1].t - self.frames[0].t if self.frames else 0.0
+
+    @classmethod
+    def from_recording(cls, path_prefix):
+        """从 telemetry_recorder 的命令记录构造, payload 为线上的24个寄存器值"""
+        from telemetry_recorder import load_recordings, KIND_COMMAND
+        data = load_recordings(path_prefix)
+        commands = data[data['kind'] == KIND_COMMAND]
+        return cls([Frame(float(row['t']), {'registers': [int(v) for v in row['command']]}) for row in commands])
+
+    @classmethod
+    def from_json(cls, path):
+        """
+        遥操作日志: [{"t": 0.0, "position_list": [...], "speed_list": [...]}, ...] (DH5)
+                 或 [{"t": 0.0, "finger_ids": [...], "finger_positions": [...], ...}, ...] (DH6)
+        """
+        with open(path) as f:
+            entries = json.load(f)
+        return cls([Frame(entry.pop('t'), entry) for entry in entries])
+
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump([dict(frame.payload, t=frame.t) for frame in self.frames], f)
+
+
+class DH5ReplayTarget:
+    FEEDBACK_FIELDS = ['state', 'position', 'current', 'cur_faults']
+
+    def __init__(self, api):
+        self.api = api
+
+    def send(self, payload):
+        if 'registers' in payload:
+            # 记录中保存的是已限位/补偿后的线上数据, 原样发送
+            registers = payload['registers']
+            return self.api.send_modbus_command(function_code=0x10, register_address=0x0101,
+                                                data=registers, data_length=len(registers))
+        return self.api.set_all(**payload)
+
+    def feedback(self):
+        return self.api.read_fields(self.FEEDBACK_FIELDS)
+
+    def wait_settled(self, timeout, poll_interval=0.01):
+        """等待所有轴到达位置或堵转 (state != 0)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            state = self.api.get_all_state()
+            if isinstance(state, list) and all(s != 0 for s in state):
+                return True
+            time.sleep(poll_interval)
+        return False
+
+
+class DH6ReplayTarget:
+    """DH6 无运动反馈寄存器, lock-step 模式退化为按 palm_times 等待"""
+
+    def __init__(self, hand):
+        self.hand = hand
+        self._last_move_time = 0.0
+
+    def send(self, payload):
+        self._last_move_time = max(payload.get('palm_times') or [0]) / 1000.0
+        return self.hand.move_hand(**payload)
+
+    def feedback(self):
+        return self.hand.get_status()
+
+    def wait_settled(self, timeout, poll_interval=0.01):
+        time.sleep(min(timeout, self._last_move_time))
+        return True
+
+
+class ReplayEngine:
+    """
+    用法:
+        engine = ReplayEngine(DH5ReplayTarget(api_r))
+        results = engine.run(Trajectory.from_recording('logs/right'), speed=2.0, loops=3)
+        print(engine.timing_report(results))
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def run(self, trajectory, speed=1.0, loops=1, lock_step=False, capture_feedback=False, settle_timeout=5.0):
+        """
+        :param speed: 回放倍速, 2.0 表示两倍速
+        :param loops: 循环次数, 0 表示一直循环直到 stop()
+        :param lock_step: 每帧发出后等待手到位再继续, 之后的截止时间以该时刻重新对齐
+        :param capture_feedback: 每帧发出后读取一次反馈
+        """
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self._stop = False
+        results = []
+        frames = trajectory.frames
+        if not frames:
+            return results
+        t_first = frames[0].t
+        loop = 0
+        while not self._stop and (loops == 0 or loop < loops):
+            anchor = time.perf_counter()
+            offset = 0.0  # lock-step 等待造成的时间平移
+            for index, frame in enumerate(frames):
+                if self._stop:
+                    break
+                scheduled = (frame.t - t_first) / speed + offset
+                deadline = anchor + scheduled
+                sleep_until(deadline)
+                sent = time.perf_counter()
+                result = self.target.send(frame.payload)
+                feedback = self.target.feedback() if capture_feedback else None
+                results.append(FrameResult(loop, index, scheduled, sent - deadline, result, feedback))
+                if lock_step:
+                    self.target.wait_settled(settle_timeout)
+                    offset += max(0.0, time.perf_counter() - deadline - self._gap(frames, index, speed))
+            loop += 1
+        return results
+
+    @staticmethod
+    def _gap(frames, index, speed):
+        if index + 1 >= len(frames):
+            return 0.0
+        return (frames[index + 1].t - frames[index].t) / speed
+
+    @staticmethod
+    def _succeeded(result):
+        """DH5 send_command 返回 SUCCESS (0), DH6 move_hand 返回 True; False == 0, 不能用 in 比较"""
+        return result is True or (type(result) is int and result == DH5ModbusAPI.SUCCESS)
+
+    @staticmethod
+    def timing_report(results):
+        """:return: 发送时间误差统计(毫秒)"""
+        if not results:
+            return {'frames': 0}
+        errors = np.array([r.error for r in results]) * 1000
+        failed = sum(1 for r in results if not ReplayEngine._succeeded(r.result))
+        return {
+            'frames': len(results),
+            'failed': failed,
+            'mean_ms': float(errors.mean()),
+            'p99_ms': float(np.percentile(errors, 99)),
+            'max_ms': float(errors.max()),
+        }
+
+
+if __name__ == '__main__':
+    import sys
+
+    api = DH5ModbusAPI(port='/dev/ttyUSB0', baud_rate=115200)
+    print(api.open_connection())
+    engine = ReplayEngine(DH5ReplayTarget(api))
+    trajectory = Trajectory.from_recording(sys.argv[1])
+    print(f"Replaying {len(trajectory)} frames, {trajectory.duration():.2f} s")
+    results = engine.run(trajectory, speed=float(sys.argv[2]) if len(sys.argv) > 2 else 1.0, capture_feedback=True)
+    print(engine.timing_report(results))
+    api.close_connection()
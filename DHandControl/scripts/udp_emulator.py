@@ -0,0 +1,368 @@
+"""
+BusServoDriverHAT UDP 控制器模拟器 (对应 BusServoDriverHAT/UDP.h)
+  - 在本机UDP端口上应答 main_udp.DexHandControl 的JSON命令, 以及手势宏的上传和播放
+  - 与固件一样处理数据报时不阻塞, Turn 是内置关键帧表, 与手势宏由同一个播放器按时间执行
+  - blocking=True 模拟旧固件: ServoMove / FingerMove 后 delay(2000), Turn 阻塞8秒, 期间数据报排队
+  - jitter 模拟WiFi: 每个数据报延迟 0..jitter 秒后才交给控制器 (可能乱序)
+  - events 记录每次实际驱动设备的时间, 用于比较上位机逐条发送与手势宏的时序误差
+  - multicast=True 时同时加入多播组, 只执行 Multi 数据报中 hand_id 对应的段 (与固件 HAND_ID 一致)
+  - 控制器时钟 micros() 可设置偏差和漂移, 应答 Sync, 按控制器时间执行 At 定时命令并应答 Executed
+
+用法:
+    emulator = UDPEmulator(jitter=0.02)
+    port = emulator.start()
+    hand = DexHandControl(hand_ip='127.0.0.1', udp_port=port)
+    hand.move_fingers([1, 2], [1000, 1000])
+    emulator.stop()
+"""
+
+import json
+import time
+import struct
+import heapq
+import random
+import select
+import socket
+import threading
+
+
+MACRO_MAX = 16
+MACRO_MAX_STEPS = 32
+MACRO_MAX_DEVICES = 5
+MACRO_PLAY_BYTE = ord('M')
+SCHEDULE_SLOTS = 8
+UDP_BUFFER_SIZE = 1024
+
+MULTICAST_GROUP = '239.255.12.34'
+MULTICAST_PORT = 12346
+
+# 固件 TURN_STEPS: 1号舵机 500 -> 1000 -> 0 -> 500, 间隔2000ms
+TURN_STEPS = [{'T': t, 'P': [[1], [pos], [1000]]} for t, pos in ((0, 500), (2000, 1000), (4000, 0), (6000, 500))]
+
+# 旧固件中阻塞命令的 delay() (blocking=True)
+LEGACY_MOVE_DELAY = 2.0
+LEGACY_TURN_DELAY = 8.0
+
+
+class UDPEmulator:
+    def __init__(self, host='127.0.0.1', port=0, finger_ids=(1, 2, 3, 4, 5), palm_ids=(1, 2, 3), jitter=0.0,
+                 seed=None, hand_id='1', multicast=False, multicast_group=MULTICAST_GROUP,
+                 multicast_port=MULTICAST_PORT, clock_offset=0.0, clock_drift_ppm=0.0, blocking=False):
+        """
+        :param port: 0 表示由系统分配, start() 返回实际端口
+        :param jitter: 每个数据报的最大随机延迟(秒)
+        :param hand_id: Multi 数据报中本机的段名
+        :param multicast: 是否在 host 接口上加入多播组
+        :param clock_offset: 控制器时钟相对 time.monotonic() 的偏差(秒)
+        :param clock_drift_ppm: 控制器时钟漂移 (ppm)
+        :param blocking: 模拟旧固件的阻塞命令, 用于对比命令吞吐量
+        """
+        self.host = host
+        self.port = port
+        self.jitter = jitter
+        self.hand_id = str(hand_id)
+        self.multicast = multicast
+        self.multicast_group = multicast_group
+        self.multicast_port = multicast_port
+        self.clock_offset = clock_offset
+        self.clock_drift_ppm = clock_drift_ppm
+        self.blocking = blocking
+        self._busy_until = 0.0
+        # 定时命令: [控制器时刻, 序号, 命令, 应答地址]
+        self.schedule = []
+        self._packet_micros = 0
+        self.fingers = {i: 0 for i in finger_ids}
+        self.palms = {i: 500 for i in palm_ids}
+        # (time.monotonic(), 'F'/'P', ID列表, 位置列表)
+        self.events = []
+        self.packets = 0
+        self.macros = {}
+        self._macro_seq = {}
+        self._random = random.Random(seed)
+        self._pending = []
+        self._seq = 0
+        self._playing = None
+        self._sock = None
+        self._multicast_sock = None
+        self._thread = None
+        self._running = False
+
+    # -------------------- 传输层 --------------------
+    def start(self):
+        """:return: 实际监听的端口"""
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((self.host, self.port))
+        self.port = self._sock.getsockname()[1]
+        if self.multicast:
+            # 多个模拟器 (多只手) 共用多播端口
+            self._multicast_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._multicast_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._multicast_sock.bind(('', self.multicast_port))
+            self._multicast_sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                                            struct.pack('4s4s', socket.inet_aton(self.multicast_group),
+                                                        socket.inet_aton(self.host)))
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name='udp-emulator', daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._sock.close()
+        if self._multicast_sock is not None:
+            self._multicast_sock.close()
+            self._multicast_sock = None
+
+    def micros(self):
+        """控制器 micros(): 32位微秒计数"""
+        device_time = time.monotonic() * (1 + self.clock_drift_ppm * 1e-6) + self.clock_offset
+        return int(device_time * 1e6) & 0xFFFFFFFF
+
+    def _serve(self):
+        while self._running:
+            # 旧固件阻塞期间 loop() 不运行
+            busy = time.monotonic() < self._busy_until
+            if not busy:
+                self.service_macro()
+                self.service_schedule()
+            now = time.monotonic()
+            waits = [0.05]
+            if busy:
+                waits.append(self._busy_until - now)
+            elif self._pending:
+                waits.append(self._pending[0][0] - now)
+            if self._playing is not None:
+                waits.append(0.001)
+            if self.schedule:
+                waits.append(0.0002)
+            socks = [self._sock] if self._multicast_sock is None else [self._sock, self._multicast_sock]
+            readable, _, _ = select.select(socks, [], [], max(0.0, min(waits)))
+            for sock in readable:
+                data, address = sock.recvfrom(2048)
+                delay = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+                self._seq += 1
+                heapq.heappush(self._pending, (time.monotonic() + delay, self._seq, data, address))
+            now = time.monotonic()
+            while self._pending and self._pending[0][0] <= now and now >= self._busy_until:
+                _, _, data, address = heapq.heappop(self._pending)
+                self.handle_packet(data, address)
+
+    def _reply(self, message, address):
+        self._sock.sendto(json.dumps(message, separators=(',', ':')).encode(), address)
+
+    # -------------------- 命令 --------------------
+    def handle_packet(self, data, address=None):
+        self.packets += 1
+        self._packet_micros = self.micros()
+        if len(data) == 2 and data[0] == MACRO_PLAY_BYTE:
+            self.play_macro(data[1])
+            return
+        try:
+            doc = json.loads(data[:UDP_BUFFER_SIZE])
+        except ValueError:
+            return
+        if not isinstance(doc, dict):
+            return
+        if doc.get('Cmd') == 'Multi':
+            section = doc.get('Hands', {}).get(self.hand_id)
+            for item in section if isinstance(section, list) else [section] if isinstance(section, dict) else []:
+                self.dispatch(item, address)
+            return
+        self.dispatch(doc, address)
+
+    def dispatch(self, doc, address=None):
+        """执行一条JSON命令 (固件 dispatchCommand)"""
+        cmd = doc.get('Cmd')
+        if cmd == 'Sync':
+            if address is not None:
+                self._reply({'Cmd': 'SyncReply', 'Seq': doc.get('Seq', 0), 'Rx': self._packet_micros,
+                             'Tx': self.micros()}, address)
+        elif cmd == 'At':
+            if len(self.schedule) < SCHEDULE_SLOTS and isinstance(doc.get('Do'), dict):
+                self.schedule.append([doc.get('At', 0), doc.get('Seq', 0), doc['Do'], address])
+        elif cmd == 'Turn':
+            if self.blocking:
+                self._move('P', [1], [500])
+                self._block(LEGACY_TURN_DELAY)
+            else:
+                self._play(None, TURN_STEPS)
+        elif cmd == 'ServoMove':
+            self._move('P', [doc['ID']], [doc['Pos']])
+            self._block(LEGACY_MOVE_DELAY)
+        elif cmd == 'FingerMove':
+            self._move('F', [doc['ID']], [doc['Pos']])
+            self._block(LEGACY_MOVE_DELAY)
+        elif cmd == 'MoveFingers':
+            self._move('F', doc['ID_list'], doc['pos_list'])
+        elif cmd == 'MovePalms':
+            self._move('P', doc['ID_list'], doc['pos_list'])
+        elif cmd == 'MacroStep':
+            self._macro_step(doc, address)
+
+    def _block(self, seconds):
+        if self.blocking:
+            self._busy_until = time.monotonic() + seconds
+
+    def _move(self, kind, ids, positions):
+        devices = self.fingers if kind == 'F' else self.palms
+        for dev_id, position in zip(ids, positions):
+            if dev_id in devices:
+                devices[dev_id] = position
+        self.events.append((time.monotonic(), kind, list(ids), list(positions)))
+
+    def service_schedule(self):
+        """与固件 serviceSchedule() 相同: 按到期先后执行定时命令 (回绕安全的比较)"""
+        while True:
+            now = self.micros()
+            due = [entry for entry in self.schedule if ((now - entry[0]) & 0xFFFFFFFF) < 0x80000000]
+            if not due:
+                return
+            entry = min(due, key=lambda e: ((e[0] - now) & 0xFFFFFFFF) ^ 0x80000000)
+            self.schedule.remove(entry)
+            at, seq, command, address = entry
+            actual = self.micros()
+            self.dispatch(command, address)
+            if address is not None:
+                self._reply({'Cmd': 'Executed', 'Seq': seq, 'At': at, 'Actual': actual}, address)
+
+    # -------------------- 手势宏 --------------------
+    def _macro_step(self, doc, address):
+        macro_id, seq, count, index = (doc.get(key, 0) for key in ('MacroID', 'Seq', 'Count', 'Index'))
+        if not 1 <= macro_id <= MACRO_MAX or not 1 <= count <= MACRO_MAX_STEPS or index >= count:
+            return
+        if self._playing is not None and self._playing[0] == macro_id:
+            self._playing = None
+        if self._macro_seq.get(macro_id) != seq or len(self.macros.get(macro_id, ())) != count:
+            self._macro_seq[macro_id] = seq
+            self.macros[macro_id] = [None] * count
+        steps = self.macros[macro_id]
+        step = {'T': doc.get('T', 0)}
+        for kind, keys in (('F', ('F_ID', 'F_pos')), ('P', ('P_ID', 'P_pos', 'P_time'))):
+            lists = [doc.get(key, []) for key in keys]
+            if len(lists[0]) > MACRO_MAX_DEVICES or any(len(values) != len(lists[0]) for values in lists):
+                return
+            if lists[0]:
+                step[kind] = lists
+        steps[index] = step
+        if None not in steps and address is not None:
+            self._reply({'Cmd': 'MacroSaved', 'MacroID': macro_id, 'Seq': seq, 'Count': len(steps)}, address)
+
+    def play_macro(self, macro_id):
+        steps = self.macros.get(macro_id)
+        if steps is None or None in steps:
+            self._playing = None
+            return
+        self._play(macro_id, steps)
+
+    def _play(self, macro_id, steps):
+        """与固件 playSteps() 相同, 替换正在播放的宏或动作; macro_id 为 None 表示内置动作"""
+        # (宏ID, 开始时间, 下一个关键帧, 关键帧表)
+        self._playing = [macro_id, time.monotonic(), 0, steps]
+        self.service_macro()
+
+    def service_macro(self):
+        """与固件 serviceMacro() 相同: 执行所有已到时间的关键帧"""
+        if self._playing is None:
+            return
+        macro_id, start, index, steps = self._playing
+        elapsed_ms = (time.monotonic() - start) * 1000
+        while index < len(steps) and steps[index]['T'] <= elapsed_ms:
+            for kind in ('F', 'P'):
+                if kind in steps[index]:
+                    self._move(kind, steps[index][kind][0], steps[index][kind][1])
+            index += 1
+        self._playing[2] = index
+        if index >= len(steps):
+            self._playing = None
+
+
+def _relative(events):
+    return [t - events[0][0] for t, _, _, _ in events] if events else []
+
+
+def benchmark_gesture(name='dex_boxing', jitter=0.02, seed=1):
+    """
+    同一个手势: 上位机逐条发送 (带 sleep) 与 手势宏 的关键帧时序误差
+    :return: {'host': 最大误差(秒), 'macro': 最大误差(秒)}, 误差相对各自第一个动作
+    """
+    from main_udp import DexHandControl
+    from gesture_macros import compile_gesture, macro_id, play_gesture
+
+    expected = []
+    for step in compile_gesture(name):
+        expected += [step['T'] / 1000] * sum(1 for key in ('F_ID', 'P_ID') if key in step)
+    emulator = UDPEmulator(jitter=jitter, seed=seed)
+    port = emulator.start()
+    results = {}
+    try:
+        hand = DexHandControl(hand_ip='127.0.0.1', udp_port=port)
+        getattr(hand, name)()
+        time.sleep(jitter + 0.05)
+        actual = sorted(_relative(emulator.events))
+        results['host'] = max(abs(a - e) for a, e in zip(actual, expected))
+
+        hand.upload_macro(macro_id(name), compile_gesture(name), timeout=jitter + 0.5)
+        emulator.events = []
+        play_gesture(hand, name)
+        time.sleep(expected[-1] + jitter + 0.05)
+        actual = sorted(_relative(emulator.events))
+        results['macro'] = max(abs(a - e) for a, e in zip(actual, expected))
+    finally:
+        emulator.stop()
+    return results
+
+
+def benchmark_throughput(rate=100.0, duration=1.0, blocking=False):
+    """
+    以固定频率发送 ServoMove (可随时被下一条替换的流式命令), 统计控制器执行的命令数和延迟
+    :param blocking: True 时模拟旧固件的 delay(2000)
+    :return: {'sent': 发送数, 'executed': 发送结束后0.2秒内执行数, 'rate': 执行频率(Hz), 'latency': 平均延迟(秒)}
+    """
+    from main_udp import DexHandControl
+
+    emulator = UDPEmulator(blocking=blocking)
+    port = emulator.start()
+    sent = {}
+    try:
+        hand = DexHandControl(hand_ip='127.0.0.1', udp_port=port)
+        start = time.monotonic()
+        i = 0
+        while time.monotonic() - start < duration:
+            position = i % 1000
+            sent[position] = time.monotonic()
+            hand.servo_move(1, position, 20)
+            i += 1
+            time.sleep(max(0.0, start + i / rate - time.monotonic()))
+        time.sleep(0.2)
+        events = list(emulator.events)
+    finally:
+        emulator.stop()
+    latencies = [t - sent[positions[0]] for t, _, _, positions in events]
+    return {'sent': i, 'executed': len(events), 'rate': len(events) / duration,
+            'latency': sum(latencies) / len(latencies) if latencies else None}
+
+
+if __name__ == '__main__':
+    import sys
+
+    if '--bench' in sys.argv:
+        for gesture in ('boxing', 'dex_boxing', 'ring2thumb'):
+            errors = benchmark_gesture(gesture)
+            print(f"{gesture:12s} host {errors['host'] * 1000:6.1f} ms  macro {errors['macro'] * 1000:6.1f} ms")
+        for blocking in (True, False):
+            result = benchmark_throughput(blocking=blocking)
+            print(f"ServoMove {'blocking' if blocking else 'non-blocking':12s} sent {result['sent']:3d}  "
+                  f"executed {result['executed']:3d}  {result['rate']:6.1f} Hz  "
+                  f"latency {result['latency'] * 1000:6.2f} ms")
+        sys.exit(0)
+
+    emulator = UDPEmulator(port=12345)
+    print("UDP emulator on port", emulator.start())
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop()
@@ -0,0 +1,186 @@
+"""
+UDP 多手同步发送 (对应 BusServoDriverHAT/UDP.h 的 Multi 命令)
+  - 所有手的命令打包进一个数据报 {"Cmd":"Multi","Hands":{手ID: [命令, ...]}}, 发送到多播组或广播地址,
+    每只手只执行以自己的 HAND_ID 为键的段; 无论有几只手都只发送一次
+  - 段内的命令用 main_udp.DexHandControl 的方法构造, 与单播命令格式完全相同
+  - measure_skew() 在本机回环上比较逐只手单播与一次多播的各手收到命令的时间差 (Linux)
+
+用法:
+    fanout = UDPFanout(['1', '2'])
+    with fanout.batch() as hands:
+        hands['1'].move_fingers([1, 2], [2000, 2000])
+        hands['2'].move_fingers([1, 2], [2000, 2000])
+"""
+
+import json
+import time
+import struct
+import socket
+from contextlib import contextmanager
+
+from main_udp import DexHandControl
+
+
+MULTICAST_GROUP = '239.255.12.34'
+MULTICAST_PORT = 12346
+BROADCAST_IP = '192.168.4.255'
+UDP_PORT = 12345
+# 固件 UDP_BUFFER_SIZE
+MAX_DATAGRAM = 1024
+
+
+class _SectionRecorder(DexHandControl):
+    """记录一只手的命令而不发送"""
+
+    def __init__(self):
+        super().__init__()
+        self.commands = []
+
+    def _send_udp_message(self, message_dict):
+        self.commands.append(message_dict)
+
+    def _send_raw(self, json_message, cmd):
+        raise ValueError(f"{cmd} 不能放入多手数据报")
+
+    def _sleep(self, seconds):
+        raise ValueError("多手数据报中不能等待, 请拆成多个 batch")
+
+
+class UDPFanout:
+    """
+    :param hand_ids: 手ID列表 (与各控制器的 HAND_ID 一致)
+    :param mode: 'multicast' 发送到多播组, 'broadcast' 发送到广播地址的 udp_port
+    :param interface_ip: 发送多播使用的本机地址, None 由系统选择
+    """
+
+    def __init__(self, hand_ids, mode='multicast', group=MULTICAST_GROUP, port=MULTICAST_PORT,
+                 broadcast_ip=BROADCAST_IP, udp_port=UDP_PORT, interface_ip=None, ttl=1):
+        if mode not in ('multicast', 'broadcast'):
+            raise ValueError(f"Unknown fan-out mode: {mode}")
+        self.hand_ids = [str(hand_id) for hand_id in hand_ids]
+        self.mode = mode
+        self.address = (group, port) if mode == 'multicast' else (broadcast_ip, udp_port)
+        self.metrics = None  # 可选 hand_metrics.TransportMetrics
+        # 长期使用同一个套接字, 每次发送只有一次 sendto
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if mode == 'multicast':
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            if interface_ip is not None:
+                self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface_ip))
+        else:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+    def close(self):
+        self._sock.close()
+
+    def encode(self, sections):
+        """
+        :param sections: {手ID: [命令dict, ...]}
+        :return: 数据报字节
+        :raise ValueError: 未知的手ID或超过控制器缓冲区
+        """
+        hands = {}
+        for hand_id, commands in sections.items():
+            hand_id = str(hand_id)
+            if hand_id not in self.hand_ids:
+                raise ValueError(f"未知的手ID: {hand_id}")
+            if commands:
+                hands[hand_id] = commands[0] if len(commands) == 1 else list(commands)
+        payload = json.dumps({'Cmd': "Multi", 'Hands': hands}, separators=(',', ':')).encode()
+        if len(payload) > MAX_DATAGRAM:
+            raise ValueError(f"多手数据报 {len(payload)} 字节, 超过控制器缓冲区 {MAX_DATAGRAM}")
+        return payload
+
+    def send(self, sections):
+        """发送一个多手数据报, :return: 字节数"""
+        payload = self.encode(sections)
+        start = time.perf_counter()
+        self._sock.sendto(payload, self.address)
+        if self.metrics is not None:
+            self.metrics.observe('Multi', time.perf_counter() - start, len(payload))
+        return len(payload)
+
+    @contextmanager
+    def batch(self):
+        """
+        with 块内对 hands[手ID] 调用 DexHandControl 的方法, 退出时合并为一个数据报发送
+        块内抛出异常时不发送
+        """
+        hands = {hand_id: _SectionRecorder() for hand_id in self.hand_ids}
+        yield hands
+        self.send({hand_id: recorder.commands for hand_id, recorder in hands.items()})
+
+
+# Linux: 每个数据报附带内核接收时间戳 (struct timespec)
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+
+
+def _timestamped_receiver(group, port):
+    """本机回环上的接收端: 单播端口 + 加入多播组, 记录内核收到数据报的时间"""
+    unicast = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    unicast.bind(('127.0.0.1', 0))
+    multicast = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    multicast.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    multicast.bind(('', port))
+    multicast.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                         socket.inet_aton(group) + socket.inet_aton('127.0.0.1'))
+    for sock in (unicast, multicast):
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+        sock.settimeout(1.0)
+    return unicast, multicast
+
+
+def _receive_time(sock):
+    _, ancdata, _, _ = sock.recvmsg(MAX_DATAGRAM, 64)
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS:
+            seconds, nanoseconds = struct.unpack('qq', data[:16])
+            return seconds + nanoseconds * 1e-9
+    raise RuntimeError("数据报没有内核时间戳")
+
+
+def measure_skew(hand_count=4, rounds=200, group=MULTICAST_GROUP, port=MULTICAST_PORT):
+    """
+    回环测试: 同一组命令分别用逐只手单播 (main_udp.DexHandControl, 现有方式) 和一次多播发送,
+    按内核接收时间戳统计每轮最早和最晚收到命令的手之间的时间差 (不受接收端线程调度影响)
+    :return: {'unicast': (平均, 最大), 'multicast': (平均, 最大)}, 单位秒
+    """
+    hand_ids = [str(i + 1) for i in range(hand_count)]
+    receivers = [_timestamped_receiver(group, port) for _ in hand_ids]
+    unicast_hands = [DexHandControl(hand_ip='127.0.0.1', udp_port=unicast.getsockname()[1])
+                     for unicast, _ in receivers]
+    fanout = UDPFanout(hand_ids, group=group, port=port, interface_ip='127.0.0.1')
+
+    def run(send, which):
+        skews = []
+        for i in range(rounds):
+            send(20 + i % 1980)
+            times = [_receive_time(receiver[which]) for receiver in receivers]
+            skews.append(max(times) - min(times))
+        return sum(skews) / len(skews), max(skews)
+
+    def send_unicast(position):
+        for hand in unicast_hands:
+            hand.move_fingers([1], [position])
+
+    def send_multicast(position):
+        with fanout.batch() as hands:
+            for hand_id in hand_ids:
+                hands[hand_id].move_fingers([1], [position])
+
+    try:
+        return {'unicast': run(send_unicast, 0), 'multicast': run(send_multicast, 1)}
+    finally:
+        fanout.close()
+        for receiver in receivers:
+            for sock in receiver:
+                sock.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    for mode, (mean, worst) in measure_skew(count).items():
+        print(f"{mode:10s} {count} hands  skew mean {mean * 1e6:7.1f} us  max {worst * 1e6:7.1f} us")